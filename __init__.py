@@ -1,8 +1,20 @@
 import os
 import json
+import time
 import importlib.util
 
 current_path = os.path.dirname(os.path.realpath(__file__))
+nodes_dir = os.path.join(current_path, "nodes")
+
+# Node modules only import what their node definitions need. The Gemini
+# SDKs, torchaudio and sounddevice are imported when a node first runs, so
+# loading this package at ComfyUI startup stays cheap.
+NODE_FILES = [
+    ("Gemini node", "gemini_flash_node.py"),
+    ("Gemini 2.5 node", "gemini_2_5_node.py"),
+    ("Audio recorder", "nodes_audio_recorder.py"),
+    ("Gemini Batch nodes", "gemini_batch_node.py"),
+]
 
 def load_python_file(filepath):
     try:
@@ -14,47 +26,18 @@ def load_python_file(filepath):
         print(f"Error loading {filepath}: {str(e)}")
         return None
 
-# Try to find the node files (case-insensitive on Linux)
-nodes_dir = os.path.join(current_path, "nodes")
-gemini_filename = "gemini_flash_node.py"
-gemini_25_filename = "gemini_2_5_node.py"
-audio_recorder_filename = "nodes_audio_recorder.py"
-
-gemini_path = None
-gemini_25_path = None
-audio_recorder_path = None
-
-# First try the exact case
-exact_gemini_path = os.path.join(nodes_dir, gemini_filename)
-exact_gemini_25_path = os.path.join(nodes_dir, gemini_25_filename)
-exact_audio_path = os.path.join(nodes_dir, audio_recorder_filename)
-
-# Then try lowercase if needed
-lower_gemini_path = os.path.join(nodes_dir, gemini_filename.lower())
-lower_gemini_25_path = os.path.join(nodes_dir, gemini_25_filename.lower())
-lower_audio_path = os.path.join(nodes_dir, audio_recorder_filename.lower())
-
-# Check which paths exist and use them
-if os.path.exists(exact_gemini_path):
-    gemini_path = exact_gemini_path
-    print(f"Found Gemini node at: {gemini_path}")
-elif os.path.exists(lower_gemini_path):
-    gemini_path = lower_gemini_path
-    print(f"Found Gemini node at lowercase path: {gemini_path}")
-
-if os.path.exists(exact_gemini_25_path):
-    gemini_25_path = exact_gemini_25_path
-    print(f"Found Gemini 2.5 node at: {gemini_25_path}")
-elif os.path.exists(lower_gemini_25_path):
-    gemini_25_path = lower_gemini_25_path
-    print(f"Found Gemini 2.5 node at lowercase path: {gemini_25_path}")
-
-if os.path.exists(exact_audio_path):
-    audio_recorder_path = exact_audio_path
-    print(f"Found Audio recorder at: {audio_recorder_path}")
-elif os.path.exists(lower_audio_path):
-    audio_recorder_path = lower_audio_path
-    print(f"Found Audio recorder at lowercase path: {audio_recorder_path}")
+def find_node_file(label, filename):
+    """Path of a node file, trying the exact name and then lowercase (case-sensitive filesystems)"""
+    exact_path = os.path.join(nodes_dir, filename)
+    if os.path.exists(exact_path):
+        print(f"Found {label} at: {exact_path}")
+        return exact_path
+    lower_path = os.path.join(nodes_dir, filename.lower())
+    if os.path.exists(lower_path):
+        print(f"Found {label} at lowercase path: {lower_path}")
+        return lower_path
+    print(f"Could not find {label} file (tried {filename} and {filename.lower()})")
+    return None
 
 # Try to create config.json if it doesn't exist
 try:
@@ -66,51 +49,23 @@ try:
 except Exception as e:
     print(f"Could not create config.json: {str(e)}")
 
-# Load modules if found
-gemini_module = None
-gemini_25_module = None
-audio_recorder_module = None
-
-if gemini_path:
-    gemini_module = load_python_file(gemini_path)
-else:
-    print(f"Could not find Gemini node file (tried {gemini_filename} and {gemini_filename.lower()})")
-
-if gemini_25_path:
-    gemini_25_module = load_python_file(gemini_25_path)
-else:
-    print(f"Could not find Gemini 2.5 node file (tried {gemini_25_filename} and {gemini_25_filename.lower()})")
-
-if audio_recorder_path:
-    audio_recorder_module = load_python_file(audio_recorder_path)
-else:
-    print(f"Could not find Audio recorder node file (tried {audio_recorder_filename} and {audio_recorder_filename.lower()})")
-
-# Initialize mappings
 NODE_CLASS_MAPPINGS = {}
 NODE_DISPLAY_NAME_MAPPINGS = {}
 
-# Merge mappings
-if gemini_module and hasattr(gemini_module, 'NODE_CLASS_MAPPINGS'):
-    NODE_CLASS_MAPPINGS.update(gemini_module.NODE_CLASS_MAPPINGS)
-    print("Added Gemini node to mappings")
-
-if gemini_module and hasattr(gemini_module, 'NODE_DISPLAY_NAME_MAPPINGS'):
-    NODE_DISPLAY_NAME_MAPPINGS.update(gemini_module.NODE_DISPLAY_NAME_MAPPINGS)
-
-if gemini_25_module and hasattr(gemini_25_module, 'NODE_CLASS_MAPPINGS'):
-    NODE_CLASS_MAPPINGS.update(gemini_25_module.NODE_CLASS_MAPPINGS)
-    print("Added Gemini 2.5 node to mappings")
-
-if gemini_25_module and hasattr(gemini_25_module, 'NODE_DISPLAY_NAME_MAPPINGS'):
-    NODE_DISPLAY_NAME_MAPPINGS.update(gemini_25_module.NODE_DISPLAY_NAME_MAPPINGS)
-
-if audio_recorder_module and hasattr(audio_recorder_module, 'NODE_CLASS_MAPPINGS'):
-    NODE_CLASS_MAPPINGS.update(audio_recorder_module.NODE_CLASS_MAPPINGS)
-    print("Added Audio recorder node to mappings")
-
-if audio_recorder_module and hasattr(audio_recorder_module, 'NODE_DISPLAY_NAME_MAPPINGS'):
-    NODE_DISPLAY_NAME_MAPPINGS.update(audio_recorder_module.NODE_DISPLAY_NAME_MAPPINGS)
+# Load the node modules that were found and merge their mappings
+for label, filename in NODE_FILES:
+    path = find_node_file(label, filename)
+    if path is None:
+        continue
+    start = time.perf_counter()
+    module = load_python_file(path)
+    if module is None:
+        continue
+    if hasattr(module, 'NODE_CLASS_MAPPINGS'):
+        NODE_CLASS_MAPPINGS.update(module.NODE_CLASS_MAPPINGS)
+        print(f"Added {label} to mappings ({time.perf_counter() - start:.2f}s)")
+    if hasattr(module, 'NODE_DISPLAY_NAME_MAPPINGS'):
+        NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)
 
 # Define web directory
-WEB_DIRECTORY = os.path.join(current_path, "web")
\ No newline at end of file
+WEB_DIRECTORY = os.path.join(current_path, "web")
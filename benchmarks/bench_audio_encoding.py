@@ -0,0 +1,107 @@
+"""Resampling time and upload size of the audio input path.
+
+Compares torchaudio.functional.resample, which rebuilds its filter kernel
+on every call, with the cached Resample transform the nodes use. It also
+shows encode time and payload size for each audio_format, next to the float
+WAV the nodes sent before.
+
+Usage:
+    python benchmarks/bench_audio_encoding.py [audio.wav] [--seconds 120] [--repeat 5]
+
+Without a file a synthetic 44.1 kHz stereo signal with speech-like bursts
+is used.
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import torch
+import torchaudio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
+
+from gemini_common.audio import (  # noqa: E402
+    AUDIO_FORMATS,
+    TARGET_SAMPLE_RATE,
+    encode_audio,
+    get_resampler,
+    mono_waveform,
+)
+from gemini_common.media_cache import get_media_cache  # noqa: E402
+
+
+def synthetic_speech(seconds, sample_rate=44100):
+    """Voiced bursts with formant-like harmonics and pauses, as a [1, 2, N] AUDIO waveform"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = (np.sin(2 * np.pi * 2.5 * t) > -0.2) * (np.sin(2 * np.pi * 0.21 * t) > -0.6)
+    signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(t.shape)
+    stereo = np.stack([signal, 0.9 * signal]).astype(np.float32)
+    return {"waveform": torch.from_numpy(stereo)[None], "sample_rate": sample_rate}
+
+
+def load_audio(path):
+    waveform, sample_rate = torchaudio.load(path)
+    return {"waveform": waveform[None], "sample_rate": sample_rate}
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, sorted(timings)[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("audio", nargs="?")
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio) if args.audio else synthetic_speech(args.seconds)
+    waveform = audio["waveform"][0].mean(dim=0, keepdim=True)
+    rate = audio["sample_rate"]
+    print(f"audio: {waveform.shape[1] / rate:.1f}s at {rate} Hz")
+
+    _, functional_ms = timed(
+        lambda: torchaudio.functional.resample(waveform, rate, TARGET_SAMPLE_RATE), args.repeat
+    )
+    get_resampler(rate)
+    _, cached_ms = timed(lambda: get_resampler(rate)(waveform), args.repeat)
+    print(f"{'resample':<24}{'ms':>10}")
+    print(f"{'functional.resample':<24}{functional_ms:>10.1f}")
+    print(f"{'cached Resample':<24}{cached_ms:>10.1f}")
+
+    print()
+    print(f"{'format':<24}{'encode ms':>10}{'KiB':>10}")
+    mono = mono_waveform(audio)
+
+    def float_wav():
+        buffer = BytesIO()
+        torchaudio.save(buffer, mono, TARGET_SAMPLE_RATE, format="wav")
+        return buffer.getvalue()
+
+    data, ms = timed(float_wav, args.repeat)
+    print(f"{'wav (float, before)':<24}{ms:>10.1f}{len(data) / 1024:>10.1f}")
+
+    for audio_format in AUDIO_FORMATS:
+        def encode():
+            get_media_cache().clear()
+            return encode_audio(audio, audio_format)
+
+        (data, mime_type), ms = timed(encode, args.repeat)
+        label = audio_format if mime_type.endswith(audio_format) else f"{audio_format} (sent as wav)"
+        print(f"{label:<24}{ms:>10.1f}{len(data) / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
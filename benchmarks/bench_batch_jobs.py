@@ -0,0 +1,101 @@
+"""Batch job round trip against a local stand-in for the Gemini Batch API.
+
+Starts the HTTP stand-in from tests/batch_stand_in.py, which speaks the
+REST subset the batch nodes use: resumable File API uploads,
+batchGenerateContent, job status, results download and cancel. Jobs stay
+pending and then run for --job-seconds before they succeed. The results file
+lists the answers in shuffled order, and every --fail-every-th request gets
+an error line instead of an answer.
+
+The script submits --requests prompts (with --image-kb of image data each)
+through BatchRunner, polls until the job is done and checks that every
+answer was mapped back to its own request. It then submits the same
+requests again, which must resume the recorded job without a second upload.
+It reports the JSONL size, submit time, number of polls and total time.
+
+The nodes can be pointed at the stand-in by setting BATCH_BASE_URL in
+config.json to the printed http:// address (use --serve to keep it running).
+tests/test_batch_jobs.py runs the same stand-in under pytest.
+
+Usage:
+    python benchmarks/bench_batch_jobs.py [--requests 500] [--image-kb 64] [--job-seconds 3]
+        [--fail-every 50] [--serve]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "nodes"))
+sys.path.append(os.path.join(ROOT, "tests"))
+
+from batch_stand_in import StandIn, handler_for  # noqa: E402
+from gemini_common.batch_jobs import BatchRunner, JobManifest, RestBackend, build_request  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--image-kb", type=int, default=64, help="image bytes per request, 0 for text only")
+    parser.add_argument("--job-seconds", type=float, default=3.0)
+    parser.add_argument("--fail-every", type=int, default=50)
+    parser.add_argument("--serve", action="store_true", help="keep the stand-in running")
+    args = parser.parse_args()
+
+    service = StandIn(args.job_seconds, args.fail_every)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_for(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"stand-in listening on {url}")
+
+    rng = random.Random(0)
+    prompts = [f"Caption item {i}" for i in range(args.requests)]
+    image = rng.randbytes(args.image_kb * 1024) if args.image_kb else None
+    requests = [
+        build_request(prompt, image, "image/jpeg", "Answer briefly.", {"temperature": 0.4}) for prompt in prompts
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        polls = []
+        runner = BatchRunner(RestBackend(url, "stand-in-key"), JobManifest(directory))
+        start = time.perf_counter()
+        record = runner.submit("gemini-2.5-flash", requests, "bench")
+        submitted = time.perf_counter()
+        record = runner.wait(record, poll_interval=1.0, timeout=args.job_seconds * 10,
+                             on_state=lambda r: polls.append(r["state"]))
+        results = runner.results(record)
+        finished = time.perf_counter()
+
+        mismatched = [
+            i for i, (prompt, result) in enumerate(zip(prompts, results))
+            if not result.error and f"{prompt!r}" not in result.text
+        ]
+        failed = sum(1 for result in results if result.error)
+        print(f"JSONL: {record['input_bytes'] / (1024 * 1024):.1f} MB for {len(requests)} requests")
+        print(f"submit: {(submitted - start) * 1000:.0f} ms, job: {record['state']} after "
+              f"{service.status_calls} status calls ({' -> '.join(polls)})")
+        print(f"total: {finished - start:.1f} s, {len(results) - failed} answers, {failed} errors, "
+              f"{len(mismatched)} mapped to the wrong request")
+
+        uploads = service.uploads
+        resumed = runner.submit("gemini-2.5-flash", requests, "bench")
+        again = runner.results(resumed)
+        print(f"resubmit: same job {resumed['job_name'] == record['job_name']}, "
+              f"new uploads {service.uploads - uploads}, same results {again == results}")
+
+    if args.serve:
+        print("serving until interrupted")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Decode time and peak RSS of turning generated images into an IMAGE batch.
+
+Compares the nodes' previous path (one float32 array per image, converted
+to a tensor and joined with torch.cat) with decode_images, which decodes in
+the worker pool straight into one preallocated batch. Each variant runs in
+a fresh subprocess so the peak resident set size of one does not hide the
+other.
+
+Usage:
+    python benchmarks/bench_image_decode.py [--images 4] [--size 2048] [--repeat 3] [--fit pad]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+MODES = ["serial_cat", "decode_images"]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_images(count, size):
+    """PNGs like generated images: smooth gradients with some texture"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:size, 0:size] / size
+    blobs = []
+    for i in range(count):
+        pixels = np.stack([x * 255, y * 255, (x + y + i / count) % 1 * 255], axis=-1)
+        pixels += rng.normal(0, 8, pixels.shape)
+        buffer = BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode="RGB").save(buffer, format="PNG")
+        blobs.append(buffer.getvalue())
+    return blobs
+
+
+def serial_cat(blobs):
+    """The nodes' decoding before decode_images"""
+    import torch
+
+    tensors = []
+    for data in blobs:
+        image = Image.open(BytesIO(data))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        img_np = np.array(image).astype(np.float32) / 255.0
+        tensors.append(torch.from_numpy(img_np)[None,])
+    return torch.cat(tensors, dim=0)
+
+
+def run_child(mode, count, size, repeat, fit):
+    import torch  # noqa: F401  (import cost is not part of the measurement)
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
+    from gemini_common.media import decode_images
+
+    blobs = make_images(count, size)
+    baseline = peak_rss_mb()
+    decode = serial_cat if mode == "serial_cat" else lambda data: decode_images(data, fit)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        batch = decode(blobs)
+        timings.append(time.perf_counter() - start)
+        del batch
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "batch_mb": count * size * size * 3 * 4 / (1024 * 1024),
+                "decode_ms": min(timings) * 1000,
+                "peak_increase_mb": peak_rss_mb() - baseline,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fit", default="pad")
+    parser.add_argument("--child", choices=MODES)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.images, args.size, args.repeat, args.fit)
+        return
+
+    print(f"{'mode':<16}{'batch MB':>10}{'decode ms':>12}{'peak RSS +MB':>14}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--images", str(args.images),
+             "--size", str(args.size), "--repeat", str(args.repeat), "--fit", args.fit],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:<16}{result['batch_mb']:>10.1f}{result['decode_ms']:>12.1f}"
+            f"{result['peak_increase_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
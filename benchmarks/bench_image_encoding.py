@@ -0,0 +1,90 @@
+"""Encode time and payload size per image for each wire encoding.
+
+Usage:
+    python benchmarks/bench_image_encoding.py [image ...] [--size 1024] [--repeat 5]
+
+Without image paths a synthetic photographic test image is used.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
+
+from gemini_common.media import ImageEncoding, encode_image, fit_size  # noqa: E402
+
+SETTINGS = [
+    ImageEncoding("png", compress_level=1),
+    ImageEncoding("png", compress_level=6),
+    ImageEncoding("png", compress_level=9),
+    ImageEncoding("jpeg", quality=95),
+    ImageEncoding("jpeg", quality=85),
+    ImageEncoding("jpeg", quality=75),
+    ImageEncoding("webp", quality=90),
+    ImageEncoding("webp", quality=80),
+]
+
+
+def synthetic_photo(size):
+    """Smooth gradients plus sensor-like noise, which compresses like a photo"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    base = np.stack(
+        [
+            0.5 + 0.4 * np.sin(6 * x + 2 * y),
+            0.5 + 0.4 * np.cos(4 * y - 3 * x),
+            0.5 + 0.3 * np.sin(9 * x * y),
+        ],
+        axis=-1,
+    )
+    noisy = base + rng.normal(0, 0.04, base.shape)
+    return Image.fromarray((noisy.clip(0, 1) * 255).astype(np.uint8), mode="RGB")
+
+
+def load_images(paths, size):
+    if not paths:
+        return [("synthetic", synthetic_photo(size))]
+    images = []
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        image = image.resize(fit_size(*image.size, size), Image.LANCZOS)
+        images.append((os.path.basename(path), image))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.size)
+    print(f"{'encoding':<24}{'ms/image':>12}{'KiB/image':>12}")
+    for setting in SETTINGS:
+        total_time = 0.0
+        total_bytes = 0
+        for _, image in images:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                data = encode_image(image, setting)
+                total_time += time.perf_counter() - start
+            total_bytes += len(data)
+        label = (
+            f"png level={setting.compress_level}"
+            if setting.format == "png"
+            else f"{setting.format} q={setting.quality}"
+        )
+        count = len(images)
+        print(
+            f"{label:<24}{total_time / (count * args.repeat) * 1000:>12.1f}"
+            f"{total_bytes / count / 1024:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Startup cost of importing each node module and shared helper.
+
+Every module is imported in a fresh interpreter, after the libraries
+ComfyUI has already loaded by the time custom nodes are imported (torch,
+numpy, PIL; see --preload), so the figures are what this package adds to
+startup. The report lists the import time of each module and which heavy
+dependencies (Gemini SDKs, torchaudio, sounddevice, ...) it pulled in;
+those should only appear once a node runs. --top shows the slowest imports
+below each module as measured by python -X importtime.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat 3] [--top 5] [--preload torch numpy PIL]
+        [--comfyui path/to/ComfyUI]
+
+Run it from the ComfyUI Python environment. --comfyui makes ComfyUI's own
+modules (folder_paths, server) importable when the script runs outside it.
+Importing the package creates nodes/config.json if it is missing, as
+ComfyUI startup does.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODES = os.path.join(ROOT, "nodes")
+
+HEAVY = [
+    "google.generativeai",
+    "google.genai",
+    "torchaudio",
+    "sounddevice",
+    "httpx",
+    "websockets",
+    "imageio_ffmpeg",
+]
+
+MARKER = "-- importing target --"
+
+CHILD = """
+import importlib, importlib.util, json, sys, time
+for name in {preload!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+sys.path.insert(0, {nodes!r})
+# Only the imports after this marker belong to the target
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+before = set(sys.modules)
+start = time.perf_counter()
+error = None
+try:
+    target = {target!r}
+    if target.endswith(".py"):
+        package = target.endswith("__init__.py")
+        spec = importlib.util.spec_from_file_location(
+            "bench_target", target,
+            submodule_search_locations=[{root!r}] if package else None,
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        importlib.import_module(target)
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - start
+loaded = set(sys.modules) - before
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "heavy": [name for name in {heavy!r} if name in loaded],
+    "error": error,
+}}))
+"""
+
+
+def targets():
+    """(label, import target) of the helpers, the node files and the package"""
+    found = []
+    for path in sorted(glob.glob(os.path.join(NODES, "gemini_common", "*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name != "__init__":
+            found.append((f"gemini_common.{name}", f"gemini_common.{name}"))
+    for path in sorted(glob.glob(os.path.join(NODES, "*.py"))):
+        found.append((os.path.basename(path), path))
+    found.append(("package __init__", os.path.join(ROOT, "__init__.py")))
+    return found
+
+
+def slowest_imports(stderr, top):
+    """The top entries of python -X importtime output by self time"""
+    rows = []
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1 :]
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def measure(target, preload, comfyui, repeat, top):
+    code = CHILD.format(
+        preload=preload, nodes=NODES, root=ROOT, target=target, heavy=HEAVY, marker=MARKER
+    )
+    env = dict(os.environ)
+    if comfyui:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [comfyui, env.get("PYTHONPATH")]))
+    results = []
+    for i in range(repeat):
+        command = [sys.executable, "-c", code]
+        if top and i == 0:
+            command[1:1] = ["-X", "importtime"]
+        process = subprocess.run(command, capture_output=True, text=True, env=env, cwd=ROOT)
+        if process.returncode != 0 or not process.stdout.strip():
+            error = (process.stderr.strip().splitlines() or ["no output"])[-1]
+            return {"ms": 0.0, "heavy": [], "error": error}, []
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        if i == 0:
+            slowest = slowest_imports(process.stderr, top) if top else []
+        results.append(result)
+    best = min(results, key=lambda result: result["ms"])
+    return best, slowest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=0, help="show the N slowest imports per module")
+    parser.add_argument("--preload", nargs="*", default=["torch", "numpy", "PIL"])
+    parser.add_argument("--comfyui", help="ComfyUI checkout to put on the path")
+    args = parser.parse_args()
+
+    print(f"preloaded: {', '.join(args.preload) or 'nothing'}")
+    print(f"{'module':<34}{'import ms':>11}  heavy dependencies loaded")
+    for label, target in targets():
+        result, slowest = measure(target, args.preload, args.comfyui, max(1, args.repeat), args.top)
+        if result["error"]:
+            print(f"{label:<34}{'failed':>11}  {result['error']}")
+            continue
+        print(f"{label:<34}{result['ms']:>11.1f}  {', '.join(result['heavy']) or '-'}")
+        for self_us, cumulative_us, name in slowest:
+            print(f"{'':<6}{name:<40} self {self_us / 1000:>7.1f} ms, cumulative {cumulative_us / 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
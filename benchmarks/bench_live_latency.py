@@ -0,0 +1,145 @@
+"""End-of-speech to first-response latency of live audio streaming.
+
+Starts a local websocket stand-in for the Gemini Live endpoint. The
+stand-in answers every turn after --model-delay ms, streaming the reply in a
+few text pieces. The script then streams paced 100 ms chunks of synthetic
+speech into it, exactly as the live mode does, and reports the latency
+stand-in delay plus transport and session overhead. With an API key
+(--api-key or GEMINI_API_KEY) the same audio is also sent to a real Live
+model.
+
+The node itself can be pointed at the stand-in by setting LIVE_WEBSOCKET_URL
+in config.json to the printed ws:// address (use --serve to keep it running).
+
+Usage:
+    python benchmarks/bench_live_latency.py [--turns 5] [--seconds 3] [--model-delay 300]
+        [--serve] [--api-key KEY] [--model gemini-live-2.5-flash-preview]
+
+Needs the websockets package (installed with google-genai).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
+
+from gemini_common.live import (  # noqa: E402
+    CHUNK_SECONDS,
+    LIVE_SAMPLE_RATE,
+    live_config,
+    pcm16,
+    sdk_connector,
+    stream_turn,
+    websocket_connector,
+)
+
+REPLY = ["I heard ", "a short ", "spoken request."]
+
+
+def synthetic_speech(seconds):
+    t = np.arange(int(seconds * LIVE_SAMPLE_RATE)) / LIVE_SAMPLE_RATE
+    voiced = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+    return (0.2 * voiced * (np.sin(2 * np.pi * 3 * t) > -0.3)).astype(np.float32)
+
+
+class PacedChunks:
+    """Chunks of a waveform released in real time, like a microphone"""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.chunk = int(LIVE_SAMPLE_RATE * CHUNK_SECONDS)
+        self.speech_end = None
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        for i, offset in enumerate(range(0, len(self.samples), self.chunk)):
+            await asyncio.sleep(max(0.0, start + (i + 1) * CHUNK_SECONDS - time.perf_counter()))
+            yield pcm16(self.samples[offset : offset + self.chunk])
+        self.speech_end = time.perf_counter()
+
+
+def stand_in(model_delay):
+    """Websocket handler imitating a Live session that answers in text"""
+
+    async def handler(websocket):
+        setup = json.loads(await websocket.recv())
+        if "setup" not in setup:
+            await websocket.close()
+            return
+        await websocket.send(json.dumps({"setupComplete": {}}))
+        async for raw in websocket:
+            message = json.loads(raw).get("realtimeInput") or {}
+            if not message.get("audioStreamEnd"):
+                continue
+            await asyncio.sleep(model_delay)
+            for piece in REPLY:
+                await websocket.send(
+                    json.dumps({"serverContent": {"modelTurn": {"parts": [{"text": piece}]}}})
+                )
+                await asyncio.sleep(0.02)
+            await websocket.send(json.dumps({"serverContent": {"turnComplete": True}}))
+
+    return handler
+
+
+async def measure(connect, samples, turns):
+    latencies = []
+    for _ in range(turns):
+        result = await stream_turn(connect, PacedChunks(samples))
+        if result.latency is not None:
+            latencies.append(result.latency)
+    return result, latencies
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms over {len(ordered)} turns"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--model-delay", type=float, default=300, help="stand-in reply delay, ms")
+    parser.add_argument("--serve", action="store_true", help="keep the stand-in running")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"))
+    parser.add_argument("--model", default="gemini-live-2.5-flash-preview")
+    args = parser.parse_args()
+
+    import websockets
+
+    samples = synthetic_speech(args.seconds)
+    delay = args.model_delay / 1000
+    async with websockets.serve(stand_in(delay), "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}"
+        print(f"stand-in listening on {url}")
+
+        connect = websocket_connector(url, args.model, live_config("text"))
+        result, latencies = await measure(connect, samples, args.turns)
+        print(f"reply: {result.text!r}")
+        print(f"stand-in: {summary(latencies)}")
+        overhead = [latency - delay for latency in latencies]
+        print(f"overhead beyond the {args.model_delay:g} ms model delay: {summary(overhead)}")
+
+        if args.api_key:
+            connect = sdk_connector(
+                args.api_key, args.model, live_config("text", "Reply in one short sentence.")
+            )
+            result, latencies = await measure(connect, samples, args.turns)
+            print(f"{args.model}: {summary(latencies)}")
+
+        if args.serve:
+            print("serving until interrupted")
+            await asyncio.Future()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""Peak RSS of building and serializing a multi-image request payload.
+
+Compares the old construction (base64 strings inside dicts) with raw-bytes
+SDK parts. Each variant runs in a fresh subprocess so the peak resident set
+size of one does not hide the other.
+
+Usage:
+    python benchmarks/bench_payload_memory.py [--images 16] [--size 1024]
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+MODES = ["base64_dicts", "raw_bytes_parts"]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_payloads(count, size):
+    rng = np.random.default_rng(0)
+    payloads = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        buffer = BytesIO()
+        Image.fromarray(pixels, mode="RGB").save(buffer, format="PNG", compress_level=1)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+
+def build_base64_dicts(payloads):
+    """Request construction before raw-bytes parts"""
+    import google.generativeai as genai
+
+    parts = [{"text": "Describe these images."}]
+    for data in payloads:
+        parts.append(
+            {
+                "inline_data": {
+                    "mime_type": "image/png",
+                    "data": base64.b64encode(data).decode("utf-8"),
+                }
+            }
+        )
+    content = genai.protos.Content(
+        parts=[
+            genai.protos.Part(
+                inline_data=genai.protos.Blob(
+                    mime_type=part["inline_data"]["mime_type"],
+                    data=base64.b64decode(part["inline_data"]["data"]),
+                )
+            )
+            if "inline_data" in part
+            else genai.protos.Part(text=part["text"])
+            for part in parts
+        ]
+    )
+    return genai.protos.Content.to_json(content)
+
+
+def build_raw_bytes_parts(payloads):
+    """Request construction with SDK-native byte parts"""
+    import google.generativeai as genai
+
+    sys.path.append(
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes")
+    )
+    from gemini_common.parts import inline_part
+
+    parts = [genai.protos.Part(text="Describe these images.")]
+    for data in payloads:
+        parts.append(inline_part(data, "image/png"))
+    content = genai.protos.Content(parts=parts)
+    return genai.protos.Content.to_json(content)
+
+
+def run_child(mode, count, size):
+    import google.generativeai  # noqa: F401  (import cost is not part of the measurement)
+
+    payloads = make_payloads(count, size)
+    payload_mb = sum(len(data) for data in payloads) / (1024 * 1024)
+    baseline = peak_rss_mb()
+    builder = build_base64_dicts if mode == "base64_dicts" else build_raw_bytes_parts
+    body = builder(payloads)
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "payload_mb": payload_mb,
+                "body_mb": len(body) / (1024 * 1024),
+                "peak_increase_mb": peak_rss_mb() - baseline,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--child", choices=MODES)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.images, args.size)
+        return
+
+    print(f"{'mode':<20}{'payload MB':>12}{'body MB':>10}{'peak RSS +MB':>14}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode,
+             "--images", str(args.images), "--size", str(args.size)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:<20}{result['payload_mb']:>12.1f}{result['body_mb']:>10.1f}"
+            f"{result['peak_increase_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
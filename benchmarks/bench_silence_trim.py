@@ -0,0 +1,79 @@
+"""Silence trimming time against recording length.
+
+Compares the per-sample Python loop the audio recorder used to trim
+trailing silence with the vectorized trim_silence, and times the
+callback path (ring buffer write plus silence detection) per 100 ms block.
+
+Usage:
+    python benchmarks/bench_silence_trim.py [--rate 44100] [--lengths 10 60 300 900]
+
+Each synthetic recording is speech-like noise for its first half followed
+by quiet background noise, the worst case for the old backwards scan.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
+
+from gemini_common.recording import RingBuffer, SilenceDetector, trim_silence  # noqa: E402
+
+THRESHOLD = 0.01
+
+
+def recording(seconds, rate):
+    rng = np.random.default_rng(0)
+    frames = int(seconds * rate)
+    audio = rng.normal(0, 0.002, (frames, 1)).astype(np.float32)
+    audio[: frames // 2] += rng.normal(0, 0.1, (frames // 2, 1)).astype(np.float32)
+    return audio
+
+
+def loop_trim(audio_data, threshold, sample_rate):
+    """The recorder's previous trailing-silence trim"""
+    for i in range(len(audio_data) - 1, -1, -1):
+        if abs(audio_data[i]) > threshold:
+            return audio_data[: i + int(sample_rate * 0.2)]
+    return audio_data
+
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--lengths", type=float, nargs="+", default=[10, 60, 300, 900])
+    args = parser.parse_args()
+
+    print(f"{'seconds':>8}{'loop ms':>12}{'vectorized ms':>15}{'callback us/block':>19}")
+    for seconds in args.lengths:
+        audio = recording(seconds, args.rate)
+        loop_ms = best_of(lambda: loop_trim(audio, THRESHOLD, args.rate), repeat=1)
+        vector_ms = best_of(lambda: trim_silence(audio, THRESHOLD, args.rate))
+
+        block = int(args.rate * 0.1)
+        blocks = [audio[i : i + block] for i in range(0, len(audio) - block + 1, block)]
+
+        def callbacks():
+            buffer = RingBuffer(len(audio))
+            detector = SilenceDetector(THRESHOLD, 2.0, args.rate)
+            for data in blocks:
+                buffer.write(data)
+                detector.update(data)
+
+        callback_us = best_of(callbacks) * 1000 / max(1, len(blocks))
+        print(f"{seconds:>8g}{loop_ms:>12.1f}{vector_ms:>15.2f}{callback_us:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Payload size and latency of sending video as PNG frames vs one encoded clip.
+
+Compares the frame stack the nodes send in video_mode "frames" (6 frames,
+512px PNG) with MP4 and WebM clips. With an API key (--api-key or the
+GEMINI_API_KEY environment variable) every payload is also sent to the model
+and the end-to-end request latency is measured.
+
+Usage:
+    python benchmarks/bench_video_payload.py [--video clip.mp4] [--frames 240]
+        [--api-key KEY] [--model gemini-2.0-flash] [--repeat 3]
+
+Without --video a synthetic 10 second, 24 fps clip with camera motion and
+two scene cuts is used. Clip modes need ffmpeg on PATH (or FFMPEG_PATH);
+--video also needs ffprobe.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
+
+from gemini_common.media import (  # noqa: E402
+    ImageEncoding,
+    encode_images,
+    sample_frame_indices,
+    tensor_batch_to_pil,
+)
+from gemini_common.video import VideoClip, encode_video_clip, find_ffmpeg  # noqa: E402
+
+PROMPT = "Describe what happens in this video."
+
+
+def synthetic_video(frames, height=540, width=960):
+    """Scrolling gradients with noise and two hard cuts, as [T, H, W, 3] floats"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    video = np.empty((frames, height, width, 3), dtype=np.float32)
+    for t in range(frames):
+        scene = 3 * t // frames
+        shift = 4.0 * t
+        phase = scene * 2.1
+        video[t, ..., 0] = 0.5 + 0.4 * np.sin((x + shift) / 90 + phase)
+        video[t, ..., 1] = 0.5 + 0.4 * np.cos((y - shift / 2) / 70 + phase)
+        video[t, ..., 2] = 0.5 + 0.3 * np.sin((x + y + shift) / 150 + 2 * phase)
+    video += rng.normal(0, 0.02, video.shape).astype(np.float32)
+    return torch.from_numpy(np.clip(video, 0, 1))
+
+
+def load_video(path, max_frames, width=960):
+    """Decode a video file with ffmpeg into a [T, H, W, 3] float tensor"""
+    source_width, source_height = (
+        int(v)
+        for v in subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height", "-of", "csv=p=0", path],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip().split(",")[:2]
+    )
+    height = round(source_height * width / source_width / 2) * 2
+    raw = subprocess.run(
+        [find_ffmpeg(), "-loglevel", "error", "-i", path, "-frames:v", str(max_frames),
+         "-vf", f"scale={width}:{height}", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
+        capture_output=True, check=True,
+    ).stdout
+    frames = np.frombuffer(raw, dtype=np.uint8).reshape(-1, height, width, 3)
+    return torch.from_numpy(frames.astype(np.float32) / 255.0)
+
+
+def png_frames_payload(video):
+    indices = torch.from_numpy(sample_frame_indices(video.shape[0], 6))
+    pils = tensor_batch_to_pil(video[indices], 512)
+    return [(data, "image/png") for data in encode_images(pils, ImageEncoding("png"))]
+
+
+def clip_payload(container):
+    def build(video):
+        clip = VideoClip("clip", container)
+        return [(encode_video_clip(video, clip), clip.mime_type)]
+
+    return build
+
+
+MODES = {
+    "png_frames": png_frames_payload,
+    "mp4_clip": clip_payload("mp4"),
+    "webm_clip": clip_payload("webm"),
+}
+
+
+def send(model, payload):
+    from gemini_common.parts import inline_part
+
+    parts = [{"text": PROMPT}] + [inline_part(data, mime) for data, mime in payload]
+    start = time.perf_counter()
+    model.generate_content([{"parts": parts}]).text
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video")
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"))
+    parser.add_argument("--model", default="gemini-2.0-flash")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    video = load_video(args.video, args.frames) if args.video else synthetic_video(args.frames)
+    print(f"video: {video.shape[0]} frames of {video.shape[2]}x{video.shape[1]}")
+
+    model = None
+    if args.api_key:
+        import google.generativeai as genai
+
+        genai.configure(api_key=args.api_key, transport="rest")
+        model = genai.GenerativeModel(f"models/{args.model}")
+
+    print(f"{'mode':<12}{'parts':>6}{'KiB':>10}{'encode ms':>11}{'request s':>11}")
+    for name, build in MODES.items():
+        start = time.perf_counter()
+        try:
+            payload = build(video)
+        except RuntimeError as e:
+            print(f"{name:<12} skipped: {e}")
+            continue
+        encode_ms = (time.perf_counter() - start) * 1000
+        size_kib = sum(len(data) for data, _ in payload) / 1024
+
+        latency = ""
+        if model is not None:
+            timings = sorted(send(model, payload) for _ in range(args.repeat))
+            latency = f"{timings[len(timings) // 2]:.2f}"
+        print(f"{name:<12}{len(payload):>6}{size_kib:>10.1f}{encode_ms:>11.1f}{latency:>11}")
+
+
+if __name__ == "__main__":
+    main()
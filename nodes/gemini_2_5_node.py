@@ -1,16 +1,36 @@
 # Gemini 2.5 Node
 import os
+import sys
 import json
-import base64
-import requests
-import google.generativeai as genai
-from io import BytesIO
 from PIL import Image
 import torch
-import torchaudio
 import numpy as np
 
 p = os.path.dirname(os.path.realpath(__file__))
+if p not in sys.path:
+    sys.path.append(p)
+
+from gemini_common.api_keys import remember_api_key, stored_api_key
+from gemini_common.audio import (AUDIO_FORMATS, DEFAULT_AUDIO_FORMAT, analyze_audio_chunks, encode_audio,
+                                  mono_waveform)
+from gemini_common.batching import DEFAULT_MAX_CONCURRENCY, run_concurrently
+from gemini_common.chat import (CHAT_OUTPUTS, COMPACTION_MODES, DEFAULT_TOKEN_BUDGET, ChatHistory,
+                                history_summarizer)
+from gemini_common.client import (configure_legacy, get_client, get_generative_model,
+                                   legacy_generation_config, request_seed)
+from gemini_common.context_cache import DEFAULT_TTL, get_context_cache, split_cacheable_prefix
+from gemini_common.live import (LIVE_RESPONSES, LIVE_SAMPLE_RATE, AudioPlayer, WaveformChunks, live_config,
+                                run_live_turn, sdk_connector, websocket_connector)
+from gemini_common.media import (DEFAULT_ENCODING, IMAGE_FITS, IMAGE_FORMATS, ImageEncoding, decode_images,
+                                  encode_image_input)
+from gemini_common.media_refs import get_media_registry
+from gemini_common.parts import genai_inline_part, genai_text_part, inline_part
+from gemini_common.response_cache import get_response_cache, response_cache_key
+from gemini_common.retry import RetryPolicy, RetryState, call_with_retry, error_status
+from gemini_common.scheduler import PRIORITIES, estimate_tokens, get_scheduler
+from gemini_common.streaming import collect_stream, send_stream_event
+from gemini_common.video import (CLIP_FORMATS, FRAME_SELECTION_MODES, VIDEO_MODES, FrameSelection, VideoClip,
+                                  analyze_video_segments, encode_video_clip, frame_indices)
 
 def get_config():
     try:
@@ -26,60 +46,17 @@ def save_config(config):
     with open(config_path, 'w') as f:
         json.dump(config, f, indent=4)
 
-class ChatHistory:
-    def __init__(self):
-        self.messages = []
-    
-    def add_message(self, role, content):
-        if isinstance(content, list):
-            content = " ".join(str(item) for item in content if isinstance(item, str))
-        self.messages.append({"role": role, "content": content})
-    
-    def get_formatted_history(self):
-        formatted = "\n=== Chat History ===\n"
-        for msg in self.messages:
-            formatted += f"{msg['role'].upper()}: {msg['content']}\n"
-        formatted += "=== End History ===\n"
-        return formatted
-    
-    def get_messages_for_api(self):
-        api_messages = []
-        for msg in self.messages:
-            if isinstance(msg["content"], str):
-                api_messages.append({
-                    "role": msg["role"],
-                    "parts": [{"text": msg["content"]}]
-                })
-        return api_messages
-    
-    def clear(self):
-        self.messages = []
-
 class Gemini25:
     def __init__(self, api_key=None):
-        env_key = os.environ.get("GEMINI_API_KEY")
-
-        # Common placeholder values to ignore
-        placeholders = {"token_here", "place_token_here", "your_api_key",
-                        "api_key_here", "enter_your_key", "<api_key>"}
-
-        if env_key and env_key.lower().strip() not in placeholders:
-            self.api_key = env_key
-        else:
-            # Try the provided api_key parameter
-            self.api_key = api_key
-
-            # If still not found, try to get from config
-            if self.api_key is None:
-                config = get_config()
-                self.api_key = config.get("GEMINI_API_KEY")
+        # The environment, then the provided api_key parameter, then config
+        self.api_key = stored_api_key(get_config(), api_key)
 
         self.chat_history = ChatHistory()
         if self.api_key is not None:
             self.configure_genai()
 
     def configure_genai(self):
-        genai.configure(api_key=self.api_key, transport='rest')
+        configure_legacy(self.api_key, transport='rest')
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -114,82 +91,83 @@ class Gemini25:
                 "max_images": ("INT", {"default": 6, "min": 1, "max": 16, "step": 1}),
                 "batch_count": ("INT", {"default": 1, "min": 1, "max": 4, "step": 1}),
                 "seed": ("INT", {"default": 0, "min": 0}),
-            }
+                "max_concurrent_requests": ("INT", {"default": DEFAULT_MAX_CONCURRENCY, "min": 1, "max": 16, "step": 1}),
+                "bypass_cache": ("BOOLEAN", {"default": False}),
+                "image_encoding": (IMAGE_FORMATS, {"default": "png"}),
+                "image_quality": ("INT", {"default": 90, "min": 1, "max": 100, "step": 1}),
+                "png_compress_level": ("INT", {"default": 6, "min": 0, "max": 9, "step": 1}),
+                "image_fit": (IMAGE_FITS, {"default": "pad"}),
+                "stream_output": ("BOOLEAN", {"default": False}),
+                "max_retries": ("INT", {"default": 3, "min": 0, "max": 10, "step": 1}),
+                "retry_deadline": ("FLOAT", {"default": 120.0, "min": 0.0, "max": 600.0, "step": 1.0}),
+                "priority": (PRIORITIES, {"default": "interactive"}),
+                "history_token_budget": ("INT", {"default": DEFAULT_TOKEN_BUDGET, "min": 0, "max": 1000000, "step": 1000}),
+                "history_compaction": (COMPACTION_MODES, {"default": "summarize"}),
+                "chat_output": (CHAT_OUTPUTS, {"default": "full_history"}),
+                "context_cache": ("BOOLEAN", {"default": False}),
+                "context_cache_ttl": ("INT", {"default": DEFAULT_TTL, "min": 60, "max": 86400, "step": 60}),
+                "frame_selection": (FRAME_SELECTION_MODES, {"default": "uniform"}),
+                "max_frames": ("INT", {"default": 6, "min": 1, "max": 64, "step": 1}),
+                "video_token_budget": ("INT", {"default": 0, "min": 0, "max": 1000000, "step": 258}),
+                "video_mode": (VIDEO_MODES, {"default": "frames"}),
+                "clip_format": (CLIP_FORMATS, {"default": "mp4"}),
+                "clip_fps": ("FLOAT", {"default": 4.0, "min": 0.5, "max": 30.0, "step": 0.5}),
+                "source_fps": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 120.0, "step": 1.0}),
+                "clip_size": ("INT", {"default": 512, "min": 64, "max": 2048, "step": 16}),
+                "segment_seconds": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 3600.0, "step": 5.0}),
+                "audio_format": (AUDIO_FORMATS, {"default": DEFAULT_AUDIO_FORMAT}),
+                "audio_chunk_seconds": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 3600.0, "step": 5.0}),
+                "live_mode": ("BOOLEAN", {"default": False}),
+                "live_response": (LIVE_RESPONSES, {"default": "text"}),
+            },
+            "hidden": {"unique_id": "UNIQUE_ID"}
         }
 
-    RETURN_TYPES = ("STRING", "IMAGE")
-    RETURN_NAMES = ("generated_content", "generated_images")
+    @classmethod
+    def IS_CHANGED(cls, chat_mode=False, live_mode=False, **kwargs):
+        # Chat turns depend on ChatHistory state and live turns on the
+        # microphone, so they always run; other runs are left to ComfyUI's
+        # own input caching
+        if chat_mode or live_mode:
+            return float("nan")
+        return False
+
+    RETURN_TYPES = ("STRING", "IMAGE", "STRING")
+    RETURN_NAMES = ("generated_content", "generated_images", "status")
     FUNCTION = "generate_content"
     CATEGORY = "Gemini 2.5"
 
-    def tensor_to_image(self, tensor):
-        tensor = tensor.cpu()
-        if len(tensor.shape) == 4:
-            if tensor.shape[0] == 1:
-                tensor = tensor.squeeze(0)
-            else:
-                tensor = tensor[0]
-                
-        image_np = tensor.squeeze().mul(255).clamp(0, 255).byte().numpy()
-        image = Image.fromarray(image_np, mode='RGB')
-        return image
-
-    def resize_image(self, image, max_size):
-        width, height = image.size
-        if width > height:
-            if width > max_size:
-                height = int(max_size * height / width)
-                width = max_size
-        else:
-            if height > max_size:
-                width = int(max_size * width / height)
-                height = max_size
-        return image.resize((width, height), Image.LANCZOS)
-
-    def sample_video_frames(self, video_tensor, num_samples=6):
-        """Sample frames evenly from video tensor"""
+    def sample_video_frames(self, video_tensor, selection=None):
+        """Pick the frames of a video tensor to send, evenly or at scene changes"""
         if len(video_tensor.shape) != 4:
             return None
 
-        total_frames = video_tensor.shape[0]
-        if total_frames <= num_samples:
-            indices = range(total_frames)
-        else:
-            indices = np.linspace(0, total_frames - 1, num_samples, dtype=int)
+        indices = frame_indices(video_tensor, selection)
+        return video_tensor[torch.from_numpy(indices)]
 
-        frames = []
-        for idx in indices:
-            frame = self.tensor_to_image(video_tensor[idx])
-            frame = self.resize_image(frame, 512)
-            frames.append(frame)
-        return frames
+    def video_clip_part(self, video, video_clip=None):
+        """The video encoded as one clip part, or None to send frames instead"""
+        if video_clip is None or video_clip.mode != "clip":
+            return None
+        if len(video.shape) != 4 or video.shape[0] < 2:
+            return None
+        try:
+            return inline_part(encode_video_clip(video, video_clip), video_clip.mime_type)
+        except (RuntimeError, OSError) as e:
+            print(f"Sending video frames instead of a clip: {e}")
+            return None
 
-    def prepare_content(self, prompt, input_type, Additional_Context=None, images=None, video=None, audio=None, max_images=6):
+    def prepare_content(self, prompt, input_type, Additional_Context=None, images=None, video=None, audio=None, max_images=6,
+                        encoding=None, frame_selection=None, video_clip=None,
+                        audio_format=DEFAULT_AUDIO_FORMAT):
+        encoding = encoding or DEFAULT_ENCODING
         if input_type == "text":
             text_content = prompt if not Additional_Context else f"{prompt}\n{Additional_Context}"
             return [{"text": text_content}]
                 
         elif input_type == "image":
-            all_images = []
-            
-            if images is not None:
-                if isinstance(images, torch.Tensor):
-                    if len(images.shape) == 4:
-                        num_images = min(images.shape[0], max_images)
-                        
-                        for i in range(num_images):
-                            pil_image = self.tensor_to_image(images[i])
-                            pil_image = self.resize_image(pil_image, 1024)
-                            all_images.append(pil_image)
-                    else:
-                        pil_image = self.tensor_to_image(images)
-                        pil_image = self.resize_image(pil_image, 1024)
-                        all_images.append(pil_image)
-                elif isinstance(images, list):
-                    for img_tensor in images[:max_images]:
-                        pil_image = self.tensor_to_image(img_tensor)
-                        pil_image = self.resize_image(pil_image, 1024)
-                        all_images.append(pil_image)
+            # Batch tensor, single tensor or list; encoded payloads are reused from the media cache
+            all_images = encode_image_input(images, max_images, 1024, encoding)
                         
             if all_images:
                 if len(all_images) > 1:
@@ -199,87 +177,97 @@ class Gemini25:
                     
                 parts = [{"text": modified_prompt}]
                 
-                for idx, img in enumerate(all_images):
-                    img_byte_arr = BytesIO()
-                    img.save(img_byte_arr, format='PNG')
-                    img_byte_arr = img_byte_arr.getvalue()
-                    
-                    parts.append({
-                        "inline_data": {
-                            "mime_type": "image/png",
-                            "data": base64.b64encode(img_byte_arr).decode('utf-8')
-                        }
-                    })
+                for img_byte_arr in all_images:
+                    parts.append(inline_part(img_byte_arr, encoding.mime_type))
                 
                 return [{"parts": parts}]
             else:
                 raise ValueError("No valid images provided")
                 
         elif input_type == "video" and video is not None:
-            frames = self.sample_video_frames(video)
-            if frames:
+            # One compressed clip keeps the motion and is far smaller than frames
+            clip_part = self.video_clip_part(video, video_clip)
+            if clip_part is not None:
+                return [{"parts": [{"text": f"Analyzing this video. {prompt}"}, clip_part]}]
+            
+            frames = self.sample_video_frames(video, frame_selection)
+            if frames is not None and len(frames):
                 parts = [{"text": f"Analyzing video frames. {prompt}"}]
-                for frame in frames:
-                    img_byte_arr = BytesIO()
-                    frame.save(img_byte_arr, format='PNG')
-                    img_byte_arr = img_byte_arr.getvalue()
-                    
-                    parts.append({
-                        "inline_data": {
-                            "mime_type": "image/png",
-                            "data": base64.b64encode(img_byte_arr).decode('utf-8')
-                        }
-                    })
+                for img_byte_arr in encode_image_input(frames, len(frames), 512, encoding):
+                    parts.append(inline_part(img_byte_arr, encoding.mime_type))
                 return [{"parts": parts}]
             else:
                 raise ValueError("Invalid video format")
                     
         elif input_type == "audio" and audio is not None:
-            waveform = audio["waveform"]
-            sample_rate = audio["sample_rate"]
-            
-            if waveform.dim() == 3:
-                waveform = waveform.squeeze(0)
-            elif waveform.dim() == 1:
-                waveform = waveform.unsqueeze(0)
-            
-            if waveform.shape[0] > 1:
-                waveform = torch.mean(waveform, dim=0, keepdim=True)
-            
-            if sample_rate != 16000:
-                waveform = torchaudio.functional.resample(waveform, sample_rate, 16000)
-            
-            buffer = BytesIO()
-            torchaudio.save(buffer, waveform, 16000, format="WAV")
-            audio_bytes = buffer.getvalue()
+            audio_bytes, mime_type = encode_audio(audio, audio_format)
             
             return [{
                 "parts": [
                     {"text": prompt},
-                    {
-                        "inline_data": {
-                            "mime_type": "audio/wav",
-                            "data": base64.b64encode(audio_bytes).decode('utf-8')
-                        }
-                    }
+                    inline_part(audio_bytes, mime_type)
                 ]
             }]
         else:
             raise ValueError(f"Invalid or missing input for {input_type}")
 
+    def generate_live(self, prompt, model_version, audio=None, Additional_Context=None, live_response="text",
+                      priority="interactive", unique_id=None):
+        """Stream audio into a Gemini Live session and collect the response as it arrives"""
+        try:
+            if audio is None:
+                raise ValueError("Live mode needs an audio input")
+            # The recorder's live mode passes a microphone source; a finished
+            # recording is streamed in the same 100 ms chunks
+            source = audio.get("live_source")
+            if source is None:
+                source = WaveformChunks(mono_waveform(audio, LIVE_SAMPLE_RATE).numpy())
+            
+            instruction = prompt if not Additional_Context else f"{prompt}\n{Additional_Context}"
+            config = live_config(live_response, instruction)
+            url = get_config().get("LIVE_WEBSOCKET_URL")
+            if url:
+                connect = websocket_connector(url, model_version, config)
+            else:
+                connect = sdk_connector(self.api_key, model_version, config)
+            
+            player = AudioPlayer() if live_response == "audio" else None
+            send_stream_event(unique_id, event="start")
+            try:
+                with get_scheduler(get_config()).slot(model_version, 0, priority):
+                    result = run_live_turn(
+                        connect, source,
+                        on_text=lambda text: send_stream_event(unique_id, event="delta", text=text),
+                        on_audio=player.play if player is not None else None
+                    )
+            finally:
+                send_stream_event(unique_id, event="done")
+                if player is not None:
+                    player.close()
+            
+            return result.text, self.create_placeholder_image(), result.describe()
+        except Exception as e:
+            error_msg = f"Error in live session: {str(e)}"
+            print(error_msg)
+            return error_msg, self.create_placeholder_image(), error_msg
+
     def create_placeholder_image(self):
         """Create a placeholder image tensor when generation fails"""
         img = Image.new('RGB', (512, 512), color=(73, 109, 137))
         image_array = np.array(img).astype(np.float32) / 255.0
         return torch.from_numpy(image_array).unsqueeze(0)
 
-    def generate_images(self, prompt, model_version, images=None, batch_count=1, temperature=0.4, seed=0, max_images=6):
+    def generate_images(self, prompt, model_version, images=None, batch_count=1, temperature=0.4, seed=0, max_images=6,
+                        max_concurrent_requests=DEFAULT_MAX_CONCURRENCY, cache_key=None, encoding=None,
+                        retry_policy=None, priority="interactive", image_fit="pad"):
         """Generate images using Gemini 2.5 model"""
+        encoding = encoding or DEFAULT_ENCODING
+        retry_policy = retry_policy or RetryPolicy()
+        scheduler = get_scheduler(get_config())
         try:
-            from google import genai
             from google.genai import types
             
-            client = genai.Client(api_key=self.api_key)
+            client = get_client(self.api_key, pool_size=get_config().get("HTTP_POOL_SIZE"))
             
             generation_config = types.GenerateContentConfig(
                 temperature=temperature,
@@ -288,120 +276,127 @@ class Gemini25:
             
             content_parts = []
             if images is not None:
-                all_images = []
-                if isinstance(images, torch.Tensor):
-                    if len(images.shape) == 4:
-                        num_images = min(images.shape[0], max_images)
-                        for i in range(num_images):
-                            pil_image = self.tensor_to_image(images[i])
-                            pil_image = self.resize_image(pil_image, 1024)
-                            all_images.append(pil_image)
-                    else:
-                        pil_image = self.tensor_to_image(images)
-                        pil_image = self.resize_image(pil_image, 1024)
-                        all_images.append(pil_image)
-                elif isinstance(images, list):
-                    for img_tensor in images[:max_images]:
-                        pil_image = self.tensor_to_image(img_tensor)
-                        pil_image = self.resize_image(pil_image, 1024)
-                        all_images.append(pil_image)
+                all_images = encode_image_input(images, max_images, 1024, encoding)
                 
                 if all_images:
                     content_text = f"Generate a new image in the style of these reference images: {prompt}"
-                    parts = [{"text": content_text}]
+                    parts = [genai_text_part(content_text)]
                     
-                    for img in all_images:
-                        img_byte_arr = BytesIO()
-                        img.save(img_byte_arr, format='PNG')
-                        img_bytes = img_byte_arr.getvalue()
-                        
-                        parts.append({
-                            "inline_data": {
-                                "mime_type": "image/png",
-                                "data": base64.b64encode(img_bytes).decode('utf-8')
-                            }
-                        })
+                    for img_bytes in all_images:
+                        parts.append(genai_inline_part(img_bytes, encoding.mime_type))
                     
-                    content_parts = [{"parts": parts}]
+                    content_parts = [types.Content(role="user", parts=parts)]
             else:
                 content_text = f"Generate a detailed, high-quality image of: {prompt}"
-                content_parts = [{"parts": [{"text": content_text}]}]
+                content_parts = [types.Content(role="user", parts=[genai_text_part(content_text)])]
+            
+            request_tokens = estimate_tokens(content_parts)
+            
+            def run_batch(i):
+                # Offset the seed per batch so seeded batches differ but stay reproducible
+                batch_config = generation_config
+                batch_seed = request_seed(seed, i)
+                if batch_seed is not None:
+                    batch_config = generation_config.model_copy(update={"seed": batch_seed})
+                
+                def send_batch():
+                    # Every attempt waits for a slot under the model's rate limits
+                    with scheduler.slot(model_version, request_tokens, priority) as slot:
+                        response = client.models.generate_content(
+                            model=model_version,
+                            contents=content_parts,
+                            config=batch_config
+                        )
+                        slot.record_usage(response)
+                        return response
+                
+                response = call_with_retry(send_batch, retry_policy, retry_states[i])
+                
+                batch_images = []
+                response_text = ""
+                
+                if hasattr(response, 'candidates') and response.candidates:
+                    for candidate in response.candidates:
+                        if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
+                            for part in candidate.content.parts:
+                                if hasattr(part, 'text') and part.text:
+                                    response_text += part.text + "\n"
+                                
+                                if hasattr(part, 'inline_data') and part.inline_data:
+                                    try:
+                                        image_binary = part.inline_data.data
+                                        batch_images.append(image_binary)
+                                    except Exception as img_error:
+                                        print(f"Error extracting image from response: {str(img_error)}")
+                
+                return batch_images, response_text
             
             all_generated_images = []
             status_text = ""
+            complete = True
+            retry_states = [RetryState() for _ in range(batch_count)]
             
-            for i in range(batch_count):
-                try:
-                    response = client.models.generate_content(
-                        model=model_version,
-                        contents=content_parts,
-                        config=generation_config
-                    )
-                    
-                    batch_images = []
-                    response_text = ""
-                    
-                    if hasattr(response, 'candidates') and response.candidates:
-                        for candidate in response.candidates:
-                            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                                for part in candidate.content.parts:
-                                    if hasattr(part, 'text') and part.text:
-                                        response_text += part.text + "\n"
-                                    
-                                    if hasattr(part, 'inline_data') and part.inline_data:
-                                        try:
-                                            image_binary = part.inline_data.data
-                                            batch_images.append(image_binary)
-                                        except Exception as img_error:
-                                            print(f"Error extracting image from response: {str(img_error)}")
-                    
-                    if batch_images:
-                        all_generated_images.extend(batch_images)
-                        status_text += f"Batch {i+1}: Generated {len(batch_images)} images\n"
-                    else:
-                        status_text += f"Batch {i+1}: No images found in response. Text response: {response_text[:100]}...\n"
+            # Dispatch the batches concurrently; results come back in batch order
+            batch_results = run_concurrently(run_batch, range(batch_count), max_workers=max_concurrent_requests)
+            for i, (result, batch_error) in enumerate(batch_results):
+                retries = retry_states[i].describe()
+                if batch_error is not None:
+                    complete = False
+                    status_text += f"Batch {i+1} error{retries}: {str(batch_error)}\n"
+                    continue
                 
-                except Exception as batch_error:
-                    status_text += f"Batch {i+1} error: {str(batch_error)}\n"
+                batch_images, response_text = result
+                if batch_images:
+                    all_generated_images.extend(batch_images)
+                    status_text += f"Batch {i+1}: Generated {len(batch_images)} images{retries}\n"
+                else:
+                    complete = False
+                    status_text += f"Batch {i+1}: No images found in response{retries}. Text response: {response_text[:100]}...\n"
             
             if all_generated_images:
-                tensors = []
-                for img_binary in all_generated_images:
-                    try:
-                        image = Image.open(BytesIO(img_binary))
-                        
-                        if image.mode != "RGB":
-                            image = image.convert("RGB")
-                        
-                        img_np = np.array(image).astype(np.float32) / 255.0
-                        img_tensor = torch.from_numpy(img_np)[None,]
-                        tensors.append(img_tensor)
-                    except Exception as e:
-                        print(f"Error processing image: {e}")
+                image_tensors = decode_images(all_generated_images, image_fit)
                 
-                if tensors:
-                    image_tensors = torch.cat(tensors, dim=0)
-                    
-                    result_text = f"Successfully generated {len(tensors)} images using {model_version}.\n"
+                if image_tensors is not None:
+                    result_text = f"Successfully generated {image_tensors.shape[0]} images using {model_version}.\n"
                     result_text += f"Prompt: {prompt}\n"
                     result_text += f"Details: {status_text}"
                     
-                    return result_text, image_tensors
+                    # Only a run where every batch produced images is reused
+                    if cache_key is not None and complete:
+                        get_response_cache(get_config()).put(cache_key, result_text, image_tensors)
+                    
+                    return result_text, image_tensors, status_text.strip()
             
-            return f"No images were generated with {model_version}. Details:\n{status_text}", self.create_placeholder_image()
+            return (f"No images were generated with {model_version}. Details:\n{status_text}",
+                    self.create_placeholder_image(), status_text.strip())
             
         except Exception as e:
             error_msg = f"Error in image generation: {str(e)}"
             print(error_msg)
-            return error_msg, self.create_placeholder_image()
+            return error_msg, self.create_placeholder_image(), error_msg
 
     def generate_content(self, prompt, input_type, model_version="gemini-2.5-flash-image-preview", 
                         operation_mode="analysis", chat_mode=False, clear_history=False,
                         Additional_Context=None, images=None, video=None, audio=None, 
                         api_key="", max_images=6, batch_count=1, seed=0,
-                        max_output_tokens=8192, temperature=0.4, structured_output=False):
+                        max_output_tokens=8192, temperature=0.4, structured_output=False,
+                        max_concurrent_requests=DEFAULT_MAX_CONCURRENCY, bypass_cache=False,
+                        image_encoding="png", image_quality=90, png_compress_level=6, image_fit="pad",
+                        stream_output=False, max_retries=3, retry_deadline=120.0,
+                        priority="interactive", history_token_budget=DEFAULT_TOKEN_BUDGET,
+                        history_compaction="summarize", chat_output="full_history",
+                        context_cache=False, context_cache_ttl=DEFAULT_TTL,
+                        frame_selection="uniform", max_frames=6, video_token_budget=0,
+                        video_mode="frames", clip_format="mp4", clip_fps=4.0, source_fps=24.0, clip_size=512,
+                        segment_seconds=0.0, audio_format=DEFAULT_AUDIO_FORMAT,
+                        audio_chunk_seconds=0.0, live_mode=False, live_response="text", unique_id=None):
         """Generate content using Gemini 2.5 model with various input types."""
         
+        encoding = ImageEncoding(image_encoding, image_quality, png_compress_level)
+        selection = FrameSelection(frame_selection, max_frames, video_token_budget)
+        video_clip = VideoClip(video_mode, clip_format, clip_fps, source_fps, clip_size)
+        retry_policy = RetryPolicy(max_retries=max_retries, deadline=retry_deadline)
+        
         safety_settings = [
             {"category": "harassment", "threshold": "NONE"},
             {"category": "hate_speech", "threshold": "NONE"},
@@ -410,9 +405,8 @@ class Gemini25:
             {"category": "civic", "threshold": "NONE"}
         ]
 
-        if api_key.strip():
-            self.api_key = api_key
-            save_config({"GEMINI_API_KEY": self.api_key})
+        if (key := remember_api_key(api_key, get_config(), save_config)) is not None:
+            self.api_key = key
             self.configure_genai()
 
         if not self.api_key:
@@ -421,6 +415,30 @@ class Gemini25:
         if clear_history:
             self.chat_history.clear()
 
+        # A recorder in live mode hands over a microphone source, not a recording
+        live_mode = live_mode or (audio is not None and "live_source" in audio)
+
+        # Repeated requests are served from the response cache. Chat and live
+        # turns depend on history or the microphone, so they are never cached.
+        cache_key = None
+        if not chat_mode and not live_mode and not bypass_cache:
+            cache_key = response_cache_key(
+                prompt, input_type, model_version, operation_mode, Additional_Context,
+                images, video, audio, max_images, batch_count, seed, max_output_tokens,
+                temperature, structured_output, encoding, selection, video_clip, segment_seconds,
+                audio_format, audio_chunk_seconds, image_fit
+            )
+            cached = get_response_cache(get_config()).get(cache_key)
+            if cached is not None:
+                cached_text, cached_images = cached
+                if cached_images is None:
+                    cached_images = self.create_placeholder_image()
+                return (cached_text, cached_images, "Served from response cache")
+
+        if live_mode:
+            return self.generate_live(prompt, model_version, audio, Additional_Context, live_response, priority,
+                                      unique_id)
+
         # Handle image generation mode
         if operation_mode == "generate_images":
             return self.generate_images(
@@ -430,39 +448,49 @@ class Gemini25:
                 batch_count=batch_count,
                 temperature=temperature,
                 seed=seed,
-                max_images=max_images
+                max_images=max_images,
+                max_concurrent_requests=max_concurrent_requests,
+                cache_key=cache_key,
+                encoding=encoding,
+                retry_policy=retry_policy,
+                priority=priority,
+                image_fit=image_fit
             )
 
         # For analysis mode (original functionality)
         model_name = f'models/{model_version}'
-        model = genai.GenerativeModel(model_name)
-        model.safety_settings = safety_settings
+        model = get_generative_model(self.api_key, model_name, safety_settings)
 
-        generation_config = genai.types.GenerationConfig(
-            max_output_tokens=max_output_tokens,
-            temperature=temperature
-        )
+        generation_config = legacy_generation_config(max_output_tokens, temperature, seed)
+        scheduler = get_scheduler(get_config())
 
+        retry_state = RetryState()
+        compacted = 0
+        cache_status = ""
+        segment_status = ""
+        
+        def send_parts(parts, state, stream=False):
+            """Send one request of a segmented analysis under the rate limits and retries"""
+            def attempt():
+                request_tokens = estimate_tokens(parts)
+                with scheduler.slot(model_version, request_tokens, priority) as slot:
+                    response = model.generate_content(parts, generation_config=generation_config, stream=stream)
+                    if stream:
+                        text = collect_stream(response, unique_id)
+                    else:
+                        text = response.text
+                    slot.record_usage(response)
+                    return text
+            
+            return call_with_retry(attempt, retry_policy, state)
+        
         try:
             if chat_mode:
                 if input_type == "text":
                     text_content = prompt if not Additional_Context else f"{prompt}\n{Additional_Context}"
                     content = text_content
                 elif input_type == "image":
-                    all_images = []
-                    
-                    if images is not None:
-                        if isinstance(images, torch.Tensor) and len(images.shape) == 4:
-                            num_to_process = min(images.shape[0], max_images)
-                            for i in range(num_to_process):
-                                pil_image = self.tensor_to_image(images[i])
-                                pil_image = self.resize_image(pil_image, 1024)
-                                all_images.append(pil_image)
-                        elif isinstance(images, list):
-                            for img_tensor in images[:max_images]:
-                                pil_image = self.tensor_to_image(img_tensor)
-                                pil_image = self.resize_image(pil_image, 1024)
-                                all_images.append(pil_image)
+                    all_images = encode_image_input(images, max_images, 1024, encoding)
                     
                     if all_images:
                         img_count = len(all_images)
@@ -472,17 +500,8 @@ class Gemini25:
                         
                         parts = [{"text": f"{prefix}{prompt}"}]
                         
-                        for img in all_images:
-                            img_byte_arr = BytesIO()
-                            img.save(img_byte_arr, format='PNG')
-                            img_bytes = img_byte_arr.getvalue()
-                            
-                            parts.append({
-                                "inline_data": {
-                                    "mime_type": "image/png", 
-                                    "data": base64.b64encode(img_bytes).decode('utf-8')
-                                }
-                            })
+                        for img_bytes in all_images:
+                            parts.append(inline_part(img_bytes, encoding.mime_type))
                         
                         content = {"parts": parts}
                     else:
@@ -490,88 +509,132 @@ class Gemini25:
                 elif input_type == "video" and video is not None:
                     if len(video.shape) == 4 and video.shape[0] > 1:
                         frame_count = video.shape[0]
-                        frames = self.sample_video_frames(video)
-                        if frames:
+                        clip_part = self.video_clip_part(video, video_clip)
+                        frames = None
+                        if clip_part is None:
+                            frames = self.sample_video_frames(video, selection)
+                        if clip_part is not None:
+                            content = {"parts": [
+                                {"text": f"This is a video with {frame_count} frames. {prompt}"},
+                                clip_part
+                            ]}
+                        elif frames is not None and len(frames):
                             parts = [{"text": f"This is a video with {frame_count} frames. {prompt}"}]
                             
-                            for frame in frames:
-                                img_byte_arr = BytesIO()
-                                frame.save(img_byte_arr, format='PNG')
-                                img_bytes = img_byte_arr.getvalue()
-                                
-                                parts.append({
-                                    "inline_data": {
-                                        "mime_type": "image/png",
-                                        "data": base64.b64encode(img_bytes).decode('utf-8') 
-                                    }
-                                })
+                            for img_bytes in encode_image_input(frames, len(frames), 512, encoding):
+                                parts.append(inline_part(img_bytes, encoding.mime_type))
                             
                             content = {"parts": parts}
                         else:
                             raise ValueError("Error processing video frames")
                     else:
-                        pil_image = self.tensor_to_image(video.squeeze(0) if len(video.shape) == 4 else video)
-                        pil_image = self.resize_image(pil_image, 1024)
-                        
-                        img_byte_arr = BytesIO()
-                        pil_image.save(img_byte_arr, format='PNG')
-                        img_bytes = img_byte_arr.getvalue()
+                        img_bytes = encode_image_input(video, 1, 1024, encoding)[0]
                         
                         content = {"parts": [
                             {"text": f"This is a single frame from a video. {prompt}"},
-                            {
-                                "inline_data": {
-                                    "mime_type": "image/png",
-                                    "data": base64.b64encode(img_bytes).decode('utf-8')
-                                }
-                            }
+                            inline_part(img_bytes, encoding.mime_type)
                         ]}
                 elif input_type == "audio" and audio is not None:
-                    waveform = audio["waveform"]
-                    sample_rate = audio["sample_rate"]
-                    
-                    if waveform.dim() == 3:
-                        waveform = waveform.squeeze(0)
-                    elif waveform.dim() == 1:
-                        waveform = waveform.unsqueeze(0)
-                    
-                    if waveform.shape[0] > 1:
-                        waveform = torch.mean(waveform, dim=0, keepdim=True)
-                    
-                    if sample_rate != 16000:
-                        waveform = torchaudio.functional.resample(waveform, sample_rate, 16000)
-                    
-                    buffer = BytesIO()
-                    torchaudio.save(buffer, waveform, 16000, format="WAV")
-                    audio_bytes = buffer.getvalue()
+                    audio_bytes, mime_type = encode_audio(audio, audio_format)
                     
                     content = {"parts": [
                         {"text": prompt},
-                        {
-                            "inline_data": {
-                                "mime_type": "audio/wav",
-                                "data": base64.b64encode(audio_bytes).decode('utf-8')
-                            }
-                        }
+                        inline_part(audio_bytes, mime_type)
                     ]}
                 else:
                     raise ValueError(f"Invalid or missing input for {input_type}")
 
-                chat = model.start_chat(history=self.chat_history.get_messages_for_api())
-                response = chat.send_message(content, generation_config=generation_config)
+                # Upload media once and send file references, so later turns
+                # can replay them from the history without resending the bytes
+                media_refs = []
+                if isinstance(content, dict) and "parts" in content:
+                    registry = get_media_registry(self.api_key)
+                    content["parts"], media_refs = registry.reference_parts(
+                        content["parts"], priority, max_concurrent_requests, retry_policy
+                    )
+                
+                # Keep the resent history within the token budget
+                self.chat_history.token_budget = history_token_budget
+                summarize = None
+                if history_compaction == "summarize":
+                    summarize = history_summarizer(model, model_version, scheduler, retry_policy, priority)
+                compacted = self.chat_history.compact(estimate_tokens(content), summarize)
+                
+                history = self.chat_history.get_messages_for_api()
+                request_tokens = estimate_tokens(history) + estimate_tokens(content)
+                
+                def send_chat_message():
+                    # A failed send can leave the chat session inconsistent, so
+                    # every attempt starts a fresh one from the stored history
+                    with scheduler.slot(model_version, request_tokens, priority) as slot:
+                        chat = model.start_chat(history=history)
+                        response = chat.send_message(content, generation_config=generation_config, stream=stream_output)
+                        if stream_output:
+                            # Push partial text to the node while the answer is generated
+                            text = collect_stream(response, unique_id)
+                        else:
+                            text = response.text
+                        slot.record_usage(response)
+                        return text
+                
+                response_text = call_with_retry(send_chat_message, retry_policy, retry_state)
                 
                 if isinstance(content, dict) and "parts" in content:
                     history_content = prompt
                 else:
                     history_content = content
                     
-                self.chat_history.add_message("user", history_content)
-                self.chat_history.add_message("assistant", response.text)
+                self.chat_history.add_message("user", history_content, media_refs)
+                self.chat_history.add_message("assistant", response_text)
+                
+                if chat_output == "latest_exchange":
+                    generated_content = self.chat_history.get_latest_exchange()
+                else:
+                    generated_content = self.chat_history.get_formatted_history()
+            elif (input_type == "video" and video is not None and segment_seconds > 0
+                  and video.shape[0] > segment_seconds * source_fps):
+                # Long videos are analyzed in time segments that are merged
+                # by a final request
+                segment_prompt = prompt
+                if structured_output:
+                    segment_prompt = f"Please provide the response in a structured format. {prompt}"
+                
+                def prepare_segment(request, frames):
+                    return self.prepare_content(
+                        request, input_type, Additional_Context, None, frames, None, max_images, encoding,
+                        selection, video_clip
+                    )
+                
+                generated_content, segment_status, complete = analyze_video_segments(
+                    segment_prompt, video, segment_seconds, source_fps, prepare_segment, send_parts,
+                    max_workers=max_concurrent_requests, stream=stream_output
+                )
+                
+                # A merge that is missing segments must not be served again
+                if cache_key is not None and complete:
+                    get_response_cache(get_config()).put(cache_key, generated_content)
+            elif input_type == "audio" and audio is not None and audio_chunk_seconds > 0:
+                # Long recordings are cut into speech chunks, analyzed
+                # concurrently and joined with their time ranges
+                chunk_prompt = prompt
+                if structured_output:
+                    chunk_prompt = f"Please provide the response in a structured format. {prompt}"
                 
-                generated_content = self.chat_history.get_formatted_history()
+                def prepare_chunk(request, chunk_audio):
+                    return self.prepare_content(request, input_type, audio=chunk_audio, audio_format=audio_format)
+                
+                generated_content, segment_status, complete = analyze_audio_chunks(
+                    chunk_prompt, audio, audio_chunk_seconds, prepare_chunk, send_parts,
+                    max_workers=max_concurrent_requests
+                )
+                
+                # Answers with failed chunks in them must not be served again
+                if cache_key is not None and complete:
+                    get_response_cache(get_config()).put(cache_key, generated_content)
             else:
                 content_parts = self.prepare_content(
-                    prompt, input_type, Additional_Context, images, video, audio, max_images
+                    prompt, input_type, Additional_Context, images, video, audio, max_images, encoding, selection, video_clip,
+                    audio_format
                 )
                 
                 if structured_output:
@@ -581,14 +644,70 @@ class Gemini25:
                                 if "text" in part:
                                     part["text"] = f"Please provide the response in a structured format. {part['text']}"
                 
-                response = model.generate_content(content_parts, generation_config=generation_config)
-                generated_content = response.text
+                # Send a shared prefix once as cached content and only the
+                # prompt with each request
+                request_model = model
+                request_parts = content_parts
+                if context_cache:
+                    prefix, variable_parts = split_cacheable_prefix(
+                        content_parts, input_type, prompt, Additional_Context
+                    )
+                    
+                    def create_cache(create):
+                        def attempt():
+                            with scheduler.slot(model_version, estimate_tokens(prefix), priority):
+                                return create()
+                        
+                        return call_with_retry(attempt, retry_policy)
+                    
+                    cached_model, cache_status = get_context_cache(get_config()).cached_model(
+                        self.api_key, model_name, prefix, context_cache_ttl, safety_settings, run=create_cache
+                    )
+                    if cached_model is not None:
+                        request_model = cached_model
+                        request_parts = [{"role": "user", "parts": variable_parts}]
+                
+                def send_request():
+                    request_tokens = estimate_tokens(request_parts)
+                    with scheduler.slot(model_version, request_tokens, priority) as slot:
+                        response = request_model.generate_content(request_parts, generation_config=generation_config,
+                                                                  stream=stream_output)
+                        if stream_output:
+                            text = collect_stream(response, unique_id)
+                        else:
+                            text = response.text
+                        slot.record_usage(response)
+                        return text
+                
+                try:
+                    generated_content = call_with_retry(send_request, retry_policy, retry_state)
+                except Exception as e:
+                    if request_model is model or error_status(e) not in (403, 404):
+                        raise
+                    # The cache was deleted on the server before its local expiry
+                    get_context_cache().invalidate(request_model)
+                    cache_status = "Context cache entry was gone, sent full request"
+                    request_model = model
+                    request_parts = content_parts
+                    generated_content = call_with_retry(send_request, retry_policy, retry_state)
+                
+                if cache_key is not None:
+                    get_response_cache(get_config()).put(cache_key, generated_content)
 
+            status = f"Completed{retry_state.describe()}"
+            if compacted:
+                action = "Summarized" if history_compaction == "summarize" else "Dropped"
+                status += f"\n{action} {compacted} earlier chat messages to fit the history budget"
+            if cache_status:
+                status += f"\n{cache_status}"
+            if segment_status:
+                status += f"\n{segment_status}"
         except Exception as e:
             generated_content = f"Error: {str(e)}"
+            status = f"Failed{retry_state.describe()}: {str(e)}"
     
         # For analysis mode, return the text response and an empty placeholder image
-        return (generated_content, self.create_placeholder_image())
+        return (generated_content, self.create_placeholder_image(), status)
         
 NODE_CLASS_MAPPINGS = {
     "Gemini25": Gemini25,
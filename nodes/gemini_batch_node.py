@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+
+p = os.path.dirname(os.path.realpath(__file__))
+if p not in sys.path:
+    sys.path.append(p)
+
+from gemini_common.api_keys import remember_api_key, stored_api_key
+from gemini_common.batch_jobs import (FAILED_STATES, SUCCEEDED, BatchRunner, build_request, describe, get_backend,
+                                      get_manifest, is_interrupt)
+from gemini_common.client import request_seed
+from gemini_common.media import IMAGE_FORMATS, ImageEncoding, encode_image_input
+from gemini_common.retry import RetryPolicy
+
+BATCH_MODELS = [
+    "gemini-2.5-flash",
+    "gemini-2.5-flash-lite",
+    "gemini-2.5-pro",
+    "gemini-2.0-flash",
+]
+
+
+def get_config():
+    try:
+        config_path = os.path.join(p, "config.json")
+        with open(config_path, "r") as f:
+            config = json.load(f)
+        return config
+    except:
+        return {}
+
+
+def save_config(config):
+    config_path = os.path.join(p, "config.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=4)
+
+
+def resolve_api_key(api_key=""):
+    """The node's api_key input (saved to config.json), else GEMINI_API_KEY from the environment or config"""
+    config = get_config()
+    key = remember_api_key(api_key, config, save_config) or stored_api_key(config)
+    if not key:
+        raise ValueError("API key not found in config.json or node input")
+    return key
+
+
+def pair_inputs(prompts, image_count):
+    """(prompt, image index or None) per request.
+
+    One prompt is applied to every image; otherwise prompts and images are
+    paired in order and their counts must match.
+    """
+    if not prompts:
+        raise ValueError("No prompts given (one prompt per line)")
+    if image_count == 0:
+        return [(prompt, None) for prompt in prompts]
+    if len(prompts) == 1:
+        return [(prompts[0], i) for i in range(image_count)]
+    if len(prompts) != image_count:
+        raise ValueError(f"{len(prompts)} prompts for {image_count} images; give one prompt or one per image")
+    return [(prompt, i) for i, prompt in enumerate(prompts)]
+
+
+def collect(runner, record, wait_for_results, poll_interval, timeout):
+    """(results, status) of a job, waiting for it first when asked"""
+    if wait_for_results:
+        record = runner.wait(record, poll_interval, timeout, on_state=lambda r: print(describe(r)))
+    else:
+        record = runner.refresh(record)
+
+    status = describe(record)
+    count = len(record["request_keys"])
+    if record["state"] != SUCCEEDED:
+        if record["state"] not in FAILED_STATES:
+            status += "\nNot finished yet: run again to resume, or use Gemini Batch Results with the job name"
+        return [""] * count, status
+
+    results = runner.results(record)
+    failed = sum(1 for result in results if result.error)
+    status += f"\n{count - failed} answers, {failed} failed"
+    return [f"Error: {result.error}" if result.error else result.text for result in results], status
+
+
+class GeminiBatch:
+    """Submit prompts, optionally paired with images, as one Gemini batch job"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "prompts": ("STRING", {
+                    "default": "Write a one-sentence caption for this image.",
+                    "multiline": True
+                }),
+                "model_version": (BATCH_MODELS, {"default": "gemini-2.5-flash"}),
+                "wait_for_results": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "images": ("IMAGE",),
+                "Additional_Context": ("STRING", {"default": "", "multiline": True}),
+                "api_key": ("STRING", {"default": ""}),
+                "max_output_tokens": ("INT", {"default": 8192, "min": 1, "max": 65536}),
+                "temperature": ("FLOAT", {"default": 0.4, "min": 0.0, "max": 1.0, "step": 0.1}),
+                "seed": ("INT", {"default": 0, "min": 0}),
+                "image_encoding": (IMAGE_FORMATS, {"default": "jpeg"}),
+                "image_quality": ("INT", {"default": 90, "min": 1, "max": 100, "step": 1}),
+                "png_compress_level": ("INT", {"default": 6, "min": 0, "max": 9, "step": 1}),
+                "max_image_size": ("INT", {"default": 1024, "min": 64, "max": 4096, "step": 64}),
+                "poll_interval": ("FLOAT", {"default": 30.0, "min": 5.0, "max": 600.0, "step": 5.0}),
+                "timeout": ("FLOAT", {"default": 3600.0, "min": 0.0, "max": 86400.0, "step": 60.0}),
+                "max_retries": ("INT", {"default": 3, "min": 0, "max": 10, "step": 1}),
+            },
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # The job progresses between runs; reruns resume it from the manifest
+        return float("nan")
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("results", "job_name", "status")
+    OUTPUT_IS_LIST = (True, False, False)
+    FUNCTION = "run_batch"
+    CATEGORY = "Gemini Batch"
+
+    def run_batch(self, prompts, model_version, wait_for_results=False, images=None, Additional_Context="",
+                  api_key="", max_output_tokens=8192, temperature=0.4, seed=0, image_encoding="jpeg",
+                  image_quality=90, png_compress_level=6, max_image_size=1024, poll_interval=30.0,
+                  timeout=3600.0, max_retries=3):
+        job_name = ""
+        try:
+            config = get_config()
+            encoding = ImageEncoding(image_encoding, image_quality, png_compress_level)
+            lines = [line.strip() for line in prompts.splitlines() if line.strip()]
+            image_count = images.shape[0] if images is not None else 0
+            encoded = encode_image_input(images, image_count, max_image_size, encoding) if image_count else []
+
+            generation_config = {"max_output_tokens": max_output_tokens, "temperature": temperature}
+            api_seed = request_seed(seed)
+            if api_seed is not None:
+                generation_config["seed"] = api_seed
+            requests = [
+                build_request(prompt, None if index is None else encoded[index], encoding.mime_type,
+                              Additional_Context.strip() or None, generation_config)
+                for prompt, index in pair_inputs(lines, image_count)
+            ]
+
+            runner = BatchRunner(get_backend(resolve_api_key(api_key), config), get_manifest(config),
+                                 RetryPolicy(max_retries=max_retries))
+            record = runner.submit(model_version, requests, f"comfyui-{model_version}-{int(time.time())}")
+            job_name = record["job_name"]
+            results, status = collect(runner, record, wait_for_results, poll_interval, timeout)
+            return (results, job_name, status)
+        except Exception as e:
+            if is_interrupt(e):
+                raise
+            return ([f"Error: {str(e)}"], job_name, f"Failed: {str(e)}")
+
+
+class GeminiBatchResults:
+    """Check on, collect or cancel a batch job by name"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "job_name": ("STRING", {"default": ""}),
+                "wait_for_results": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "api_key": ("STRING", {"default": ""}),
+                "poll_interval": ("FLOAT", {"default": 30.0, "min": 5.0, "max": 600.0, "step": 5.0}),
+                "timeout": ("FLOAT", {"default": 3600.0, "min": 0.0, "max": 86400.0, "step": 60.0}),
+                "cancel_job": ("BOOLEAN", {"default": False}),
+                "max_retries": ("INT", {"default": 3, "min": 0, "max": 10, "step": 1}),
+            },
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return float("nan")
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("results", "job_name", "status")
+    OUTPUT_IS_LIST = (True, False, False)
+    FUNCTION = "get_results"
+    CATEGORY = "Gemini Batch"
+
+    def get_results(self, job_name, wait_for_results=False, api_key="", poll_interval=30.0, timeout=3600.0,
+                    cancel_job=False, max_retries=3):
+        job_name = job_name.strip()
+        try:
+            config = get_config()
+            manifest = get_manifest(config)
+            record = manifest.find(job_name)
+            if record is None:
+                raise ValueError(f"No batch job called '{job_name}' in {manifest.directory}")
+
+            runner = BatchRunner(get_backend(resolve_api_key(api_key), config), manifest,
+                                 RetryPolicy(max_retries=max_retries))
+            if cancel_job:
+                record = runner.cancel(record)
+                return ([""] * len(record["request_keys"]), job_name, describe(record))
+            results, status = collect(runner, record, wait_for_results, poll_interval, timeout)
+            return (results, job_name, status)
+        except Exception as e:
+            if is_interrupt(e):
+                raise
+            return ([f"Error: {str(e)}"], job_name, f"Failed: {str(e)}")
+
+
+NODE_CLASS_MAPPINGS = {
+    "GeminiBatch": GeminiBatch,
+    "GeminiBatchResults": GeminiBatchResults,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "GeminiBatch": "Gemini Batch",
+    "GeminiBatchResults": "Gemini Batch Results",
+}
@@ -0,0 +1,6 @@
+"""Helpers shared by the Gemini node modules.
+
+The node files are loaded by path from the package ``__init__.py``, so they
+import this package as a top-level module after adding ``nodes/`` to
+``sys.path``.
+"""
@@ -0,0 +1,41 @@
+"""Gemini API key lookup shared by the nodes.
+
+A key typed into a node's api_key input is remembered in config.json, so
+later runs and other nodes find it. Otherwise GEMINI_API_KEY comes from the
+environment, then from config.json. Blank values and the placeholder text
+of example configs are ignored, so they are never saved or sent.
+"""
+import os
+
+CONFIG_KEY = "GEMINI_API_KEY"
+# Common placeholder values to ignore
+PLACEHOLDER_KEYS = {"token_here", "place_token_here", "your_api_key",
+                    "api_key_here", "enter_your_key", "<api_key>"}
+
+
+def clean_api_key(value):
+    """value without surrounding whitespace, or None if it is blank or a placeholder"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if not value or value.lower() in PLACEHOLDER_KEYS:
+        return None
+    return value
+
+
+def stored_api_key(config, fallback=None):
+    """First usable key of GEMINI_API_KEY in the environment, fallback and config"""
+    for value in (os.environ.get(CONFIG_KEY), fallback, config.get(CONFIG_KEY)):
+        key = clean_api_key(value)
+        if key is not None:
+            return key
+    return None
+
+
+def remember_api_key(api_key, config, save_config):
+    """Save a usable api_key input to config via save_config and return it, else None"""
+    key = clean_api_key(api_key)
+    if key is not None and config.get(CONFIG_KEY) != key:
+        config[CONFIG_KEY] = key
+        save_config(config)
+    return key
@@ -0,0 +1,284 @@
+"""Downmixing, resampling and encoding of ComfyUI AUDIO inputs.
+
+Audio is sent as 16 kHz mono. Resamplers are built once per source rate
+and reused, since building the windowed-sinc kernel costs more than applying
+it. Uploads can be FLAC (lossless, about half the size of 16-bit WAV) or
+Ogg Vorbis (lossy, far smaller for speech).
+
+Long recordings can be cut into speech chunks by a voice activity detector
+that works on per-frame energy and zero-crossing rate. Silence between
+chunks is dropped and every chunk keeps the time range it came from.
+
+torchaudio is only imported when audio is first resampled or encoded, so
+loading the nodes at startup does not pay for it.
+"""
+import functools
+import threading
+import time
+from io import BytesIO
+from typing import List, NamedTuple, Tuple
+
+import torch
+
+from .batching import DEFAULT_MAX_CONCURRENCY, run_concurrently
+from .hashing import fingerprint
+from .media_cache import get_media_cache
+from .retry import RetryState
+
+TARGET_SAMPLE_RATE = 16000
+
+AUDIO_FORMATS = ["flac", "ogg", "wav"]
+AUDIO_MIME_TYPES = {"flac": "audio/flac", "ogg": "audio/ogg", "wav": "audio/wav"}
+DEFAULT_AUDIO_FORMAT = "flac"
+
+_SAVE_OPTIONS = {
+    "wav": {"format": "wav", "encoding": "PCM_S", "bits_per_sample": 16},
+    "flac": {"format": "flac", "bits_per_sample": 16},
+    "ogg": {"format": "ogg"},
+}
+
+_resampler_lock = threading.Lock()
+# Formats the torchaudio backend failed to write; they are sent as WAV from then on
+_unsupported_formats = set()
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_resampler(orig_freq, new_freq):
+    import torchaudio
+
+    return torchaudio.transforms.Resample(orig_freq, new_freq)
+
+
+def get_resampler(orig_freq, new_freq=TARGET_SAMPLE_RATE):
+    """Shared Resample transform for a rate pair; the kernel is built once"""
+    with _resampler_lock:
+        return _cached_resampler(int(orig_freq), int(new_freq))
+
+
+def mono_waveform(audio, sample_rate=TARGET_SAMPLE_RATE):
+    """AUDIO dict as a [1, samples] float32 waveform at sample_rate"""
+    waveform = audio["waveform"]
+    if waveform.dim() == 3:
+        waveform = waveform.squeeze(0)
+    elif waveform.dim() == 1:
+        waveform = waveform.unsqueeze(0)
+
+    if waveform.shape[0] > 1:
+        waveform = torch.mean(waveform, dim=0, keepdim=True)
+
+    waveform = waveform.detach().to("cpu", torch.float32)
+    if audio["sample_rate"] != sample_rate:
+        with torch.no_grad():
+            waveform = get_resampler(audio["sample_rate"], sample_rate)(waveform)
+    return waveform
+
+
+def _save(waveform, sample_rate, audio_format):
+    import torchaudio
+
+    buffer = BytesIO()
+    torchaudio.save(buffer, waveform, sample_rate, **_SAVE_OPTIONS[audio_format])
+    return buffer.getvalue()
+
+
+def encode_audio(audio, audio_format=DEFAULT_AUDIO_FORMAT):
+    """Encode an AUDIO dict for upload; returns (bytes, mime type).
+
+    Results are cached by content. If the torchaudio backend cannot write
+    audio_format the audio is sent as WAV instead, and so is every later
+    request for that format in this process.
+    """
+    if audio_format in _unsupported_formats:
+        audio_format = "wav"
+    cache = get_media_cache()
+    key = (fingerprint(audio["waveform"]), audio["sample_rate"], audio_format)
+    data = cache.get(key)
+    if data is not None:
+        return data, AUDIO_MIME_TYPES[audio_format]
+
+    waveform = mono_waveform(audio)
+    try:
+        data = _save(waveform, TARGET_SAMPLE_RATE, audio_format)
+    except (RuntimeError, ValueError) as e:
+        if audio_format == "wav":
+            raise
+        print(f"Sending WAV instead of {audio_format} from now on: {e}")
+        _unsupported_formats.add(audio_format)
+        return encode_audio(audio, "wav")
+    cache.put(key, data)
+    return data, AUDIO_MIME_TYPES[audio_format]
+
+
+# Voice activity detection works on frames of this length
+VAD_FRAME_MS = 30
+# Speech frames are this much louder (RMS) than the noise floor...
+VAD_ENERGY_RATIO = 3.0
+# ...and never quieter than this absolute RMS level
+VAD_MIN_RMS = 0.003
+# Quiet frames still count as speech (fricatives like s, f) above this zero-crossing rate
+VAD_FRICATIVE_ZCR = 0.25
+# Pauses shorter than this stay inside a speech range
+VAD_MAX_GAP_MS = 600
+# Ranges shorter than this are clicks or noise
+VAD_MIN_SPEECH_MS = 250
+# Kept around every range so word onsets are not clipped
+VAD_PAD_MS = 150
+
+
+def _timestamp(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def detect_speech(waveform, sample_rate=TARGET_SAMPLE_RATE):
+    """(start, end) sample ranges of speech in a [1, samples] mono waveform"""
+    frame = max(1, sample_rate * VAD_FRAME_MS // 1000)
+    samples = waveform.reshape(-1)
+    count = samples.shape[0] // frame
+    if count == 0:
+        return []
+
+    frames = samples[: count * frame].reshape(count, frame)
+    rms = frames.pow(2).mean(dim=1).sqrt()
+    signs = torch.signbit(frames)
+    zcr = (signs[:, 1:] != signs[:, :-1]).float().mean(dim=1)
+
+    noise_floor = float(torch.quantile(rms, 0.1))
+    threshold = max(VAD_MIN_RMS, noise_floor * VAD_ENERGY_RATIO)
+    speech = (rms > threshold) | ((rms > threshold / 2) & (zcr > VAD_FRICATIVE_ZCR))
+
+    # Rising and falling edges of the speech mask give the runs of speech frames
+    padded = torch.cat([speech.new_zeros(1), speech, speech.new_zeros(1)]).to(torch.int8)
+    edges = torch.diff(padded)
+    starts = torch.nonzero(edges == 1).flatten().tolist()
+    ends = torch.nonzero(edges == -1).flatten().tolist()
+
+    max_gap = VAD_MAX_GAP_MS // VAD_FRAME_MS
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    min_frames = VAD_MIN_SPEECH_MS // VAD_FRAME_MS
+    pad = sample_rate * VAD_PAD_MS // 1000
+    total = samples.shape[0]
+    ranges = []
+    for start, end in merged:
+        if end - start < min_frames:
+            continue
+        start, end = max(0, start * frame - pad), min(total, end * frame + pad)
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+class SpeechChunk(NamedTuple):
+    """Speech ranges of a recording that are sent together, silence removed"""
+
+    ranges: List[Tuple[int, int]]
+    sample_rate: int = TARGET_SAMPLE_RATE
+
+    @property
+    def label(self):
+        start, end = self.ranges[0][0], self.ranges[-1][1]
+        return f"{_timestamp(start / self.sample_rate)}-{_timestamp(end / self.sample_rate)}"
+
+    @property
+    def seconds(self):
+        return sum(end - start for start, end in self.ranges) / self.sample_rate
+
+    def audio(self, waveform):
+        """The chunk's speech from a [1, samples] waveform as an AUDIO dict"""
+        speech = torch.cat([waveform[:, start:end] for start, end in self.ranges], dim=1)
+        return {"waveform": speech.unsqueeze(0), "sample_rate": self.sample_rate}
+
+
+def speech_chunks(waveform, max_seconds, sample_rate=TARGET_SAMPLE_RATE):
+    """Group the speech in a mono waveform into chunks of at most max_seconds of speech"""
+    limit = max(1, int(max_seconds * sample_rate))
+    chunks = []
+    current = []
+    length = 0
+    for start, end in detect_speech(waveform, sample_rate):
+        # A range longer than a whole chunk is cut into chunk-sized pieces
+        while end - start > limit:
+            if current:
+                chunks.append(SpeechChunk(current, sample_rate))
+                current, length = [], 0
+            chunks.append(SpeechChunk([(start, start + limit)], sample_rate))
+            start += limit
+        if current and length + end - start > limit:
+            chunks.append(SpeechChunk(current, sample_rate))
+            current, length = [], 0
+        current.append((start, end))
+        length += end - start
+    if current:
+        chunks.append(SpeechChunk(current, sample_rate))
+    return chunks
+
+
+def chunk_request(prompt, index, count, label):
+    """Prompt for one speech chunk of a recording analyzed in parts"""
+    return (
+        f"This is part {index + 1} of {count} of a longer recording, covering {label}, "
+        f"with silences removed. Answer for this part only.\n\n{prompt}"
+    )
+
+
+def analyze_audio_chunks(
+    prompt, audio, chunk_seconds, prepare, send, max_workers=DEFAULT_MAX_CONCURRENCY
+):
+    """Analyze the speech of a long recording in chunks concurrently.
+
+    Silence is dropped by voice activity detection and the answers for the
+    chunks are joined in time order under their time ranges.
+    prepare(prompt, audio) builds the request for one chunk and
+    send(parts, retry_state) returns the model's text. Returns the joined
+    answers, a report of every chunk's timing and whether every chunk
+    succeeded; a failed chunk is left in the answer as "(Failed: ...)".
+    """
+    waveform = mono_waveform(audio)
+    chunks = speech_chunks(waveform, chunk_seconds)
+    if not chunks:
+        raise ValueError("No speech detected in the audio")
+    retry_states = [RetryState() for _ in chunks]
+
+    def run_chunk(i):
+        started = time.perf_counter()
+        request = chunk_request(prompt, i, len(chunks), chunks[i].label)
+        text = send(prepare(request, chunks[i].audio(waveform)), retry_states[i])
+        return text, time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = run_concurrently(run_chunk, range(len(chunks)), max_workers=max_workers)
+    if all(error is not None for _, error in results):
+        raise results[0][1]
+
+    speech_seconds = sum(chunk.seconds for chunk in chunks)
+    report = [
+        f"Long audio: {speech_seconds:.0f}s of speech in "
+        f"{waveform.shape[1] / TARGET_SAMPLE_RATE:.0f}s, {len(chunks)} chunks, "
+        f"up to {min(max_workers, len(chunks))} at a time"
+    ]
+    sections = []
+    failed = 0
+    for i, (result, error) in enumerate(results):
+        chunk = chunks[i]
+        retries = retry_states[i].describe()
+        if error is not None:
+            failed += 1
+            report.append(f"Chunk {i+1} ({chunk.label}) failed{retries}: {error}")
+            sections.append(f"[{chunk.label}]\n(Failed: {error})")
+            continue
+        text, elapsed = result
+        report.append(
+            f"Chunk {i+1} ({chunk.label}, {chunk.seconds:.0f}s of speech): "
+            f"{elapsed:.2f}s{retries}"
+        )
+        sections.append(f"[{chunk.label}]\n{text.strip()}")
+    report.append(f"Total: {time.perf_counter() - started:.2f}s")
+    return "\n\n".join(sections), "\n".join(report), failed == 0
@@ -0,0 +1,452 @@
+"""Offline jobs on the Gemini Batch API.
+
+Requests are written as JSONL, one ``{"key", "request"}`` object per line,
+uploaded through the File API and submitted as a single batch job. The job
+is polled with exponential backoff. Its results come back as a JSONL file
+whose lines are matched to the requests by key, so answers are returned in
+input order whatever order the service finished them in.
+
+Every job is recorded in a manifest file on disk, named by a hash of its
+requests. Submitting the same requests again resumes the recorded job
+instead of paying for a second one, also after ComfyUI restarts, and
+downloaded results are kept next to the manifest. Jobs are reached through
+a backend: google.genai's batches API by default, or the REST endpoints at
+a configured base URL, so a local stand-in can take the place of the
+Gemini service.
+"""
+import base64
+import json
+import math
+import os
+import threading
+import time
+import urllib.request
+from typing import NamedTuple, Optional
+
+from .hashing import fingerprint
+from .retry import DEFAULT_POLICY, call_with_retry
+
+DEFAULT_JOB_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+    "cache",
+    "batch_jobs",
+)
+JSONL_MIME_TYPE = "application/jsonl"
+
+SUCCEEDED = "SUCCEEDED"
+FAILED_STATES = {"FAILED", "CANCELLED", "EXPIRED"}
+TERMINAL_STATES = FAILED_STATES | {SUCCEEDED}
+
+# Polling starts at the node's poll_interval and backs off to this
+MAX_POLL_INTERVAL = 600.0
+POLL_BACKOFF = 1.5
+# Waits between polls are cut into steps of this length to notice a cancelled prompt
+INTERRUPT_CHECK_INTERVAL = 1.0
+
+
+def job_state(state):
+    """JOB_STATE_RUNNING (SDK) or BATCH_STATE_RUNNING (REST) as RUNNING"""
+    state = str(getattr(state, "name", state) or "UNSPECIFIED")
+    for prefix in ("JOB_STATE_", "BATCH_STATE_"):
+        if state.startswith(prefix):
+            return state[len(prefix) :]
+    return state
+
+
+def check_interrupted():
+    """Raise ComfyUI's InterruptProcessingException if the prompt was cancelled.
+
+    Does nothing outside ComfyUI.
+    """
+    try:
+        from comfy.model_management import throw_exception_if_processing_interrupted
+    except ImportError:
+        return
+    throw_exception_if_processing_interrupted()
+
+
+def is_interrupt(error):
+    """Whether error is ComfyUI's prompt cancellation, which must reach the executor"""
+    try:
+        from comfy.model_management import InterruptProcessingException
+    except ImportError:
+        return False
+    return isinstance(error, InterruptProcessingException)
+
+
+def model_path(model_name):
+    return model_name if model_name.startswith("models/") else f"models/{model_name}"
+
+
+def build_request(prompt, image=None, mime_type="image/png", system_instruction=None, generation_config=None):
+    """One GenerateContentRequest as JSON; image is encoded image bytes or None"""
+    parts = []
+    if image is not None:
+        parts.append({"inline_data": {"mime_type": mime_type, "data": base64.b64encode(image).decode("ascii")}})
+    parts.append({"text": prompt})
+    request = {"contents": [{"role": "user", "parts": parts}]}
+    if system_instruction:
+        request["system_instruction"] = {"parts": [{"text": system_instruction}]}
+    if generation_config:
+        request["generation_config"] = generation_config
+    return request
+
+
+def request_keys(count):
+    return [f"request-{i:06d}" for i in range(count)]
+
+
+def to_jsonl(keys, requests):
+    lines = (
+        json.dumps({"key": key, "request": request}, separators=(",", ":"))
+        for key, request in zip(keys, requests)
+    )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _response_text(response):
+    """Text of a GenerateContentResponse dict; raises ValueError when there is none"""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        feedback = response.get("promptFeedback") or response.get("prompt_feedback") or {}
+        reason = feedback.get("blockReason") or feedback.get("block_reason") or "no candidates"
+        raise ValueError(f"No answer ({reason})")
+    candidate = candidates[0]
+    parts = (candidate.get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+    if not text:
+        reason = candidate.get("finishReason") or candidate.get("finish_reason") or "empty response"
+        raise ValueError(f"No answer ({reason})")
+    return text
+
+
+class BatchResult(NamedTuple):
+    text: str
+    error: Optional[str] = None
+
+
+def parse_results(data):
+    """{key: BatchResult} from a results JSONL file"""
+    results = {}
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        key = record.get("key")
+        if "error" in record:
+            error = record["error"]
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            results[key] = BatchResult("", message)
+            continue
+        try:
+            results[key] = BatchResult(_response_text(record.get("response") or {}))
+        except ValueError as e:
+            results[key] = BatchResult("", str(e))
+    return results
+
+
+def results_in_order(keys, results):
+    """BatchResults for keys in order; missing keys become errors"""
+    return [results.get(key) or BatchResult("", "No result returned for this request") for key in keys]
+
+
+class JobStatus(NamedTuple):
+    state: str
+    results_file: Optional[str] = None
+    error: Optional[str] = None
+
+
+class SdkBackend:
+    """Batch jobs through google.genai's files and batches APIs"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, data, display_name):
+        from io import BytesIO
+
+        from google.genai import types
+
+        file = self.client.files.upload(
+            file=BytesIO(data), config=types.UploadFileConfig(display_name=display_name, mime_type="jsonl")
+        )
+        return file.name
+
+    def create(self, model_name, file_name, display_name):
+        job = self.client.batches.create(model=model_name, src=file_name, config={"display_name": display_name})
+        return job.name
+
+    def status(self, job_name):
+        job = self.client.batches.get(name=job_name)
+        dest = getattr(job, "dest", None)
+        error = getattr(job, "error", None)
+        return JobStatus(
+            job_state(job.state),
+            getattr(dest, "file_name", None),
+            getattr(error, "message", None) or (str(error) if error else None),
+        )
+
+    def download(self, file_name):
+        return self.client.files.download(file=file_name)
+
+    def cancel(self, job_name):
+        self.client.batches.cancel(name=job_name)
+
+
+class RestBackend:
+    """Batch jobs through the Gemini REST endpoints under base_url.
+
+    Speaks the same protocol as generativelanguage.googleapis.com, so a
+    proxy or a local stand-in can serve the jobs.
+    """
+
+    def __init__(self, base_url, api_key, timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def _call(self, method, path, body=None, headers=None):
+        url = path if path.startswith(("http://", "https://")) else f"{self.base_url}/{path}"
+        request = urllib.request.Request(url, data=body, method=method)
+        request.add_header("x-goog-api-key", self.api_key)
+        for name, value in (headers or {}).items():
+            request.add_header(name, value)
+        # HTTPError carries the status as .code, which the retry policy reads
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.headers, response.read()
+
+    def _json(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        _, data = self._call(method, path, body, {"Content-Type": "application/json"})
+        return json.loads(data or b"{}")
+
+    def upload(self, data, display_name):
+        headers, _ = self._call(
+            "POST",
+            "upload/v1beta/files",
+            json.dumps({"file": {"display_name": display_name}}).encode("utf-8"),
+            {
+                "Content-Type": "application/json",
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(len(data)),
+                "X-Goog-Upload-Header-Content-Type": JSONL_MIME_TYPE,
+            },
+        )
+        upload_url = headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise RuntimeError("File upload was not accepted: no upload URL returned")
+        _, reply = self._call(
+            "POST",
+            upload_url,
+            data,
+            {"X-Goog-Upload-Offset": "0", "X-Goog-Upload-Command": "upload, finalize"},
+        )
+        return json.loads(reply)["file"]["name"]
+
+    def create(self, model_name, file_name, display_name):
+        reply = self._json(
+            "POST",
+            f"v1beta/{model_path(model_name)}:batchGenerateContent",
+            {"batch": {"display_name": display_name, "input_config": {"file_name": file_name}}},
+        )
+        return reply["name"]
+
+    def status(self, job_name):
+        reply = self._json("GET", f"v1beta/{job_name}")
+        metadata = reply.get("metadata") or reply
+        output = reply.get("response") or metadata.get("output") or {}
+        error = reply.get("error") or {}
+        return JobStatus(
+            job_state(metadata.get("state")),
+            output.get("responsesFile"),
+            error.get("message") if error else None,
+        )
+
+    def download(self, file_name):
+        _, data = self._call("GET", f"download/v1beta/{file_name}:download?alt=media")
+        return data
+
+    def cancel(self, job_name):
+        self._json("POST", f"v1beta/{job_name}:cancel", {})
+
+
+class JobManifest:
+    """One JSON record per submitted job, plus its downloaded results"""
+
+    def __init__(self, directory=DEFAULT_JOB_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, key, suffix=".json"):
+        return os.path.join(self.directory, key + suffix)
+
+    def results_path(self, key):
+        return self._path(key, ".results.jsonl")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, record):
+        record["updated_at"] = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(record["key"])
+        with self._lock:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=2)
+            os.replace(tmp_path, path)
+        return record
+
+    def find(self, job_name):
+        """The record of the job called job_name, or None"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return None
+        for name in names:
+            if name.endswith(".json"):
+                record = self.load(name[: -len(".json")])
+                if record and record.get("job_name") == job_name:
+                    return record
+        return None
+
+    def save_results(self, key, data):
+        path = self.results_path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+
+def job_key(model_name, keys, requests):
+    return fingerprint(model_path(model_name), keys, requests)
+
+
+class BatchRunner:
+    """Submits, resumes, polls and collects batch jobs for one backend"""
+
+    def __init__(self, backend, manifest, retry_policy=DEFAULT_POLICY, sleep=time.sleep):
+        self.backend = backend
+        self.manifest = manifest
+        self.retry_policy = retry_policy
+        self.sleep = sleep
+
+    def _call(self, fn, *args):
+        return call_with_retry(lambda: fn(*args), self.retry_policy)
+
+    def submit(self, model_name, requests, display_name):
+        """Manifest record of a job for requests, resuming a recorded job when there is one.
+
+        A job that failed, expired or was cancelled is submitted again.
+        """
+        keys = request_keys(len(requests))
+        key = job_key(model_name, keys, requests)
+        record = self.manifest.load(key)
+        if record is not None and record.get("state") not in FAILED_STATES:
+            print(f"Resuming batch job {record['job_name']} ({record.get('state')})")
+            return record
+
+        data = to_jsonl(keys, requests)
+        file_name = self._call(self.backend.upload, data, display_name)
+        job_name = self._call(self.backend.create, model_path(model_name), file_name, display_name)
+        print(f"Submitted batch job {job_name} with {len(keys)} requests")
+        return self.manifest.save(
+            {
+                "key": key,
+                "job_name": job_name,
+                "display_name": display_name,
+                "model": model_path(model_name),
+                "request_keys": keys,
+                "input_file": file_name,
+                "input_bytes": len(data),
+                "submitted_at": time.time(),
+                "state": "PENDING",
+                "results_file": None,
+                "error": None,
+            }
+        )
+
+    def refresh(self, record):
+        """Update the record with the job's current state"""
+        if record.get("state") in TERMINAL_STATES:
+            return record
+        status = self._call(self.backend.status, record["job_name"])
+        record.update(state=status.state, results_file=status.results_file, error=status.error)
+        return self.manifest.save(record)
+
+    def wait(self, record, poll_interval=30.0, timeout=3600.0, on_state=None):
+        """Poll until the job finishes or timeout seconds pass; returns the record.
+
+        Raises ComfyUI's InterruptProcessingException when the prompt is
+        cancelled meanwhile; the job itself keeps running and can be resumed.
+        """
+        deadline = time.monotonic() + timeout
+        interval = max(1.0, poll_interval)
+        while True:
+            check_interrupted()
+            previous = record.get("state")
+            record = self.refresh(record)
+            if on_state is not None and record["state"] != previous:
+                on_state(record)
+            remaining = deadline - time.monotonic()
+            if record["state"] in TERMINAL_STATES or remaining <= 0:
+                return record
+            self._pause(min(interval, remaining))
+            interval = min(MAX_POLL_INTERVAL, interval * POLL_BACKOFF)
+
+    def _pause(self, seconds):
+        steps = max(1, math.ceil(seconds / INTERRUPT_CHECK_INTERVAL))
+        for _ in range(steps):
+            check_interrupted()
+            self.sleep(seconds / steps)
+
+    def results(self, record):
+        """BatchResults in request order for a succeeded job, downloaded once"""
+        path = self.manifest.results_path(record["key"])
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+        else:
+            if not record.get("results_file"):
+                raise RuntimeError(f"Batch job {record['job_name']} has no results file")
+            data = self._call(self.backend.download, record["results_file"])
+            self.manifest.save_results(record["key"], data)
+        return results_in_order(record["request_keys"], parse_results(data))
+
+    def cancel(self, record):
+        self._call(self.backend.cancel, record["job_name"])
+        return self.refresh(record)
+
+
+def describe(record):
+    """One status line for a manifest record"""
+    elapsed = time.time() - record.get("submitted_at", time.time())
+    line = (
+        f"Batch job {record['job_name']}: {record.get('state')}, "
+        f"{len(record.get('request_keys', []))} requests, submitted {elapsed / 60:.0f} min ago"
+    )
+    if record.get("error"):
+        line += f"\nError: {record['error']}"
+    return line
+
+
+def get_backend(api_key, config=None):
+    """REST backend at BATCH_BASE_URL from config.json when set, else google.genai"""
+    config = config or {}
+    base_url = config.get("BATCH_BASE_URL")
+    if base_url:
+        return RestBackend(base_url, api_key)
+    from .client import get_client
+
+    return SdkBackend(get_client(api_key, pool_size=config.get("HTTP_POOL_SIZE")))
+
+
+def get_manifest(config=None):
+    """Manifest in BATCH_JOB_DIR from config.json, or cache/batch_jobs"""
+    return JobManifest((config or {}).get("BATCH_JOB_DIR") or DEFAULT_JOB_DIR)
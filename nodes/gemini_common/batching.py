@@ -0,0 +1,30 @@
+"""Concurrent dispatch of independent API calls."""
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def run_concurrently(fn, items, max_workers=DEFAULT_MAX_CONCURRENCY):
+    """Call fn on every item with at most max_workers calls in flight.
+
+    Returns a list of (result, error) pairs in the same order as items, so
+    callers can report failures per item instead of losing the whole batch.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, e
+
+    max_workers = max(1, min(int(max_workers), len(items)))
+    if max_workers == 1:
+        return [call(item) for item in items]
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="gemini-batch"
+    ) as pool:
+        return list(pool.map(call, items))
@@ -0,0 +1,165 @@
+"""Chat history with a token budget and media references.
+
+Each message keeps its estimated token count and its formatted transcript
+line, so adding a turn, checking the budget and rendering the transcript do
+not rescan the whole conversation. When the budget is exceeded the oldest
+turns are dropped, or folded into a running summary when a summarizer is
+given. Media sent with a turn is kept as MediaRef file references and
+replayed with the turn's text.
+"""
+import time
+
+from .retry import call_with_retry
+from .scheduler import estimate_tokens
+
+DEFAULT_TOKEN_BUDGET = 32000
+COMPACTION_MODES = ["summarize", "drop"]
+CHAT_OUTPUTS = ["full_history", "latest_exchange"]
+
+HISTORY_HEADER = "\n=== Chat History ===\n"
+HISTORY_FOOTER = "=== End History ===\n"
+SUMMARY_INTRO = "Summary of our earlier conversation:"
+SUMMARY_REPLY = "Understood, I will keep that in mind."
+
+# The transcript calls the model "assistant"; the API only accepts "model"
+API_ROLES = {"assistant": "model"}
+
+
+def summary_request(summary, messages):
+    """Prompt asking the model to fold messages into the running summary"""
+    lines = [
+        "Summarize the conversation below for your own later reference. Keep names, "
+        "facts, decisions and open questions; omit pleasantries. Reply with the summary only.",
+        "",
+    ]
+    if summary:
+        lines += [f"Earlier summary: {summary}", ""]
+    lines += [f"{msg['role'].upper()}: {msg['content']}" for msg in messages]
+    return "\n".join(lines)
+
+
+def history_summarizer(model, model_version, scheduler, retry_policy, priority):
+    """Summarize old chat turns with the chat model, under the same limits"""
+
+    def summarize(request):
+        def send_request():
+            with scheduler.slot(model_version, estimate_tokens(request), priority) as slot:
+                response = model.generate_content(request)
+                slot.record_usage(response)
+                return response.text
+
+        return call_with_retry(send_request, retry_policy)
+
+    return summarize
+
+
+class ChatHistory:
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET):
+        self.messages = []
+        self.summary = ""
+        self.token_budget = token_budget
+        self.total_tokens = 0
+        self.summary_tokens = 0
+
+    def add_message(self, role, content, media=None):
+        if isinstance(content, list):
+            content = " ".join(str(item) for item in content if isinstance(item, str))
+        media = list(media or [])
+        tokens = estimate_tokens(content) if isinstance(content, str) else 0
+        tokens += sum(ref.tokens for ref in media)
+        line = f"{role.upper()}: {content}"
+        if media:
+            line += f" [{len(media)} attached file{'s' if len(media) > 1 else ''}]"
+        self.messages.append(
+            {
+                "role": role,
+                "content": content,
+                "media": media,
+                "tokens": tokens,
+                "line": line + "\n",
+            }
+        )
+        self.total_tokens += tokens
+
+    def compact(self, reserve=0, summarize=None):
+        """Shrink the history so it plus reserve tokens fits the budget.
+
+        The oldest turns are removed first and the newest exchange is always
+        kept. With summarize (a callable taking a prompt and returning text)
+        the removed turns are folded into the summary; if summarizing fails
+        they are dropped. Returns the number of messages removed.
+        """
+        if not self.token_budget:
+            return 0
+        budget = self.token_budget - reserve
+        removed = []
+        while (
+            len(self.messages) > 2
+            and self.total_tokens + self.summary_tokens > budget
+        ):
+            msg = self.messages.pop(0)
+            self.total_tokens -= msg["tokens"]
+            removed.append(msg)
+        # Never start the history with a model turn
+        while len(self.messages) > 1 and self.messages[0]["role"] != "user":
+            msg = self.messages.pop(0)
+            self.total_tokens -= msg["tokens"]
+            removed.append(msg)
+
+        if removed and summarize is not None:
+            try:
+                self.summary = summarize(summary_request(self.summary, removed)).strip()
+                self.summary_tokens = estimate_tokens(self.summary)
+            except Exception as e:
+                print(f"Chat summary failed, dropping old turns instead: {e}")
+        return len(removed)
+
+    def get_formatted_history(self):
+        lines = [HISTORY_HEADER]
+        if self.summary:
+            lines.append(f"SUMMARY: {self.summary}\n")
+        lines.extend(msg["line"] for msg in self.messages)
+        lines.append(HISTORY_FOOTER)
+        return "".join(lines)
+
+    def get_latest_exchange(self):
+        """Transcript of the newest user message and everything after it"""
+        start = 0
+        for i in range(len(self.messages) - 1, -1, -1):
+            if self.messages[i]["role"] == "user":
+                start = i
+                break
+        return "".join(msg["line"] for msg in self.messages[start:])
+
+    def get_messages_for_api(self):
+        api_messages = []
+        if self.summary:
+            api_messages += [
+                {"role": "user", "parts": [{"text": f"{SUMMARY_INTRO} {self.summary}"}]},
+                {"role": "model", "parts": [{"text": SUMMARY_REPLY}]},
+            ]
+        now = time.time()
+        for msg in self.messages:
+            if isinstance(msg["content"], str):
+                parts = [{"text": msg["content"]}]
+                expired = 0
+                for ref in msg["media"]:
+                    if ref.is_available(now):
+                        parts.append(ref.api_part())
+                    else:
+                        expired += 1
+                if expired:
+                    parts.append({"text": f"({expired} earlier attachment(s) are no longer available)"})
+                api_messages.append(
+                    {
+                        "role": API_ROLES.get(msg["role"], msg["role"]),
+                        "parts": parts,
+                    }
+                )
+        return api_messages
+
+    def clear(self):
+        self.messages = []
+        self.summary = ""
+        self.total_tokens = 0
+        self.summary_tokens = 0
@@ -0,0 +1,128 @@
+"""Process-wide registry of Gemini clients and model handles.
+
+Both node classes share one ``google.genai`` client per (api_key, transport)
+so HTTP connections stay alive between executions, and one
+``google.generativeai`` model handle per (model, safety settings).
+"""
+import threading
+
+DEFAULT_TRANSPORT = "rest"
+DEFAULT_POOL_SIZE = 10
+KEEPALIVE_EXPIRY = 120.0
+
+_lock = threading.RLock()
+_clients = {}
+_models = {}
+_legacy_config = None
+
+
+def _create_client(api_key, pool_size):
+    from google import genai
+    from google.genai import types
+
+    try:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        http_options = types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+        return genai.Client(api_key=api_key, http_options=http_options)
+    except (ImportError, TypeError, ValueError) as e:
+        # Older google-genai releases do not accept client_args
+        print(f"Connection pool options unavailable, using defaults: {e}")
+        return genai.Client(api_key=api_key)
+
+
+def get_client(api_key, transport=DEFAULT_TRANSPORT, pool_size=None):
+    """Return the shared google.genai Client for this api_key and transport"""
+    key = (api_key, transport)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create_client(api_key, int(pool_size or DEFAULT_POOL_SIZE))
+            _clients[key] = client
+        return client
+
+
+def configure_legacy(api_key, transport=DEFAULT_TRANSPORT):
+    """Configure google.generativeai, skipping the call if nothing changed.
+
+    genai.configure() drops the SDK's cached clients, so calling it on every
+    execution forces new connections.
+    """
+    global _legacy_config
+    import google.generativeai as legacy_genai
+
+    with _lock:
+        if _legacy_config != (api_key, transport):
+            legacy_genai.configure(api_key=api_key, transport=transport)
+            _legacy_config = (api_key, transport)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def get_generative_model(
+    api_key, model_name, safety_settings=None, transport=DEFAULT_TRANSPORT
+):
+    """Return a cached google.generativeai GenerativeModel handle"""
+    import google.generativeai as legacy_genai
+
+    key = (api_key, transport, model_name, _freeze(safety_settings))
+    with _lock:
+        configure_legacy(api_key, transport)
+        model = _models.get(key)
+        if model is None:
+            model = legacy_genai.GenerativeModel(model_name)
+            model.safety_settings = safety_settings
+            _models[key] = model
+        return model
+
+
+def clear():
+    """Drop every cached client and model handle"""
+    global _legacy_config
+    with _lock:
+        _clients.clear()
+        _models.clear()
+        _legacy_config = None
+
+
+def request_seed(seed, offset=0):
+    """Map the node's seed input onto the API's int32 seed, or None when unset"""
+    if not seed:
+        return None
+    return (int(seed) + offset) % (2**31)
+
+
+def _legacy_supports_seed():
+    import google.generativeai as legacy_genai
+
+    try:
+        fields = legacy_genai.protos.GenerationConfig.pb().DESCRIPTOR.fields_by_name
+    except AttributeError:
+        return False
+    return "seed" in fields
+
+
+def legacy_generation_config(max_output_tokens, temperature, seed=0):
+    """Build a google.generativeai generation config, including the seed when supported"""
+    config = {"max_output_tokens": max_output_tokens, "temperature": temperature}
+    api_seed = request_seed(seed)
+    if api_seed is not None:
+        if _legacy_supports_seed():
+            config["seed"] = api_seed
+        else:
+            print("Installed google-generativeai does not support seeds, ignoring seed")
+    return config
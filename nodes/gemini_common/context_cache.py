@@ -0,0 +1,181 @@
+"""Server-side context caching of stable request prefixes.
+
+A prefix (the Additional_Context of text requests, or reference media) that
+is sent with many different prompts is stored once as a Gemini CachedContent.
+Later requests use a model bound to that cache and send only their variable
+part. Cache lifetimes are tracked locally, so an entry is recreated shortly
+before the server would drop it rather than failing a request.
+"""
+import datetime
+import threading
+import time
+
+from .hashing import fingerprint
+from .scheduler import estimate_tokens
+
+DEFAULT_TTL = 600
+# Stop using an entry this many seconds before its server-side expiry
+EXPIRY_MARGIN = 30
+# Smallest prefix the API will cache; smaller prefixes are sent normally
+MIN_PREFIX_TOKENS = 1024
+# Input types whose prepared request includes Additional_Context
+CONTEXT_INPUT_TYPES = ("text",)
+
+
+def split_cacheable_prefix(content_parts, input_type, prompt, Additional_Context=None):
+    """Split prepared content into a stable prefix and the per-prompt part.
+
+    Additional_Context only goes into the prefix for input types that send
+    it, so a cached request never carries more than the uncached one.
+    """
+    parts = content_parts[0].get("parts", content_parts) if content_parts else []
+    prefix = []
+    if Additional_Context and input_type in CONTEXT_INPUT_TYPES:
+        prefix.append({"text": Additional_Context})
+    prefix += [part for part in parts if not isinstance(part, dict)]
+    if input_type == "text":
+        # The text part has Additional_Context appended; only the prompt varies
+        variable = [{"text": prompt}]
+    else:
+        variable = [part for part in parts if isinstance(part, dict)]
+    return prefix, variable
+
+
+def _direct(fn):
+    return fn()
+
+
+def _part_key(part):
+    if isinstance(part, dict):
+        return part
+    inline = getattr(part, "inline_data", None)
+    if inline is not None and getattr(inline, "data", None):
+        return (inline.mime_type, bytes(inline.data))
+    return repr(part)
+
+
+class _Entry:
+    def __init__(self, cached_content, model, expires_at, tokens):
+        self.cached_content = cached_content
+        self.model = model
+        self.expires_at = expires_at
+        self.tokens = tokens
+
+    def remaining(self, now=None):
+        return self.expires_at - (now or time.time())
+
+
+class ContextCacheManager:
+    def __init__(self, min_prefix_tokens=MIN_PREFIX_TOKENS):
+        self.min_prefix_tokens = min_prefix_tokens
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def cached_model(
+        self, api_key, model_name, prefix, ttl=DEFAULT_TTL, safety_settings=None, run=_direct
+    ):
+        """Return (model bound to a cache of prefix, status text).
+
+        The model is None when the prefix is too small or the cache could not
+        be created; the caller then sends the full request. run(fn) performs
+        the creation call, e.g. under the scheduler and retry policy.
+        """
+        tokens = estimate_tokens(prefix)
+        if tokens < self.min_prefix_tokens:
+            return None, (
+                f"Context cache skipped: prefix of ~{tokens} tokens is below "
+                f"the {self.min_prefix_tokens} token minimum"
+            )
+
+        key = fingerprint(
+            api_key, model_name, [_part_key(part) for part in prefix], safety_settings
+        )
+        # Concurrent requests for the same prefix wait for one creation
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+            now = time.time()
+            if entry is not None and entry.remaining(now) > EXPIRY_MARGIN:
+                return entry.model, (
+                    f"Context cache reused ({entry.tokens} tokens, "
+                    f"expires in {entry.remaining(now):.0f}s)"
+                )
+            expired = entry is not None
+
+            try:
+                entry = self._create(api_key, model_name, prefix, ttl, safety_settings, run)
+            except Exception as e:
+                with self._lock:
+                    self._entries.pop(key, None)
+                return None, f"Context cache unavailable, sent full request: {e}"
+            with self._lock:
+                self._entries[key] = entry
+            action = "expired and was recreated" if expired else "created"
+            return entry.model, f"Context cache {action} ({entry.tokens} tokens, TTL {ttl}s)"
+
+    def _create(self, api_key, model_name, prefix, ttl, safety_settings, run):
+        import google.generativeai as legacy_genai
+        from google.generativeai import caching
+
+        from .client import configure_legacy
+
+        configure_legacy(api_key)
+        expires_at = time.time() + ttl
+        cached_content = run(
+            lambda: caching.CachedContent.create(
+                model=model_name,
+                display_name="comfyui-gemini-prefix",
+                contents=[{"role": "user", "parts": list(prefix)}],
+                ttl=datetime.timedelta(seconds=ttl),
+            )
+        )
+        model = legacy_genai.GenerativeModel.from_cached_content(
+            cached_content=cached_content, safety_settings=safety_settings
+        )
+        usage = getattr(cached_content, "usage_metadata", None)
+        tokens = getattr(usage, "total_token_count", None) or estimate_tokens(prefix)
+        return _Entry(cached_content, model, expires_at, tokens)
+
+    def invalidate(self, model):
+        """Forget the entry behind model, e.g. after the server rejected it"""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.model is model:
+                    del self._entries[key]
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "name": entry.cached_content.name,
+                    "tokens": entry.tokens,
+                    "expires_in": round(entry.remaining(now)),
+                }
+                for entry in self._entries.values()
+            ]
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def get_context_cache(config=None):
+    """Return the process-wide context cache manager, creating it on first use.
+
+    The CONTEXT_CACHE_MIN_TOKENS config.json entry overrides the minimum
+    prefix size.
+    """
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            config = config or {}
+            _default_manager = ContextCacheManager(
+                int(config.get("CONTEXT_CACHE_MIN_TOKENS") or MIN_PREFIX_TOKENS)
+            )
+        return _default_manager
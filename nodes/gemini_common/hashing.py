@@ -0,0 +1,63 @@
+"""Content hashing for node inputs (prompts, IMAGE/AUDIO tensors, options)."""
+import hashlib
+
+import numpy as np
+
+
+def _update_array(h, array):
+    array = np.ascontiguousarray(array)
+    h.update(f"{array.dtype.str}{array.shape}".encode("utf-8"))
+    # Viewed as flat bytes without a copy; also valid for zero-size and 0-d arrays
+    h.update(array.reshape(-1).view(np.uint8))
+
+
+def _update_tensor(h, tensor):
+    tensor = tensor.detach()
+    if tensor.device.type != "cpu":
+        tensor = tensor.cpu()
+    if not tensor.is_contiguous():
+        tensor = tensor.contiguous()
+    # .numpy() shares memory with a CPU tensor, so no copy is made here
+    _update_array(h, tensor.numpy())
+
+
+def update_hash(h, value):
+    """Feed value into hashlib object h, tagging types so values can't collide"""
+    if value is None:
+        h.update(b"N")
+    elif isinstance(value, bool):
+        h.update(b"B1" if value else b"B0")
+    elif isinstance(value, (int, float)):
+        h.update(f"F{value!r};".encode("utf-8"))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        h.update(f"S{len(data)};".encode("utf-8"))
+        h.update(data)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        h.update(f"Y{len(value)};".encode("utf-8"))
+        h.update(value)
+    elif isinstance(value, np.ndarray):
+        h.update(b"A")
+        _update_array(h, value)
+    elif hasattr(value, "detach") and hasattr(value, "is_contiguous"):
+        h.update(b"T")
+        _update_tensor(h, value)
+    elif isinstance(value, dict):
+        h.update(f"D{len(value)};".encode("utf-8"))
+        for key in sorted(value, key=str):
+            update_hash(h, str(key))
+            update_hash(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update(f"L{len(value)};".encode("utf-8"))
+        for item in value:
+            update_hash(h, item)
+    else:
+        update_hash(h, repr(value))
+
+
+def fingerprint(*values):
+    """Return a hex digest over all values"""
+    h = hashlib.blake2b(digest_size=20)
+    for value in values:
+        update_hash(h, value)
+    return h.hexdigest()
@@ -0,0 +1,425 @@
+"""Gemini Live sessions fed from a microphone or a recorded waveform.
+
+Audio is sent to a bidirectional Live session in 100 ms chunks of 16 kHz
+16-bit PCM while it is being captured, so the model can start answering
+before the speaker has finished. Text, transcripts and audio come back as
+they are generated. The session is opened through a connector (a callable
+returning an async context manager): google.genai's Live API by default, or
+a plain websocket speaking the same JSON protocol, so a local stand-in or
+proxy can take the place of the Gemini endpoint.
+"""
+import asyncio
+import base64
+import contextlib
+import json
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .recording import DEFAULT_MAX_DURATION, SilenceDetector
+
+LIVE_SAMPLE_RATE = 16000
+OUTPUT_SAMPLE_RATE = 24000
+CHUNK_SECONDS = 0.1
+PCM_MIME_TYPE = f"audio/pcm;rate={LIVE_SAMPLE_RATE}"
+LIVE_RESPONSES = ["text", "audio"]
+# Longest wait for the model's turn after the audio has been sent
+RESPONSE_TIMEOUT = 60.0
+
+
+class LiveResult(NamedTuple):
+    text: str
+    audio: bytes
+    chunks_sent: int
+    audio_seconds: float
+    # Seconds from the end of speech to the first response, negative when
+    # the model started answering before the speaker stopped
+    latency: Optional[float]
+    # Seconds from the end of speech to the end of the model's turn
+    turn_seconds: float
+
+    def describe(self):
+        lines = [f"Live: sent {self.audio_seconds:.1f}s of audio in {self.chunks_sent} chunks"]
+        if self.latency is None:
+            lines.append("No response received")
+        elif self.latency < 0:
+            lines.append(f"First response {-self.latency:.2f}s before end of speech")
+        else:
+            lines.append(f"First response {self.latency:.2f}s after end of speech")
+        lines.append(f"Turn complete {self.turn_seconds:.2f}s after end of speech")
+        if self.audio:
+            lines.append(f"Received {len(self.audio) / 2 / OUTPUT_SAMPLE_RATE:.1f}s of audio")
+        return "\n".join(lines)
+
+
+def pcm16(samples):
+    """Float samples in [-1, 1] as little-endian 16-bit PCM bytes"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def live_config(response="text", system_instruction=None):
+    """LiveConnectConfig for a session answering in text or in audio"""
+    config = {"response_modalities": [response.upper()]}
+    if response == "audio":
+        # Also return what the model said as text
+        config["output_audio_transcription"] = {}
+    if system_instruction:
+        config["system_instruction"] = system_instruction
+    return config
+
+
+def sdk_connector(api_key, model_name, config):
+    """Connector opening a session through google.genai's Live API"""
+    from .client import get_client
+
+    client = get_client(api_key)
+    return lambda: client.aio.live.connect(model=model_name, config=config)
+
+
+class _WebSocketSession:
+    """The parts of google.genai's AsyncSession that stream_turn uses"""
+
+    def __init__(self, websocket):
+        self._websocket = websocket
+
+    async def send_realtime_input(self, *, audio=None, audio_stream_end=None):
+        message = {}
+        if audio is not None:
+            message["audio"] = {
+                "data": base64.b64encode(audio["data"]).decode("ascii"),
+                "mimeType": audio["mime_type"],
+            }
+        if audio_stream_end:
+            message["audioStreamEnd"] = True
+        await self._websocket.send(json.dumps({"realtimeInput": message}))
+
+    async def receive(self):
+        async for raw in self._websocket:
+            content = json.loads(raw).get("serverContent") or {}
+            parts = (content.get("modelTurn") or {}).get("parts") or []
+            audio = [base64.b64decode(p["inlineData"]["data"]) for p in parts if "inlineData" in p]
+            transcription = content.get("outputTranscription") or {}
+            yield SimpleNamespace(
+                text="".join(p.get("text", "") for p in parts) or None,
+                data=b"".join(audio) or None,
+                server_content=SimpleNamespace(
+                    output_transcription=SimpleNamespace(text=transcription.get("text")),
+                    turn_complete=bool(content.get("turnComplete")),
+                ),
+            )
+            if content.get("turnComplete"):
+                break
+
+
+def websocket_connector(url, model_name, config):
+    """Connector speaking the Live API's JSON protocol to url over a plain websocket.
+
+    The SDK only connects to wss endpoints, so this is how sessions reach a
+    local stand-in or a proxy.
+    """
+
+    @contextlib.asynccontextmanager
+    async def connect():
+        import websockets
+
+        setup = {
+            "model": model_name if model_name.startswith("models/") else f"models/{model_name}",
+            "generationConfig": {"responseModalities": config["response_modalities"]},
+        }
+        if config.get("system_instruction"):
+            setup["systemInstruction"] = {"parts": [{"text": config["system_instruction"]}]}
+        if "output_audio_transcription" in config:
+            setup["outputAudioTranscription"] = {}
+
+        async with websockets.connect(url) as websocket:
+            await websocket.send(json.dumps({"setup": setup}))
+            reply = json.loads(await websocket.recv())
+            if "setupComplete" not in reply:
+                raise RuntimeError(f"Live session setup failed: {reply}")
+            yield _WebSocketSession(websocket)
+
+    return connect
+
+
+class WaveformChunks:
+    """Async iterable of PCM chunks of a [samples] float waveform at 16 kHz.
+
+    The speech ends with the last chunk.
+    """
+
+    speech_end = None
+
+    def __init__(self, samples, chunk_seconds=CHUNK_SECONDS):
+        self.samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        self.chunk = max(1, int(LIVE_SAMPLE_RATE * chunk_seconds))
+
+    async def __aiter__(self):
+        for start in range(0, len(self.samples), self.chunk):
+            yield pcm16(self.samples[start : start + self.chunk])
+
+
+class StreamResampler:
+    """Resamples audio that arrives in blocks as if it were one signal.
+
+    resample is a one-pass resampler from orig_freq to new_freq (such as
+    torchaudio's Resample) whose kernel reaches at most context input samples
+    to either side. Resampling each block on its own pads it with zeros and
+    clicks at every block edge; here every block is resampled together with
+    the samples around it and only the part with full context is emitted.
+    Output lags the input by about context samples until flush().
+    """
+
+    def __init__(self, resample, orig_freq, new_freq, context):
+        gcd = math.gcd(int(orig_freq), int(new_freq))
+        self.resample = resample
+        self.orig = int(orig_freq) // gcd
+        self.new = int(new_freq) // gcd
+        # Whole resampling periods, so every call stays in phase with one pass
+        self.context = self.orig * math.ceil(context / self.orig)
+        self._buffer = np.zeros(self.context, dtype=np.float32)
+
+    def _emit(self, buffer, count):
+        """Resampled buffer[context:context + count], given context on both sides"""
+        out = self.resample(buffer)
+        start = self.context * self.new // self.orig
+        return out[start:start + math.ceil(count * self.new / self.orig)]
+
+    def __call__(self, block):
+        self._buffer = np.concatenate([self._buffer, np.asarray(block, dtype=np.float32)])
+        ready = (len(self._buffer) - 2 * self.context) // self.orig * self.orig
+        if ready <= 0:
+            return np.zeros(0, dtype=np.float32)
+        out = self._emit(self._buffer[: ready + 2 * self.context], ready)
+        self._buffer = self._buffer[ready:]
+        return out
+
+    def flush(self):
+        """Resample the held-back samples as the end of the signal"""
+        pending = len(self._buffer) - self.context
+        padding = -(len(self._buffer) + self.context) % self.orig + self.context
+        buffer = np.concatenate([self._buffer, np.zeros(padding, dtype=np.float32)])
+        self._buffer = np.zeros(self.context, dtype=np.float32)
+        if pending <= 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._emit(buffer, pending)
+
+
+def torch_stream_resampler(orig_freq, new_freq=LIVE_SAMPLE_RATE):
+    """StreamResampler around the shared torchaudio Resample for a rate pair"""
+    import torch
+
+    from .audio import get_resampler
+
+    resampler = get_resampler(orig_freq, new_freq)
+
+    def resample(samples):
+        with torch.no_grad():
+            return resampler(torch.from_numpy(samples)[None])[0].numpy()
+
+    # torchaudio keeps the kernel's reach in input samples as width
+    return StreamResampler(resample, orig_freq, new_freq, getattr(resampler, "width", 64))
+
+
+class MicrophoneChunks:
+    """Async iterable of PCM chunks captured live from an input device.
+
+    Every iteration opens the device and yields 100 ms chunks until
+    silence_duration seconds of silence (or max_duration in total).
+    speech_end is the time of the last sound of the latest capture.
+    """
+
+    def __init__(
+        self,
+        device=None,
+        sample_rate=LIVE_SAMPLE_RATE,
+        silence_threshold=0.01,
+        silence_duration=2.0,
+        max_duration=DEFAULT_MAX_DURATION,
+        chunk_seconds=CHUNK_SECONDS,
+    ):
+        self.device = device
+        self.sample_rate = sample_rate
+        self.silence_threshold = silence_threshold
+        self.silence_duration = silence_duration
+        self.max_duration = max_duration
+        self.chunk_seconds = chunk_seconds
+        self.speech_end = None
+
+    def _open_rate(self, sd):
+        """Capture at 16 kHz when the device supports it, else at sample_rate"""
+        try:
+            sd.check_input_settings(device=self.device, channels=1, samplerate=LIVE_SAMPLE_RATE)
+            return LIVE_SAMPLE_RATE
+        except Exception:
+            return self.sample_rate
+
+    async def __aiter__(self):
+        import sounddevice as sd
+
+        rate = self._open_rate(sd)
+        resampler = None
+        if rate != LIVE_SAMPLE_RATE:
+            resampler = torch_stream_resampler(rate)
+
+        loop = asyncio.get_running_loop()
+        blocks = asyncio.Queue()
+        detector = SilenceDetector(self.silence_threshold, self.silence_duration, rate)
+        limit = int(self.max_duration * rate)
+        captured = 0
+        self.speech_end = None
+
+        def callback(indata, frames, time_info, status):
+            nonlocal captured
+            block = indata[:, 0].copy()
+            stop = detector.update(indata)
+            if detector.quiet_frames < frames:
+                self.speech_end = time.perf_counter() - detector.quiet_frames / rate
+            captured += frames
+            loop.call_soon_threadsafe(blocks.put_nowait, block)
+            if stop or captured >= limit:
+                loop.call_soon_threadsafe(blocks.put_nowait, None)
+                raise sd.CallbackStop
+
+        with sd.InputStream(
+            device=self.device,
+            channels=1,
+            dtype="float32",
+            samplerate=rate,
+            blocksize=int(rate * self.chunk_seconds),
+            callback=callback,
+            finished_callback=lambda: loop.call_soon_threadsafe(blocks.put_nowait, None),
+        ):
+            while (block := await blocks.get()) is not None:
+                if resampler is not None:
+                    block = resampler(block)
+                    if not len(block):
+                        continue
+                yield pcm16(block)
+        if resampler is not None and len(tail := resampler.flush()):
+            yield pcm16(tail)
+
+
+class AudioPlayer:
+    """Plays 24 kHz PCM response audio on the default output as it arrives"""
+
+    def __init__(self, sample_rate=OUTPUT_SAMPLE_RATE):
+        import sounddevice as sd
+
+        self._stream = sd.RawOutputStream(samplerate=sample_rate, channels=1, dtype="int16")
+        self._stream.start()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="gemini-live-audio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while (data := self._queue.get()) is not None:
+            self._stream.write(data)
+
+    def play(self, data):
+        self._queue.put(data)
+
+    def close(self):
+        """Finish playing the queued audio and release the device"""
+        self._queue.put(None)
+        self._thread.join()
+        self._stream.stop()
+        self._stream.close()
+
+
+def _message_text(message):
+    try:
+        text = message.text
+    except (AttributeError, ValueError):
+        text = None
+    if text:
+        return text
+    server_content = getattr(message, "server_content", None)
+    transcription = getattr(server_content, "output_transcription", None)
+    return getattr(transcription, "text", None) or ""
+
+
+async def stream_turn(connect, chunks, on_text=None, on_audio=None, response_timeout=RESPONSE_TIMEOUT):
+    """Stream audio chunks into a Live session and collect one model turn.
+
+    connect() returns an async context manager yielding a session with
+    send_realtime_input() and receive(), like google.genai's AsyncSession.
+    chunks is an async iterable of 16 kHz PCM bytes; its speech_end
+    attribute, when set, marks the end of speech for the latency figures.
+    on_text and on_audio are called with every piece of the response.
+    """
+    async with connect() as session:
+        sent = 0
+        sent_bytes = 0
+        chunks_done = None
+        first_response = None
+        text = []
+        audio = []
+
+        async def send_audio():
+            nonlocal sent, sent_bytes, chunks_done
+            async for data in chunks:
+                await session.send_realtime_input(audio={"data": data, "mime_type": PCM_MIME_TYPE})
+                sent += 1
+                sent_bytes += len(data)
+            chunks_done = time.perf_counter()
+            await session.send_realtime_input(audio_stream_end=True)
+
+        async def receive():
+            nonlocal first_response
+            async for message in session.receive():
+                piece = _message_text(message)
+                data = getattr(message, "data", None)
+                if (piece or data) and first_response is None:
+                    first_response = time.perf_counter()
+                if piece:
+                    text.append(piece)
+                    if on_text is not None:
+                        on_text(piece)
+                if data:
+                    audio.append(data)
+                    if on_audio is not None:
+                        on_audio(data)
+            return time.perf_counter()
+
+        sender = asyncio.create_task(send_audio())
+        receiver = asyncio.create_task(receive())
+        try:
+            await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if sender.done():
+                sender.result()
+            else:
+                # The model finished its turn while the capture was running
+                sender.cancel()
+            turn_complete = await asyncio.wait_for(receiver, response_timeout)
+        finally:
+            for task in (sender, receiver):
+                if not task.done():
+                    task.cancel()
+
+    end_of_speech = getattr(chunks, "speech_end", None) or chunks_done or turn_complete
+    return LiveResult(
+        text="".join(text),
+        audio=b"".join(audio),
+        chunks_sent=sent,
+        audio_seconds=sent_bytes / 2 / LIVE_SAMPLE_RATE,
+        latency=None if first_response is None else first_response - end_of_speech,
+        turn_seconds=turn_complete - end_of_speech,
+    )
+
+
+def run_live_turn(connect, chunks, on_text=None, on_audio=None, response_timeout=RESPONSE_TIMEOUT):
+    """Blocking wrapper around stream_turn for node code.
+
+    The turn runs in its own event loop on a dedicated thread, since the
+    calling thread may already be running one (ComfyUI's server loop).
+    on_text and on_audio are called from that thread.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="gemini-live") as pool:
+        turn = stream_turn(connect, chunks, on_text, on_audio, response_timeout)
+        return pool.submit(asyncio.run, turn).result()
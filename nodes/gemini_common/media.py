@@ -0,0 +1,236 @@
+"""Batched conversion between ComfyUI IMAGE tensors and encoded images."""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import NamedTuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from .hashing import fingerprint
+from .media_cache import get_media_cache
+
+ENCODE_WORKERS = min(8, os.cpu_count() or 1)
+
+IMAGE_FORMATS = ["png", "jpeg", "webp"]
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+# How decoded images of different sizes are brought to one batch shape
+IMAGE_FITS = ["pad", "resize"]
+
+
+class ImageEncoding(NamedTuple):
+    """Wire encoding for uploaded images.
+
+    quality applies to JPEG and WebP, compress_level (0-9) to PNG.
+    """
+
+    format: str = "png"
+    quality: int = 90
+    compress_level: int = 6
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES[self.format]
+
+    def save_options(self):
+        if self.format == "png":
+            return {"format": "PNG", "compress_level": self.compress_level}
+        if self.format == "jpeg":
+            return {"format": "JPEG", "quality": self.quality}
+        if self.format == "webp":
+            return {"format": "WEBP", "quality": self.quality}
+        raise ValueError(f"Unsupported image encoding: {self.format}")
+
+
+DEFAULT_ENCODING = ImageEncoding()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _encode_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=ENCODE_WORKERS, thread_name_prefix="gemini-encode"
+            )
+        return _pool
+
+
+def fit_size(width, height, max_size):
+    """Scale (width, height) so the longest side is at most max_size"""
+    if width > height:
+        if width > max_size:
+            height = int(max_size * height / width)
+            width = max_size
+    else:
+        if height > max_size:
+            width = int(max_size * width / height)
+            height = max_size
+    return width, height
+
+
+def image_batches(images, max_images):
+    """Split an images input into [B, H, W, C] tensors holding at most max_images in total.
+
+    Accepts a batched tensor, a single [H, W, C] tensor or a list of tensors
+    (only the first image of each list entry is used).
+    """
+    if images is None:
+        return []
+    if isinstance(images, torch.Tensor):
+        if images.dim() == 3:
+            images = images.unsqueeze(0)
+        return [images[:max_images]] if images.shape[0] else []
+
+    batches = []
+    if isinstance(images, list):
+        for img_tensor in images[:max_images]:
+            if img_tensor.dim() == 4:
+                img_tensor = img_tensor[:1]
+            else:
+                img_tensor = img_tensor.unsqueeze(0)
+            batches.append(img_tensor)
+    return batches
+
+
+def tensor_batch_to_uint8(batch, size):
+    """Resize a [B, H, W, C] float tensor to size (width, height) as a uint8 RGB array.
+
+    The whole batch is resized with antialiased bicubic interpolation and
+    converted to uint8 in single tensor operations.
+    """
+    batch = batch.detach()
+    if batch.dim() == 3:
+        batch = batch.unsqueeze(0)
+    batch = batch[..., :3]
+
+    height, width = batch.shape[1], batch.shape[2]
+    new_width, new_height = size
+    if (new_height, new_width) != (height, width):
+        resized = F.interpolate(
+            batch.movedim(-1, 1).float(),
+            size=(new_height, new_width),
+            mode="bicubic",
+            antialias=True,
+            align_corners=False,
+        )
+        batch = resized.movedim(1, -1)
+
+    return batch.mul(255).clamp_(0, 255).to(torch.uint8).contiguous().cpu().numpy()
+
+
+def tensor_batch_to_pil(batch, max_size):
+    """Convert a [B, H, W, C] float tensor into RGB PIL images no larger than max_size"""
+    height, width = batch.shape[-3], batch.shape[-2]
+    pixels = tensor_batch_to_uint8(batch, fit_size(width, height, max_size))
+    return [Image.fromarray(frame, mode="RGB") for frame in pixels]
+
+
+def sample_frame_indices(total_frames, num_samples):
+    """Indices of num_samples frames spread evenly over the clip"""
+    if total_frames <= num_samples:
+        return np.arange(total_frames)
+    return np.linspace(0, total_frames - 1, num_samples, dtype=int)
+
+
+def encode_image(image, encoding=DEFAULT_ENCODING):
+    buffer = BytesIO()
+    image.save(buffer, **encoding.save_options())
+    return buffer.getvalue()
+
+
+def encode_images(pil_images, encoding=DEFAULT_ENCODING):
+    """Encode PIL images in the shared worker pool, preserving order"""
+    encoding = encoding or DEFAULT_ENCODING
+    if len(pil_images) <= 1:
+        return [encode_image(image, encoding) for image in pil_images]
+    return list(
+        _encode_pool().map(lambda image: encode_image(image, encoding), pil_images)
+    )
+
+
+def encode_image_input(images, max_images, max_size, encoding=DEFAULT_ENCODING):
+    """Resize and encode an images input, returning encoded bytes in input order.
+
+    Each image is looked up in the encoded media cache by content hash and
+    encoding settings; only the misses are converted and encoded.
+    """
+    encoding = encoding or DEFAULT_ENCODING
+    cache = get_media_cache()
+    encoded = []
+    for batch in image_batches(images, max_images):
+        keys = [(fingerprint(image), max_size, encoding) for image in batch]
+        results = [cache.get(key) for key in keys]
+        missing = [i for i, data in enumerate(results) if data is None]
+        if missing:
+            subset = batch if len(missing) == len(results) else batch[missing]
+            fresh = encode_images(tensor_batch_to_pil(subset, max_size), encoding)
+            for i, data in zip(missing, fresh):
+                results[i] = data
+                cache.put(keys[i], data)
+        encoded.extend(results)
+    return encoded
+
+
+def _decode_into(out, image, fit):
+    """Decode a PIL image into the [H, W, 3] float tensor out"""
+    image = image.convert("RGB")
+    height, width = out.shape[0], out.shape[1]
+    if image.size != (width, height):
+        if fit == "resize":
+            image = image.resize((width, height), Image.BICUBIC)
+        else:
+            # Center on the black canvas of the preallocated batch
+            top = (height - image.height) // 2
+            left = (width - image.width) // 2
+            out = out[top : top + image.height, left : left + image.width]
+    # uint8 -> float32 happens inside copy_, straight into the batch tensor
+    out.copy_(torch.from_numpy(np.asarray(image)))
+    out.mul_(1.0 / 255.0)
+
+
+def decode_images(blobs, fit="pad"):
+    """Decode encoded images into one float32 [B, H, W, 3] IMAGE tensor.
+
+    Images are decoded in the shared worker pool directly into a
+    preallocated batch. Images of different sizes are fitted to the largest
+    width and height: "pad" centers them on black, "resize" scales them.
+    Images that cannot be decoded are skipped; returns None if none can.
+    """
+    images = []
+    for data in blobs:
+        try:
+            images.append(Image.open(BytesIO(data)))
+        except Exception as e:
+            print(f"Error processing image: {e}")
+    if not images:
+        return None
+
+    width = max(image.width for image in images)
+    height = max(image.height for image in images)
+    uniform = all(image.size == (width, height) for image in images)
+    allocate = torch.empty if uniform or fit == "resize" else torch.zeros
+    batch = allocate((len(images), height, width, 3), dtype=torch.float32)
+
+    def decode(i):
+        try:
+            _decode_into(batch[i], images[i], fit)
+            return True
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            return False
+
+    if len(images) == 1:
+        decoded = [decode(0)]
+    else:
+        decoded = list(_encode_pool().map(decode, range(len(images))))
+    if not any(decoded):
+        return None
+    if not all(decoded):
+        batch = batch[torch.tensor(decoded)]
+    return batch
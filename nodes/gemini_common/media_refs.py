@@ -0,0 +1,165 @@
+"""References to media already sent in a chat.
+
+Chat turns upload their media once through the Gemini File API and keep the
+returned file URI, keyed by a hash of the bytes. The history replays those
+URIs on later turns instead of the bytes, and sending the same image again
+reuses the existing upload. The media of one turn is uploaded concurrently;
+uploads take a scheduler slot only when MODEL_LIMITS["files"] sets limits
+for the File API. A file that is not ACTIVE by the processing deadline is
+sent inline instead. The uploader is pluggable so a local fake can stand in
+for the File API.
+"""
+import functools
+import hashlib
+import threading
+import time
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from .batching import DEFAULT_MAX_CONCURRENCY, run_concurrently
+from .client import get_client
+from .retry import DEFAULT_POLICY, call_with_retry
+from .scheduler import IMAGE_TOKENS, MEDIA_BYTES_PER_TOKEN, get_scheduler
+
+# Stop replaying an upload this long before the File API deletes it
+EXPIRY_MARGIN = 3600
+PROCESSING_TIMEOUT = 60.0
+# Scheduler key that uploads are admitted under when MODEL_LIMITS["files"] is set
+UPLOAD_SLOT = "files"
+
+
+class MediaRef(NamedTuple):
+    digest: str
+    mime_type: str
+    size: int
+    uri: str
+    expires_at: Optional[float] = None
+
+    @property
+    def tokens(self):
+        if self.mime_type.startswith("image/"):
+            return IMAGE_TOKENS
+        return self.size // MEDIA_BYTES_PER_TOKEN + 1
+
+    def is_available(self, now=None):
+        if self.expires_at is None:
+            return True
+        return (now or time.time()) < self.expires_at - EXPIRY_MARGIN
+
+    def api_part(self):
+        return {"file_data": {"mime_type": self.mime_type, "file_uri": self.uri}}
+
+
+def wait_until_active(file, get_file, timeout=PROCESSING_TIMEOUT, sleep=time.sleep):
+    """Poll get_file(name) while the File API processes file; returns it once ACTIVE.
+
+    Raises ValueError if processing failed or has not finished by the
+    deadline, since a request referencing the file would be rejected.
+    """
+    deadline = time.monotonic() + timeout
+    while file.state.name == "PROCESSING" and time.monotonic() < deadline:
+        sleep(1.0)
+        file = get_file(file.name)
+    if file.state.name != "ACTIVE":
+        raise ValueError(
+            f"File API has not processed {file.name} (state {file.state.name})"
+        )
+    return file
+
+
+def file_api_uploader(data, mime_type, api_key):
+    """Upload bytes to api_key's project and return (uri, expires_at)"""
+    files = get_client(api_key).files
+    file = files.upload(file=BytesIO(data), config={"mime_type": mime_type})
+    file = wait_until_active(file, lambda name: files.get(name=name))
+    expiration = getattr(file, "expiration_time", None)
+    return file.uri, expiration.timestamp() if expiration else None
+
+
+class MediaRegistry:
+    def __init__(self, uploader, scheduler=None):
+        self.uploader = uploader
+        self.scheduler = scheduler
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def reference(self, data, mime_type, priority="interactive", retry_policy=DEFAULT_POLICY):
+        """Return a MediaRef for data, uploading it unless a live upload exists"""
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        key = (digest, mime_type)
+        with self._lock:
+            ref = self._refs.get(key)
+        if ref is not None and ref.is_available():
+            return ref
+
+        scheduler = self.scheduler or get_scheduler()
+
+        def upload():
+            # The File API has its own quota, so the model defaults do not apply
+            if UPLOAD_SLOT not in scheduler.model_limits:
+                return self.uploader(data, mime_type)
+            with scheduler.slot(UPLOAD_SLOT, 0, priority):
+                return self.uploader(data, mime_type)
+
+        uri, expires_at = call_with_retry(upload, retry_policy)
+        ref = MediaRef(digest, mime_type, len(data), uri, expires_at)
+        with self._lock:
+            self._refs[key] = ref
+        return ref
+
+    def reference_parts(
+        self,
+        parts,
+        priority="interactive",
+        max_workers=DEFAULT_MAX_CONCURRENCY,
+        retry_policy=DEFAULT_POLICY,
+    ):
+        """Swap inline media parts for file references.
+
+        Distinct payloads are uploaded concurrently. Returns the new parts
+        and the references made. Parts whose upload fails stay inline and
+        are simply not remembered.
+        """
+        media = []
+        for i, part in enumerate(parts):
+            inline = getattr(part, "inline_data", None)
+            data = getattr(inline, "data", None)
+            if data:
+                media.append((i, (bytes(data), inline.mime_type)))
+
+        payloads = list(dict.fromkeys(payload for _, payload in media))
+        results = run_concurrently(
+            lambda payload: self.reference(*payload, priority, retry_policy),
+            payloads,
+            max_workers=max_workers,
+        )
+        outcomes = dict(zip(payloads, results))
+
+        new_parts = list(parts)
+        refs = []
+        for i, payload in media:
+            ref, error = outcomes[payload]
+            if error is not None:
+                print(f"Media upload failed, sending inline instead: {error}")
+                continue
+            new_parts[i] = ref.api_part()
+            refs.append(ref)
+        return new_parts, refs
+
+    def clear(self):
+        with self._lock:
+            self._refs.clear()
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_media_registry(api_key):
+    """Return the media registry for api_key; uploads belong to one project"""
+    with _registries_lock:
+        registry = _registries.get(api_key)
+        if registry is None:
+            uploader = functools.partial(file_api_uploader, api_key=api_key)
+            registry = _registries[api_key] = MediaRegistry(uploader)
+        return registry
@@ -0,0 +1,27 @@
+"""SDK-native content parts carrying raw media bytes.
+
+Media is handed to the SDKs as bytes and base64-encoded once by the transport,
+instead of being base64-encoded into Python dicts and decoded again.
+"""
+
+
+def inline_part(data, mime_type):
+    """Inline media part for google.generativeai requests"""
+    import google.generativeai as legacy_genai
+
+    return legacy_genai.protos.Part(
+        inline_data=legacy_genai.protos.Blob(mime_type=mime_type, data=data)
+    )
+
+
+def genai_inline_part(data, mime_type):
+    """Inline media part for google.genai requests"""
+    from google.genai import types
+
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+def genai_text_part(text):
+    from google.genai import types
+
+    return types.Part.from_text(text=text)
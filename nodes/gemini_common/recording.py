@@ -0,0 +1,181 @@
+"""Microphone capture helpers for the audio recorder node.
+
+The input stream's callback copies every block into a preallocated ring
+buffer and feeds a silence detector, so no Python loop polls the device and
+no list of chunks is concatenated afterwards. Silence detection and trimming
+work on whole arrays at once. Finished recordings stay in memory in a small
+LRU store instead of going through a temporary WAV file.
+
+sounddevice is imported on first use, and the device list is queried once
+per process rather than on every refresh of the node definitions.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_DURATION = 300.0
+DEFAULT_PRE_ROLL = 0.3
+DEFAULT_POST_ROLL = 0.2
+DEFAULT_MAX_RECORDINGS = 4
+
+_devices_lock = threading.Lock()
+_input_devices = None
+
+
+class RingBuffer:
+    """Preallocated float32 buffer of the most recent capacity frames"""
+
+    def __init__(self, capacity, channels=1):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros((self.capacity, channels), dtype=np.float32)
+        self._end = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def frames_written(self):
+        return self._count
+
+    @property
+    def overflowed(self):
+        return self._count > self.capacity
+
+    def write(self, block):
+        """Append a [frames, channels] block, overwriting the oldest frames when full"""
+        block = block[-self.capacity :]
+        frames = len(block)
+        with self._lock:
+            first = min(frames, self.capacity - self._end)
+            self._data[self._end : self._end + first] = block[:first]
+            self._data[: frames - first] = block[first:]
+            self._end = (self._end + frames) % self.capacity
+            self._count += frames
+
+    def read(self):
+        """The buffered frames in recording order, as a new array"""
+        with self._lock:
+            if self._count < self.capacity:
+                return self._data[: self._end].copy()
+            return np.concatenate((self._data[self._end :], self._data[: self._end]))
+
+
+class SilenceDetector:
+    """Tracks how long the input has stayed below threshold, to the sample"""
+
+    def __init__(self, threshold, duration, sample_rate):
+        self.threshold = threshold
+        self.limit = max(1, int(duration * sample_rate))
+        self.quiet_frames = 0
+
+    def update(self, block):
+        """Feed a [frames, channels] block; True once the silence is long enough"""
+        loud = np.flatnonzero(np.abs(block).max(axis=1) >= self.threshold)
+        if loud.size:
+            self.quiet_frames = len(block) - 1 - loud[-1]
+        else:
+            self.quiet_frames += len(block)
+        return bool(self.quiet_frames >= self.limit)
+
+
+def trim_silence(audio, threshold, sample_rate, pre_roll=DEFAULT_PRE_ROLL, post_roll=DEFAULT_POST_ROLL):
+    """Cut leading and trailing silence from [frames, channels] audio.
+
+    pre_roll and post_roll seconds are kept before the first and after the
+    last sample above threshold. Audio that never crosses the threshold is
+    returned unchanged.
+    """
+    loud = np.flatnonzero(np.abs(audio).max(axis=1) > threshold)
+    if not loud.size:
+        return audio
+    start = max(0, loud[0] - int(pre_roll * sample_rate))
+    end = min(len(audio), loud[-1] + 1 + int(post_roll * sample_rate))
+    return audio[start:end]
+
+
+def input_device_names(refresh=False):
+    """Names of the available input devices, queried once and then cached.
+
+    refresh re-initializes PortAudio first, so devices connected since
+    startup are listed too.
+    """
+    global _input_devices
+    with _devices_lock:
+        if _input_devices is None or refresh:
+            try:
+                import sounddevice as sd
+
+                if refresh:
+                    # PortAudio only enumerates devices when it is initialized
+                    sd._terminate()
+                    sd._initialize()
+                devices = sd.query_devices()
+                _input_devices = [d["name"] for d in devices if d["max_input_channels"] > 0]
+            except (ImportError, OSError) as e:
+                print(f"Could not list audio input devices: {e}")
+                _input_devices = []
+        return list(_input_devices)
+
+
+def find_input_device(name, devices):
+    """Index of the input device called name in sounddevice's device list, or None"""
+    for index, device in enumerate(devices):
+        if device["name"] == name and device["max_input_channels"] > 0:
+            return index
+    return None
+
+
+class RecordingStore:
+    """Recent recordings kept in memory; the least recently used are evicted.
+
+    A recording may also have been saved to a file, which is deleted when the
+    recording is evicted or the store is cleared.
+    """
+
+    def __init__(self, max_recordings=DEFAULT_MAX_RECORDINGS):
+        self.max_recordings = max(1, int(max_recordings))
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, waveform, sample_rate, path=None):
+        with self._lock:
+            previous = self._items.pop(key, None)
+            self._items[key] = (waveform, sample_rate, path)
+            evicted = [previous] if previous is not None else []
+            while len(self._items) > self.max_recordings:
+                evicted.append(self._items.popitem(last=False)[1])
+        for _, _, old_path in evicted:
+            if old_path != path:
+                self._remove(old_path)
+
+    def get(self, key):
+        """(waveform, sample_rate) of a stored recording, or None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[:2]
+
+    def clear(self):
+        with self._lock:
+            items = list(self._items.values())
+            self._items.clear()
+        for _, _, path in items:
+            self._remove(path)
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _remove(path):
+        if not path:
+            return
+        try:
+            os.remove(path)
+            print(f"Cleaned up old recording: {os.path.basename(path)}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing file {path}: {e}")
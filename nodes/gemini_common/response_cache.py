@@ -0,0 +1,273 @@
+"""Content-addressed cache for Gemini responses.
+
+Entries are (text, images) pairs where images is a float32 [B, H, W, C]
+tensor or None. The memory tier is an LRU of the decoded tensors bounded by
+their size in bytes; the disk tier stores the text as JSON and the images as
+uint8 .npy arrays so hits never have to decode PNG data again. Callers get
+their own copy of the images, so a downstream node that modifies them in
+place cannot change what later hits return.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from .audio import DEFAULT_AUDIO_FORMAT
+from .hashing import fingerprint
+from .media import DEFAULT_ENCODING
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+    "cache",
+    "responses",
+)
+DEFAULT_MEMORY_BYTES = 512 * 1024 * 1024
+DEFAULT_DISK_BYTES = 1024 * 1024 * 1024
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        directory=DEFAULT_CACHE_DIR,
+        max_memory_bytes=DEFAULT_MEMORY_BYTES,
+        max_disk_bytes=DEFAULT_DISK_BYTES,
+    ):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._disk_usage = None
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".npy"
+
+    def get(self, key):
+        """Return the cached (text, images) for key, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return _copy(entry)
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+        return _copy(entry)
+
+    def put(self, key, text, images=None):
+        """Store a response in both tiers"""
+        entry = _copy((text, images))
+        with self._lock:
+            self._remember(key, entry)
+        if self.max_disk_bytes > 0:
+            try:
+                self._write_disk(key, text, images)
+            except OSError as e:
+                print(f"Could not write response cache entry: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_bytes": self._disk_usage,
+        }
+
+    def _remember(self, key, entry):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= _entry_bytes(previous)
+        size = _entry_bytes(entry)
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_size += size
+        while self._memory_size > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= _entry_bytes(evicted)
+
+    def _read_disk(self, key):
+        json_path, npy_path = self._paths(key)
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            images = None
+            if meta.get("has_images"):
+                images = torch.from_numpy(np.load(npy_path)).float().div_(255.0)
+            os.utime(json_path)
+            return meta["text"], images
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, text, images):
+        json_path, npy_path = self._paths(key)
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+        written = 0
+        if images is not None:
+            pixels = images.detach().cpu().mul(255).round_().clamp_(0, 255)
+            tmp_path = npy_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, pixels.to(torch.uint8).numpy())
+            os.replace(tmp_path, npy_path)
+            written += os.path.getsize(npy_path)
+        tmp_path = json_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"text": text, "has_images": images is not None}, f)
+        os.replace(tmp_path, json_path)
+        written += os.path.getsize(json_path)
+
+        with self._lock:
+            if self._disk_usage is None:
+                self._disk_usage = self._scan_usage()
+            else:
+                self._disk_usage += written
+            if self._disk_usage > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                json_path = os.path.join(root, name)
+                npy_path = json_path[: -len(".json")] + ".npy"
+                try:
+                    size = os.path.getsize(json_path)
+                    mtime = os.path.getmtime(json_path)
+                    if os.path.exists(npy_path):
+                        size += os.path.getsize(npy_path)
+                except OSError:
+                    continue
+                entries.append((mtime, size, json_path, npy_path))
+        return entries
+
+    def _scan_usage(self):
+        return sum(size for _, size, _, _ in self._entries())
+
+    def _evict_disk(self):
+        # Drop least recently used entries until usage is back under 90% of the limit
+        target = int(self.max_disk_bytes * 0.9)
+        entries = sorted(self._entries())
+        usage = sum(size for _, size, _, _ in entries)
+        for _, size, json_path, npy_path in entries:
+            if usage <= target:
+                break
+            for path in (json_path, npy_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            usage -= size
+        self._disk_usage = usage
+
+
+def _entry_bytes(entry):
+    text, images = entry
+    return len(text) + (images.nbytes if images is not None else 0)
+
+
+def _copy(entry):
+    text, images = entry
+    return text, images.detach().clone() if images is not None else None
+
+
+def response_cache_key(
+    prompt,
+    input_type,
+    model_version,
+    operation_mode,
+    Additional_Context,
+    images,
+    video,
+    audio,
+    max_images,
+    batch_count,
+    seed,
+    max_output_tokens,
+    temperature,
+    structured_output,
+    encoding=DEFAULT_ENCODING,
+    frame_selection=None,
+    video_clip=None,
+    segment_seconds=0.0,
+    audio_format=DEFAULT_AUDIO_FORMAT,
+    audio_chunk_seconds=0.0,
+    image_fit="pad",
+):
+    """Hash everything that determines the response of a non-chat request"""
+    # Only hash the media the request actually sends
+    media_settings = None
+    if operation_mode == "generate_images":
+        media = images
+        media_settings = image_fit
+    elif input_type == "image":
+        media = images
+    elif input_type == "video":
+        media = video
+        media_settings = (frame_selection, video_clip, segment_seconds)
+    elif input_type == "audio":
+        media = audio
+        media_settings = (audio_format, audio_chunk_seconds)
+    else:
+        media = None
+
+    return fingerprint(
+        model_version,
+        operation_mode,
+        input_type,
+        prompt,
+        Additional_Context or "",
+        media,
+        max_images,
+        batch_count,
+        seed,
+        max_output_tokens,
+        temperature,
+        structured_output,
+        encoding,
+        media_settings,
+    )
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache(config=None):
+    """Return the process-wide response cache, creating it on first use.
+
+    Sizes come from the RESPONSE_CACHE_DIR, RESPONSE_CACHE_MEMORY_MB and
+    RESPONSE_CACHE_DISK_MB config.json entries when present.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            config = config or {}
+            memory_mb = config.get("RESPONSE_CACHE_MEMORY_MB")
+            disk_mb = config.get("RESPONSE_CACHE_DISK_MB")
+            _default_cache = ResponseCache(
+                config.get("RESPONSE_CACHE_DIR") or DEFAULT_CACHE_DIR,
+                int(memory_mb * 1024 * 1024) if memory_mb is not None else DEFAULT_MEMORY_BYTES,
+                int(disk_mb * 1024 * 1024) if disk_mb is not None else DEFAULT_DISK_BYTES,
+            )
+        return _default_cache
@@ -0,0 +1,163 @@
+"""Retries with exponential backoff, jitter and server retry hints.
+
+Errors from both SDKs are classified by HTTP status: google.genai raises
+errors.APIError with an int ``code``, google.generativeai raises
+google.api_core exceptions whose ``code`` is the HTTP status as well.
+"""
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError)
+RETRYABLE_ERROR_NAMES = {
+    # httpx / requests transport failures, matched by name to avoid importing them
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "WriteTimeout",
+    "PoolTimeout",
+    "ChunkedEncodingError",
+}
+
+_RETRY_IN = re.compile(r"retry in ([0-9.]+)\s*s", re.IGNORECASE)
+_RETRY_DELAY = re.compile(r"retry_?delay\W+(?:seconds:\s*)?([0-9.]+)", re.IGNORECASE)
+
+
+class RetryPolicy(NamedTuple):
+    max_retries: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    deadline: float = 120.0
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+def error_status(error):
+    """HTTP status of an SDK error, or None"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    code = getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _find_retry_delay(details):
+    """Look for a google.rpc.RetryInfo retryDelay ("30s") in error details"""
+    if isinstance(details, dict):
+        delay = details.get("retryDelay") or details.get("retry_delay")
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+        values = details.values()
+    elif isinstance(details, (list, tuple)):
+        values = details
+    else:
+        return None
+    for value in values:
+        delay = _find_retry_delay(value)
+        if delay is not None:
+            return delay
+    return None
+
+
+def retry_hint(error):
+    """Seconds the server asked us to wait before retrying, or None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value is not None:
+            delay = _parse_retry_after(value)
+            if delay is not None:
+                return delay
+
+    delay = _find_retry_delay(getattr(error, "details", None))
+    if delay is not None:
+        return delay
+
+    match = _RETRY_IN.search(str(error)) or _RETRY_DELAY.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def backoff_delay(retry_number, policy, hint=None):
+    """Full-jitter exponential backoff, never shorter than the server hint"""
+    ceiling = min(policy.max_delay, policy.base_delay * (2 ** (retry_number - 1)))
+    delay = random.uniform(0, ceiling)
+    if hint is not None:
+        delay = max(delay, hint + random.uniform(0, policy.base_delay))
+    return delay
+
+
+class RetryState:
+    """Counts the retries made on behalf of one request"""
+
+    def __init__(self):
+        self.retries = 0
+        self.last_error = None
+
+    def describe(self):
+        if not self.retries:
+            return ""
+        return f" (after {self.retries} {'retry' if self.retries == 1 else 'retries'})"
+
+
+def call_with_retry(fn, policy=DEFAULT_POLICY, state=None, on_retry=None, sleep=time.sleep):
+    """Call fn(), retrying transient failures according to policy.
+
+    Gives up when the error is not retryable, max_retries is reached or the
+    next wait would exceed the policy deadline; the last error is re-raised.
+    """
+    state = state if state is not None else RetryState()
+    start = time.monotonic()
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            state.last_error = e
+            if not is_retryable(e) or state.retries >= policy.max_retries:
+                raise
+            delay = backoff_delay(state.retries + 1, policy, retry_hint(e))
+            if time.monotonic() - start + delay > policy.deadline:
+                raise
+            state.retries += 1
+            if on_retry is not None:
+                on_retry(state.retries, e, delay)
+            print(
+                f"Gemini request failed ({error_status(e) or type(e).__name__}), "
+                f"retry {state.retries}/{policy.max_retries} in {delay:.1f}s"
+            )
+            sleep(delay)
@@ -0,0 +1,266 @@
+"""Process-wide admission control for Gemini API requests.
+
+Every request from every node waits here for a slot before it is sent:
+
+* requests, input tokens and daily requests are metered per model with
+  token buckets (RPM_LIMIT, TPM_LIMIT and RPD_LIMIT in config.json, with
+  per-model overrides under MODEL_LIMITS),
+* the number of requests in flight per model adapts AIMD-style: it grows
+  by one per window of successful requests and is halved on a 429,
+* "interactive" requests are admitted ahead of waiting "bulk" ones.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from .retry import error_status
+
+PRIORITIES = ["interactive", "bulk"]
+
+DEFAULT_LIMITS = {"RPM_LIMIT": 10, "TPM_LIMIT": 4_000_000, "RPD_LIMIT": 1500}
+DEFAULT_MAX_IN_FLIGHT = 16
+INITIAL_IN_FLIGHT = 4
+# A success slower than this multiple of the running average counts as congestion
+LATENCY_SPIKE = 3.0
+LATENCY_DECREASE = 0.75
+LATENCY_SMOOTHING = 0.2
+
+# Rough Gemini token costs used before the real usage is known
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 258
+MEDIA_BYTES_PER_TOKEN = 1000
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second up to capacity"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken; oversized requests wait for a full bucket"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, amount):
+        # May go negative, which delays later requests until the debt is repaid
+        self.tokens -= amount
+
+    def give(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def estimate_tokens(contents):
+    """Rough input token count of request contents from either SDK"""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // CHARS_PER_TOKEN + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(item) for item in contents)
+    if isinstance(contents, dict):
+        if "parts" in contents:
+            return estimate_tokens(contents["parts"])
+        if "file_data" in contents:
+            # Referenced files are only sized for images; usage corrects the rest
+            mime_type = contents["file_data"].get("mime_type", "")
+            return IMAGE_TOKENS if mime_type.startswith("image/") else 0
+        return estimate_tokens(contents.get("text"))
+
+    parts = getattr(contents, "parts", None)
+    if parts:
+        return estimate_tokens(list(parts))
+    inline = getattr(contents, "inline_data", None)
+    data = getattr(inline, "data", None)
+    if data:
+        mime_type = getattr(inline, "mime_type", "") or ""
+        if mime_type.startswith("image/"):
+            return IMAGE_TOKENS
+        return len(data) // MEDIA_BYTES_PER_TOKEN + 1
+    text = getattr(contents, "text", None)
+    return estimate_tokens(text) if isinstance(text, str) and text else 0
+
+
+def response_prompt_tokens(response):
+    """Input tokens reported in a response's usage metadata, or None"""
+    usage = getattr(response, "usage_metadata", None)
+    count = getattr(usage, "prompt_token_count", None)
+    return count if isinstance(count, int) and count > 0 else None
+
+
+class Ticket:
+    """One admitted request"""
+
+    def __init__(self, model, tokens):
+        self.model = model
+        self.tokens = tokens
+        self.used_tokens = None
+        self.created = time.monotonic()
+        self.started = self.created
+
+    @property
+    def queued(self):
+        """Seconds spent waiting for admission"""
+        return self.started - self.created
+
+    def record_usage(self, response):
+        """Replace the token estimate with the usage the API reported"""
+        try:
+            self.used_tokens = response_prompt_tokens(response)
+        except Exception:
+            # Streamed responses that were not fully consumed have no usage yet
+            pass
+
+
+class _ModelState:
+    def __init__(self, limits, max_in_flight):
+        rpm = limits.get("RPM_LIMIT")
+        tpm = limits.get("TPM_LIMIT")
+        rpd = limits.get("RPD_LIMIT")
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.daily = TokenBucket(rpd / 1440.0, rpd) if rpd else None
+        self.max_in_flight = max_in_flight
+        self.limit = float(min(INITIAL_IN_FLIGHT, max_in_flight))
+        self.in_flight = 0
+        self.waiting = dict.fromkeys(PRIORITIES, 0)
+        self.latency = None
+
+    def buckets(self, tokens):
+        for bucket, amount in ((self.requests, 1), (self.daily, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                yield bucket, amount
+
+
+class RequestScheduler:
+    def __init__(self, default_limits=None, model_limits=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.default_limits = dict(DEFAULT_LIMITS if default_limits is None else default_limits)
+        self.model_limits = dict(model_limits or {})
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._cond = threading.Condition()
+        self._models = {}
+
+    def _state(self, model):
+        state = self._models.get(model)
+        if state is None:
+            limits = dict(self.default_limits)
+            limits.update(self.model_limits.get(model, {}))
+            state = _ModelState(limits, self.max_in_flight)
+            self._models[model] = state
+        return state
+
+    def _wait_time(self, state, tokens, priority, now):
+        """Seconds until the request may start, or None to wait for a release"""
+        if priority != PRIORITIES[0] and state.waiting[PRIORITIES[0]]:
+            return None
+        if state.in_flight >= int(state.limit):
+            return None
+        return max((bucket.wait_time(amount, now) for bucket, amount in state.buckets(tokens)), default=0.0)
+
+    def acquire(self, model, tokens=0, priority="interactive"):
+        """Block until model has capacity for a request of about tokens input tokens"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = Ticket(model, tokens)
+        with self._cond:
+            state = self._state(model)
+            state.waiting[priority] += 1
+            try:
+                while True:
+                    wait = self._wait_time(state, tokens, priority, time.monotonic())
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                state.waiting[priority] -= 1
+            for bucket, amount in state.buckets(tokens):
+                bucket.take(amount)
+            state.in_flight += 1
+            # Lower-priority waiters may be unblocked now
+            self._cond.notify_all()
+        ticket.started = time.monotonic()
+        return ticket
+
+    def release(self, ticket, error=None):
+        """Return a slot and adapt the model's concurrency to how the request went"""
+        latency = time.monotonic() - ticket.started
+        with self._cond:
+            state = self._state(ticket.model)
+            state.in_flight -= 1
+            if state.tokens is not None and ticket.used_tokens is not None:
+                state.tokens.give(ticket.tokens - ticket.used_tokens)
+
+            if error is not None:
+                if error_status(error) == 429:
+                    # Multiplicative decrease, and pause new requests until the
+                    # request bucket has refilled by one
+                    state.limit = max(1.0, state.limit / 2)
+                    if state.requests is not None:
+                        state.requests.tokens = min(state.requests.tokens, 0.0)
+            elif state.latency is not None and latency > LATENCY_SPIKE * state.latency:
+                state.limit = max(1.0, state.limit * LATENCY_DECREASE)
+            else:
+                # Additive increase: about +1 per limit successful requests
+                state.limit = min(state.max_in_flight, state.limit + 1.0 / state.limit)
+
+            if error is None:
+                if state.latency is None:
+                    state.latency = latency
+                else:
+                    state.latency += LATENCY_SMOOTHING * (latency - state.latency)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, model, tokens=0, priority="interactive"):
+        """Hold a request slot for the duration of the with block"""
+        ticket = self.acquire(model, tokens, priority)
+        try:
+            yield ticket
+        except BaseException as e:
+            self.release(ticket, e)
+            raise
+        self.release(ticket)
+
+    def stats(self):
+        with self._cond:
+            return {
+                model: {
+                    "limit": round(state.limit, 2),
+                    "in_flight": state.in_flight,
+                    "waiting": dict(state.waiting),
+                }
+                for model, state in self._models.items()
+            }
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler(config=None):
+    """Return the process-wide scheduler, creating it on first use.
+
+    Limits come from the RPM_LIMIT, TPM_LIMIT, RPD_LIMIT, MODEL_LIMITS and
+    MAX_IN_FLIGHT config.json entries when present; a limit of 0 disables it.
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            config = config or {}
+            limits = {key: config.get(key, value) for key, value in DEFAULT_LIMITS.items()}
+            _default_scheduler = RequestScheduler(
+                limits,
+                config.get("MODEL_LIMITS"),
+                config.get("MAX_IN_FLIGHT") or DEFAULT_MAX_IN_FLIGHT,
+            )
+        return _default_scheduler
@@ -0,0 +1,59 @@
+"""Streaming responses to the ComfyUI frontend.
+
+Partial text is pushed to the browser as "gemini.stream" events, which
+web/gemini_stream.js renders in a live preview widget on the node.
+"""
+import time
+
+STREAM_EVENT = "gemini.stream"
+UPDATE_INTERVAL = 0.1
+
+
+def send_stream_event(node_id, **data):
+    """Send a stream event for node_id to the frontend, if a server is running"""
+    if node_id is None:
+        return
+    try:
+        from server import PromptServer
+    except ImportError:
+        return
+    server = getattr(PromptServer, "instance", None)
+    if server is None:
+        return
+    server.send_sync(STREAM_EVENT, {"node": str(node_id), **data})
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # Chunks without text parts (e.g. finish or safety metadata) raise on .text
+        return ""
+
+
+def collect_stream(response, node_id=None, update_interval=UPDATE_INTERVAL):
+    """Consume a streamed response and return the full text.
+
+    New text is forwarded to the frontend as deltas, batched to at most one
+    event per update_interval seconds.
+    """
+    chunks = []
+    pending = []
+    # Start at zero so the first token reaches the UI without waiting
+    last_sent = 0.0
+    send_stream_event(node_id, event="start")
+    for chunk in response:
+        text = _chunk_text(chunk)
+        if not text:
+            continue
+        chunks.append(text)
+        pending.append(text)
+        now = time.monotonic()
+        if now - last_sent >= update_interval:
+            send_stream_event(node_id, event="delta", text="".join(pending))
+            pending = []
+            last_sent = now
+    if pending:
+        send_stream_event(node_id, event="delta", text="".join(pending))
+    send_stream_event(node_id, event="done")
+    return "".join(chunks)
@@ -0,0 +1,357 @@
+"""Frame selection and clip encoding for video inputs.
+
+"uniform" spreads frames evenly over the clip. "scene" compares downscaled
+frames to find scene changes and then adds the frames that differ most from
+those already chosen, skipping near-duplicates, so static shots cost one
+frame and fast cuts are not missed.
+
+In "clip" video mode the IMAGE batch is instead encoded with a local ffmpeg
+into a single H.264 MP4 or VP9 WebM, which is far smaller than separate
+frames and keeps the motion between them.
+
+Long videos can be split into time segments that are analyzed separately
+and then merged by one reduce request, so each part keeps its own frame
+budget instead of sharing one for the whole clip.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import NamedTuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from .batching import DEFAULT_MAX_CONCURRENCY, run_concurrently
+from .hashing import fingerprint
+from .media import fit_size, sample_frame_indices, tensor_batch_to_uint8
+from .media_cache import get_media_cache
+from .retry import RetryState
+from .scheduler import IMAGE_TOKENS
+
+FRAME_SELECTION_MODES = ["uniform", "scene"]
+VIDEO_MODES = ["frames", "clip"]
+CLIP_FORMATS = ["mp4", "webm"]
+
+# Side of the thumbnails frames are compared on
+THUMBNAIL_SIZE = 32
+# Frames are downscaled in chunks to bound the temporary memory
+THUMBNAIL_CHUNK = 64
+# Mean absolute difference (0-1) between consecutive thumbnails that counts as a cut
+SCENE_THRESHOLD = 0.12
+# Frames closer than this to an already selected frame are duplicates
+DUPLICATE_THRESHOLD = 0.03
+
+
+class FrameSelection(NamedTuple):
+    """How many video frames to send and how to pick them.
+
+    token_budget (0 = off) caps the frames at token_budget // IMAGE_TOKENS.
+    """
+
+    mode: str = "uniform"
+    max_frames: int = 6
+    token_budget: int = 0
+
+    @property
+    def frame_limit(self):
+        limit = max(1, int(self.max_frames))
+        if self.token_budget:
+            limit = min(limit, max(1, int(self.token_budget) // IMAGE_TOKENS))
+        return limit
+
+
+DEFAULT_FRAME_SELECTION = FrameSelection()
+
+
+def frame_thumbnails(video):
+    """[T, H, W, C] frames as flattened grayscale [T, S*S] thumbnails"""
+    thumbnails = []
+    for start in range(0, video.shape[0], THUMBNAIL_CHUNK):
+        chunk = video[start : start + THUMBNAIL_CHUNK].float()
+        gray = chunk.mean(dim=-1, keepdim=True).permute(0, 3, 1, 2)
+        small = F.adaptive_avg_pool2d(gray, THUMBNAIL_SIZE)
+        thumbnails.append(small.flatten(1).cpu())
+    return torch.cat(thumbnails)
+
+
+def select_keyframe_indices(
+    video,
+    max_frames,
+    scene_threshold=SCENE_THRESHOLD,
+    duplicate_threshold=DUPLICATE_THRESHOLD,
+):
+    """Indices of up to max_frames keyframes of a [T, H, W, C] video, in order"""
+    total = video.shape[0]
+    if total <= 1:
+        return np.arange(total)
+
+    thumbnails = frame_thumbnails(video)
+    changes = (thumbnails[1:] - thumbnails[:-1]).abs().mean(dim=1)
+
+    # Candidates: the first frame, then scene cuts from strongest to weakest
+    cuts = torch.nonzero(changes > scene_threshold).flatten()
+    cuts = cuts[torch.argsort(changes[cuts], descending=True)] + 1
+    candidates = [0] + cuts.tolist()
+
+    selected = []
+    # Distance of every frame to its nearest selected frame
+    nearest = torch.full((total,), float("inf"))
+
+    def add(index):
+        selected.append(index)
+        distance = (thumbnails - thumbnails[index]).abs().mean(dim=1)
+        torch.minimum(nearest, distance, out=nearest)
+
+    for index in candidates:
+        if len(selected) >= max_frames:
+            break
+        if nearest[index] > duplicate_threshold:
+            add(index)
+
+    # Fill the remaining budget with the frames least like anything selected
+    while len(selected) < max_frames:
+        index = int(torch.argmax(nearest))
+        if nearest[index] <= duplicate_threshold:
+            break
+        add(index)
+
+    return np.array(sorted(selected))
+
+
+def frame_indices(video, selection=DEFAULT_FRAME_SELECTION):
+    """Indices of the frames of a [T, H, W, C] video to send"""
+    selection = selection or DEFAULT_FRAME_SELECTION
+    if selection.mode == "scene":
+        return select_keyframe_indices(video, selection.frame_limit)
+    return sample_frame_indices(video.shape[0], selection.frame_limit)
+
+
+CLIP_CODECS = {
+    "mp4": (
+        "video/mp4",
+        ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-movflags", "+faststart"],
+    ),
+    "webm": (
+        "video/webm",
+        ["-c:v", "libvpx-vp9", "-b:v", "0", "-deadline", "realtime", "-cpu-used", "8", "-pix_fmt", "yuv420p"],
+    ),
+}
+# Frames are converted and piped to ffmpeg in chunks to bound memory
+CLIP_CHUNK = 32
+
+
+class VideoClip(NamedTuple):
+    """How a video input is sent.
+
+    In "clip" mode frames are taken at fps from a batch recorded at
+    source_fps, scaled so the longest side is at most max_size and encoded
+    with the given container's codec at quality crf.
+    """
+
+    mode: str = "frames"
+    container: str = "mp4"
+    fps: float = 4.0
+    source_fps: float = 24.0
+    max_size: int = 512
+    crf: int = 30
+
+    @property
+    def mime_type(self):
+        return CLIP_CODECS[self.container][0]
+
+
+DEFAULT_VIDEO_CLIP = VideoClip()
+
+
+def find_ffmpeg():
+    """Path of an ffmpeg executable: FFMPEG_PATH, PATH, then imageio-ffmpeg's bundled one"""
+    path = os.environ.get("FFMPEG_PATH") or shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        raise RuntimeError(
+            "ffmpeg not found; install it or imageio-ffmpeg to send video as a clip"
+        )
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def clip_frame_indices(total_frames, source_fps, fps):
+    """Indices of the frames kept when resampling source_fps footage to fps"""
+    step = max(1.0, float(source_fps) / float(fps))
+    return np.unique(np.arange(0, total_frames, step).astype(int))
+
+
+def encode_video_clip(video, clip=DEFAULT_VIDEO_CLIP):
+    """Encode a [T, H, W, C] video tensor as one clip; results are cached by content"""
+    cache = get_media_cache()
+    key = (fingerprint(video), clip)
+    data = cache.get(key)
+    if data is None:
+        data = _encode_clip(video, clip)
+        cache.put(key, data)
+    return data
+
+
+def _encode_clip(video, clip):
+    indices = clip_frame_indices(video.shape[0], clip.source_fps, clip.fps)
+    width, height = fit_size(video.shape[2], video.shape[1], clip.max_size)
+    # 4:2:0 chroma subsampling needs even dimensions
+    width, height = max(2, width - width % 2), max(2, height - height % 2)
+    codec_args = CLIP_CODECS[clip.container][1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, f"clip.{clip.container}")
+        command = [
+            find_ffmpeg(), "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            "-framerate", f"{clip.fps:g}", "-i", "pipe:0",
+            *codec_args, "-crf", str(clip.crf), "-an", output,
+        ]
+        # Error output goes to a file: a pipe nobody reads while the frames
+        # are written would block ffmpeg once it fills up
+        with open(os.path.join(tmp, "ffmpeg.log"), "w+b") as log:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=log)
+            try:
+                for start in range(0, len(indices), CLIP_CHUNK):
+                    chunk = video[torch.from_numpy(indices[start : start + CLIP_CHUNK])]
+                    process.stdin.write(tensor_batch_to_uint8(chunk, (width, height)).tobytes())
+                process.stdin.close()
+            except BrokenPipeError:
+                # ffmpeg exited early; its error output is reported below
+                pass
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+            if process.wait() != 0:
+                log.seek(0)
+                errors = log.read().decode("utf-8", "replace")
+                raise RuntimeError(f"ffmpeg failed to encode the clip: {errors.strip()}")
+        with open(output, "rb") as f:
+            return f.read()
+
+
+def segment_bounds(total_frames, segment_frames):
+    """(start, end) frame ranges splitting a video into segments of segment_frames.
+
+    A short remainder is merged into the last segment rather than analyzed
+    on its own.
+    """
+    segment_frames = max(1, int(segment_frames))
+    starts = list(range(0, total_frames, segment_frames))
+    if len(starts) > 1 and total_frames - starts[-1] < segment_frames // 4:
+        starts.pop()
+    ends = starts[1:] + [total_frames]
+    return list(zip(starts, ends))
+
+
+def segment_label(start, end, fps):
+    """Time range of frames [start, end) as text, e.g. 0:30-1:00"""
+
+    def timestamp(frame):
+        seconds = int(round(frame / fps))
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    return f"{timestamp(start)}-{timestamp(end)}"
+
+
+def segment_request(prompt, index, count, label):
+    """Prompt for one segment of a video analyzed in parts"""
+    return (
+        f"This is part {index + 1} of {count} of a longer video, covering {label}. "
+        f"Answer for this part only; the parts are merged afterwards.\n\n{prompt}"
+    )
+
+
+def merge_request(prompt, segments):
+    """Prompt asking the model to merge per-segment answers into one.
+
+    segments is a list of (label, answer) pairs in time order.
+    """
+    lines = [
+        "A video was analyzed in consecutive parts. Merge the answers for the parts "
+        "into one answer for the whole video, in time order. Combine repeated "
+        "observations, keep timestamps where they matter and do not mention the parts.",
+        "",
+        f"Task: {prompt}",
+        "",
+    ]
+    for label, answer in segments:
+        lines += [f"[{label}]", answer.strip(), ""]
+    return "\n".join(lines)
+
+
+def analyze_video_segments(
+    prompt,
+    video,
+    segment_seconds,
+    source_fps,
+    prepare,
+    send,
+    max_workers=DEFAULT_MAX_CONCURRENCY,
+    stream=False,
+):
+    """Analyze a long video in time segments concurrently, then merge the answers.
+
+    prepare(prompt, frames) builds the request for one segment and
+    send(parts, retry_state, stream) returns the model's text. Returns the
+    merged answer, a report of every segment's timing and answer, and
+    whether every segment succeeded. A merge of only some segments is
+    still returned, but must not be cached as the answer for the video.
+    """
+    bounds = segment_bounds(video.shape[0], round(segment_seconds * source_fps))
+    labels = [segment_label(start, end, source_fps) for start, end in bounds]
+    retry_states = [RetryState() for _ in bounds]
+
+    def run_segment(i):
+        start, end = bounds[i]
+        started = time.perf_counter()
+        request = segment_request(prompt, i, len(bounds), labels[i])
+        text = send(prepare(request, video[start:end]), retry_states[i])
+        return text, time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = run_concurrently(run_segment, range(len(bounds)), max_workers=max_workers)
+
+    report = [
+        f"Long video: {len(bounds)} segments of {segment_seconds:g}s, "
+        f"up to {min(max_workers, len(bounds))} at a time"
+    ]
+    answers = []
+    failed = []
+    for i, (result, error) in enumerate(results):
+        retries = retry_states[i].describe()
+        if error is not None:
+            failed.append(f"{i+1} ({labels[i]})")
+            report.append(f"Segment {i+1} ({labels[i]}) failed{retries}: {error}")
+            continue
+        text, elapsed = result
+        answers.append((labels[i], text))
+        report.append(f"Segment {i+1} ({labels[i]}): {elapsed:.2f}s{retries}")
+    if not answers:
+        raise results[0][1]
+    if failed:
+        report.insert(
+            1,
+            f"Failed segments: {', '.join(failed)}; "
+            f"the answer covers {len(answers)} of {len(bounds)} segments",
+        )
+
+    merge_state = RetryState()
+    merge_started = time.perf_counter()
+    merged = send(
+        [{"parts": [{"text": merge_request(prompt, answers)}]}], merge_state, stream
+    )
+    report.append(
+        f"Merge: {time.perf_counter() - merge_started:.2f}s{merge_state.describe()}"
+    )
+    report.append(f"Total: {time.perf_counter() - started:.2f}s")
+
+    for label, text in answers:
+        report += ["", f"--- {label} ---", text.strip()]
+    return merged, "\n".join(report), not failed
@@ -1,16 +1,23 @@
 import torch
-import torchaudio
-import sounddevice as sd
-import numpy as np
 import os
+import sys
+import threading
 import time
-import folder_paths
+
+p = os.path.dirname(os.path.realpath(__file__))
+if p not in sys.path:
+    sys.path.append(p)
+
+from gemini_common.live import MicrophoneChunks
+from gemini_common.recording import (DEFAULT_MAX_DURATION, DEFAULT_POST_ROLL, DEFAULT_PRE_ROLL, RecordingStore,
+                                     RingBuffer, SilenceDetector, find_input_device, input_device_names,
+                                     trim_silence)
 
 class AudioRecorder:
     @classmethod
     def INPUT_TYPES(cls):
-        devices = sd.query_devices()
-        input_devices = [d['name'] for d in devices if d['max_input_channels'] > 0]
+        # Cached; run the node once with refresh_devices to pick up new devices
+        input_devices = input_device_names()
         return {
             "required": {
                 "device": (input_devices, {"default": input_devices[0] if input_devices else "Default"}),
@@ -34,6 +41,29 @@ class AudioRecorder:
                     "step": 0.1
                 }),
                 "trigger": ("INT", {"default": 0})
+            },
+            "optional": {
+                "pre_roll": ("FLOAT", {
+                    "default": DEFAULT_PRE_ROLL,
+                    "min": 0.0,
+                    "max": 2.0,
+                    "step": 0.05
+                }),
+                "post_roll": ("FLOAT", {
+                    "default": DEFAULT_POST_ROLL,
+                    "min": 0.0,
+                    "max": 2.0,
+                    "step": 0.05
+                }),
+                "max_duration": ("FLOAT", {
+                    "default": DEFAULT_MAX_DURATION,
+                    "min": 5.0,
+                    "max": 3600.0,
+                    "step": 5.0
+                }),
+                "save_recording": ("BOOLEAN", {"default": False}),
+                "live_mode": ("BOOLEAN", {"default": False}),
+                "refresh_devices": ("BOOLEAN", {"default": False})
             }
         }
 
@@ -41,78 +71,136 @@ class AudioRecorder:
         self.reset_state()
 
     def reset_state(self):
-        """Clean up all old recordings"""
-        if hasattr(self, 'temp_dir'):
-            for filename in os.listdir(self.temp_dir):
-                if filename.startswith("recorded_audio_") and filename.endswith(".wav"):
-                    try:
-                        os.remove(os.path.join(self.temp_dir, filename))
-                        print(f"Cleaned up old recording: {filename}")
-                    except Exception as e:
-                        print(f"Error removing file {filename}: {e}")
-
-        self.audio_data = []
+        """Forget recent recordings and delete any saved copies"""
+        import folder_paths
+
+        if hasattr(self, 'recordings'):
+            self.recordings.clear()
+
+        self.recordings = RecordingStore()
         self.temp_dir = folder_paths.get_temp_directory()
-        self.recorded_file = None
         self.last_trigger = -1
 
     RETURN_TYPES = ("AUDIO",)
     FUNCTION = "record"
     CATEGORY = "audio"
 
-    def record(self, device, sample_rate, silence_threshold, silence_duration, trigger):
+    def capture(self, device_index, sample_rate, silence_threshold, silence_duration, max_duration):
+        """Record until silence_duration seconds of silence; returns [frames, 1] float32 audio.
+
+        The stream callback fills a buffer of max_duration seconds and stops
+        the stream once the silence detector fires or the buffer is full.
+        """
+        import sounddevice as sd
+
+        limit = int(max_duration * sample_rate)
+        buffer = RingBuffer(limit)
+        detector = SilenceDetector(silence_threshold, silence_duration, sample_rate)
+        done = threading.Event()
+        errors = []
+        captured = 0
+
+        def callback(indata, frames, time_info, status):
+            nonlocal captured
+            if status:
+                print(f"Audio input status: {status}")
+            try:
+                buffer.write(indata[: limit - captured])
+                captured = min(limit, captured + frames)
+                stop = detector.update(indata) or captured >= limit
+            except Exception as e:
+                errors.append(e)
+                stop = True
+            if stop:
+                done.set()
+                raise sd.CallbackStop
+
+        with sd.InputStream(
+            device=device_index,
+            channels=1,
+            dtype="float32",
+            samplerate=sample_rate,
+            blocksize=int(sample_rate * 0.1),  # 100ms blocks
+            callback=callback,
+            finished_callback=done.set
+        ):
+            print("Recording in progress...")
+            done.wait()
+
+        if errors:
+            raise errors[0]
+        if captured >= limit:
+            print(f"Reached the maximum duration of {max_duration}s, stopping...")
+        else:
+            print(f"Detected {silence_duration} seconds of silence, stopping...")
+        return buffer.read()
+
+    def record(self, device, sample_rate, silence_threshold, silence_duration, trigger,
+               pre_roll=DEFAULT_PRE_ROLL, post_roll=DEFAULT_POST_ROLL, max_duration=DEFAULT_MAX_DURATION,
+               save_recording=False, live_mode=False, refresh_devices=False):
         try:
+            import sounddevice as sd
+
+            if refresh_devices:
+                # Takes effect in the device list after the next refresh of the UI
+                print(f"Input devices: {', '.join(input_device_names(refresh=True)) or 'none'}")
+
+            if live_mode:
+                # Nothing is recorded here: the Gemini node opens the
+                # microphone itself and streams it while the user speaks
+                device_index = find_input_device(device, sd.query_devices())
+                source = MicrophoneChunks(device_index, sample_rate, silence_threshold, silence_duration, max_duration)
+                return ({
+                    "waveform": torch.zeros(1, 1, 1),
+                    "sample_rate": sample_rate,
+                    "recording_complete": False,
+                    "status": "live",
+                    "live_source": source
+                },)
+
+            # A trigger value recorded before replays its take, so switching
+            # back to an earlier value does not record again
+            if (cached := self.recordings.get(trigger)) is not None:
+                self.last_trigger = trigger
+                waveform, sr = cached
+                # A copy, so a node editing its input cannot change the stored take
+                return ({
+                    "waveform": waveform.unsqueeze(0).clone(), 
+                    "sample_rate": sr,
+                    "recording_complete": False,
+                    "status": "cached"
+                },)
+
             if trigger != self.last_trigger:
                 self.last_trigger = trigger
                 print(f"\nStarting new recording...")
                 print(f"Settings: silence_threshold={silence_threshold}, silence_duration={silence_duration}s, rate={sample_rate}")
                 
-                audio_chunks = []
-                silence_start = None
-                
                 try:
+                    device_index = find_input_device(device, sd.query_devices())
+                    if device_index is None:
+                        print(f"Input device '{device}' not found, using the default input")
                     print("Opening audio stream...")
-                    with sd.InputStream(
-                        device=None,
-                        channels=1,
-                        samplerate=sample_rate,
-                        blocksize=int(sample_rate * 0.1)  # 100ms chunks
-                    ) as stream:
-                        print("Recording in progress...")
-                        while True:
-                            audio_chunk = stream.read(int(sample_rate * 0.1))[0]
-                            audio_chunks.append(audio_chunk)
-                            
-                            # Check for silence
-                            if np.max(np.abs(audio_chunk)) < silence_threshold:
-                                if silence_start is None:
-                                    silence_start = time.time()
-                                elif time.time() - silence_start >= silence_duration:
-                                    print(f"Detected {silence_duration} seconds of silence, stopping...")
-                                    break
-                            else:
-                                silence_start = None
+                    audio_data = self.capture(device_index, sample_rate, silence_threshold, silence_duration, max_duration)
                     
                     print("Processing recording...")
-                    audio_data = np.concatenate(audio_chunks, axis=0)
+                    audio_data = trim_silence(audio_data, silence_threshold, sample_rate, pre_roll, post_roll)
                     
-                    # Trim trailing silence
-                    for i in range(len(audio_data) - 1, -1, -1):
-                        if abs(audio_data[i]) > silence_threshold:
-                            audio_data = audio_data[:i + int(sample_rate * 0.2)]  # Keep 0.2s after last sound
-                            break
-                    
-                    audio_tensor = torch.from_numpy(audio_data).float().t()
-                    temp_file = os.path.join(self.temp_dir, f"recorded_audio_{int(time.time())}.wav")
-                    torchaudio.save(temp_file, audio_tensor, sample_rate)
-                    self.recorded_file = temp_file
-                    print(f"Recording saved to: {temp_file}")
+                    # [frames, 1] -> [channels, frames], owned by the node
+                    waveform = torch.from_numpy(audio_data.T.copy())
+                    saved_file = None
+                    if save_recording:
+                        import torchaudio
+
+                        saved_file = os.path.join(self.temp_dir, f"recorded_audio_{int(time.time())}.wav")
+                        torchaudio.save(saved_file, waveform, sample_rate)
+                        print(f"Recording saved to: {saved_file}")
+                    self.recordings.put(trigger, waveform, sample_rate, saved_file)
                     print("Sending completed recording signal...")
                     
-                    waveform, sr = torchaudio.load(self.recorded_file)
                     return ({
-                        "waveform": waveform.unsqueeze(0), 
-                        "sample_rate": sr,
+                        "waveform": waveform.unsqueeze(0).clone(), 
+                        "sample_rate": sample_rate,
                         "recording_complete": True,
                         "status": "complete"
                     },)
@@ -122,15 +210,6 @@ class AudioRecorder:
                     import traceback
                     traceback.print_exc()
             
-            elif self.recorded_file and os.path.exists(self.recorded_file):
-                waveform, sr = torchaudio.load(self.recorded_file)
-                return ({
-                    "waveform": waveform.unsqueeze(0), 
-                    "sample_rate": sr,
-                    "recording_complete": False,
-                    "status": "cached"
-                },)
-            
         except Exception as e:
             print(f"Error in record method: {e}")
             import traceback
@@ -0,0 +1,131 @@
+"""Local stand-in for the Gemini Batch API, shared by the tests and benchmarks.
+
+An HTTP server speaking the REST subset the batch nodes use: resumable File
+API uploads, batchGenerateContent, job status, results download and cancel.
+Jobs stay pending and then run for job_seconds before they succeed. The
+results file lists the answers in shuffled order, and every fail_every-th
+request gets an error line instead of an answer.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from gemini_common.batch_jobs import SUCCEEDED
+
+
+class StandIn:
+    """In-memory state of the stand-in service"""
+
+    def __init__(self, job_seconds, fail_every):
+        self.job_seconds = job_seconds
+        self.fail_every = fail_every
+        self.files = {}
+        self.jobs = {}
+        self.uploads = 0
+        self.status_calls = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def state(self, job):
+        if job["cancelled"]:
+            return "CANCELLED"
+        elapsed = time.monotonic() - job["created"]
+        if elapsed < self.job_seconds * 0.2:
+            return "PENDING"
+        return "RUNNING" if elapsed < self.job_seconds else SUCCEEDED
+
+    def results(self, job_name, source):
+        """Results JSONL for a job, in shuffled order"""
+        lines = []
+        for index, line in enumerate(self.files[source].decode("utf-8").splitlines()):
+            record = json.loads(line)
+            if self.fail_every and (index + 1) % self.fail_every == 0:
+                lines.append({"key": record["key"], "error": {"code": 400, "message": "stand-in failure"}})
+                continue
+            parts = record["request"]["contents"][0]["parts"]
+            prompt = parts[-1]["text"]
+            image = "with image" if len(parts) > 1 else "text only"
+            text = f"Answer to {prompt!r} ({image})"
+            response = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+            lines.append({"key": record["key"], "response": response})
+        random.Random(job_name).shuffle(lines)
+        return ("\n".join(json.dumps(line) for line in lines) + "\n").encode("utf-8")
+
+
+def handler_for(service):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, payload=None, status=200, headers=None, body=None):
+            body = body if body is not None else json.dumps(payload or {}).encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            data = self._body()
+            if not self.headers.get("x-goog-api-key"):
+                return self._reply({"error": {"message": "API key missing"}}, 401)
+            if url.path == "/upload/v1beta/files":
+                upload_id = parse_qs(url.query).get("upload_id")
+                if upload_id is None:
+                    host = self.headers["Host"]
+                    upload_url = f"http://{host}/upload/v1beta/files?upload_id={next(service.ids)}"
+                    return self._reply(headers={"X-Goog-Upload-URL": upload_url})
+                name = f"files/input-{upload_id[0]}"
+                with service.lock:
+                    service.files[name] = data
+                    service.uploads += 1
+                return self._reply({"file": {"name": name, "sizeBytes": str(len(data))}})
+            if url.path.endswith(":batchGenerateContent"):
+                source = json.loads(data)["batch"]["input_config"]["file_name"]
+                if source not in service.files:
+                    return self._reply({"error": {"message": f"{source} not found"}}, 404)
+                name = f"batches/job-{next(service.ids)}"
+                with service.lock:
+                    service.jobs[name] = {"source": source, "created": time.monotonic(), "cancelled": False}
+                return self._reply({"name": name, "metadata": {"state": "BATCH_STATE_PENDING"}})
+            if url.path.endswith(":cancel"):
+                name = url.path[len("/v1beta/") : -len(":cancel")]
+                with service.lock:
+                    service.jobs[name]["cancelled"] = True
+                return self._reply({})
+            self._reply({"error": {"message": "not found"}}, 404)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith("/v1beta/batches/"):
+                name = url.path[len("/v1beta/") :]
+                job = service.jobs.get(name)
+                if job is None:
+                    return self._reply({"error": {"message": f"{name} not found"}}, 404)
+                with service.lock:
+                    service.status_calls += 1
+                state = service.state(job)
+                reply = {"name": name, "metadata": {"state": f"BATCH_STATE_{state}"}, "done": state == SUCCEEDED}
+                if state == SUCCEEDED:
+                    results = f"files/results-{name.split('-')[-1]}"
+                    if results not in service.files:
+                        service.files[results] = service.results(name, job["source"])
+                    reply["response"] = {"responsesFile": results}
+                return self._reply(reply)
+            if url.path.startswith("/download/v1beta/") and url.path.endswith(":download"):
+                name = url.path[len("/download/v1beta/") : -len(":download")]
+                if name not in service.files:
+                    return self._reply({"error": {"message": f"{name} not found"}}, 404)
+                return self._reply(body=service.files[name])
+            self._reply({"error": {"message": "not found"}}, 404)
+
+    return Handler
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The node modules import gemini_common as a top-level package from nodes/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes"))
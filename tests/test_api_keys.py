@@ -0,0 +1,33 @@
+import pytest
+
+from gemini_common.api_keys import CONFIG_KEY, clean_api_key, remember_api_key, stored_api_key
+
+
+@pytest.mark.parametrize("value", ["", "   ", "\n", "your_api_key", " <API_KEY> ", None])
+def test_blank_and_placeholder_keys_are_ignored(value):
+    assert clean_api_key(value) is None
+
+
+def test_typed_key_is_saved_without_whitespace():
+    saved = []
+    config = {}
+
+    assert remember_api_key("  AIza-key\n", config, saved.append) == "AIza-key"
+    assert saved == [{CONFIG_KEY: "AIza-key"}]
+
+    # Unchanged keys are not written again, unusable ones never
+    assert remember_api_key("AIza-key", config, saved.append) == "AIza-key"
+    assert remember_api_key("token_here", config, saved.append) is None
+    assert len(saved) == 1
+
+
+def test_stored_key_order(monkeypatch):
+    monkeypatch.setenv(CONFIG_KEY, "token_here")
+    assert stored_api_key({CONFIG_KEY: "from-config"}, "from-node") == "from-node"
+    assert stored_api_key({CONFIG_KEY: "from-config"}) == "from-config"
+
+    monkeypatch.setenv(CONFIG_KEY, "from-env")
+    assert stored_api_key({CONFIG_KEY: "from-config"}, "from-node") == "from-env"
+
+    monkeypatch.delenv(CONFIG_KEY)
+    assert stored_api_key({CONFIG_KEY: " "}) is None
@@ -0,0 +1,151 @@
+import sys
+import threading
+import types
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from batch_stand_in import StandIn, handler_for
+from gemini_common.batch_jobs import (
+    SUCCEEDED,
+    BatchRunner,
+    JobManifest,
+    RestBackend,
+    build_request,
+    is_interrupt,
+)
+
+MODEL = "gemini-2.5-flash"
+
+
+@pytest.fixture
+def service():
+    service = StandIn(job_seconds=0.5, fail_every=3)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_for(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield service
+    server.shutdown()
+    server.server_close()
+
+
+def make_runner(service, directory, sleep=None):
+    backend = RestBackend(service.url, "test-key")
+    if sleep is None:
+        return BatchRunner(backend, JobManifest(directory))
+    return BatchRunner(backend, JobManifest(directory), sleep=sleep)
+
+
+def make_requests(count=7):
+    prompts = [f"Caption item {i}" for i in range(count)]
+    requests = [
+        build_request(prompt, b"jpeg bytes" if i % 2 else None, "image/jpeg", "Answer briefly.", {"temperature": 0.4})
+        for i, prompt in enumerate(prompts)
+    ]
+    return prompts, requests
+
+
+def test_submit_wait_and_results_in_request_order(service, tmp_path):
+    prompts, requests = make_requests()
+    runner = make_runner(service, tmp_path)
+
+    record = runner.submit(MODEL, requests, "test")
+    assert record["job_name"].startswith("batches/")
+    assert record["state"] == "PENDING"
+    assert record["model"] == f"models/{MODEL}"
+    assert len(record["request_keys"]) == len(requests)
+
+    states = []
+    record = runner.wait(record, poll_interval=1.0, timeout=30, on_state=lambda r: states.append(r["state"]))
+    assert record["state"] == SUCCEEDED
+    assert states[-1] == SUCCEEDED
+
+    results = runner.results(record)
+    assert len(results) == len(prompts)
+    for i, (prompt, result) in enumerate(zip(prompts, results)):
+        if (i + 1) % 3 == 0:
+            assert "stand-in failure" in result.error
+            continue
+        assert result.error is None
+        image = "with image" if i % 2 else "text only"
+        assert result.text == f"Answer to {prompt!r} ({image})"
+
+
+def test_refresh_reports_state_without_waiting(service, tmp_path):
+    _, requests = make_requests()
+    runner = make_runner(service, tmp_path)
+    record = runner.submit(MODEL, requests, "test")
+
+    record = runner.refresh(record)
+
+    assert record["state"] in ("PENDING", "RUNNING")
+    assert service.status_calls == 1
+    assert runner.manifest.find(record["job_name"])["state"] == record["state"]
+
+
+def test_cancel_and_resubmit(service, tmp_path):
+    _, requests = make_requests()
+    runner = make_runner(service, tmp_path)
+    record = runner.submit(MODEL, requests, "test")
+
+    record = runner.cancel(record)
+    assert record["state"] == "CANCELLED"
+
+    # A cancelled job is not resumed but submitted again
+    again = runner.submit(MODEL, requests, "test")
+    assert again["job_name"] != record["job_name"]
+    assert service.uploads == 2
+
+
+def test_manifest_resumes_job_after_restart(service, tmp_path):
+    _, requests = make_requests()
+    record = make_runner(service, tmp_path).submit(MODEL, requests, "test")
+    record = make_runner(service, tmp_path).wait(record, poll_interval=1.0, timeout=30)
+    results = make_runner(service, tmp_path).results(record)
+
+    # A fresh runner and manifest, as after a ComfyUI restart
+    runner = make_runner(service, tmp_path)
+    resumed = runner.submit(MODEL, requests, "test")
+
+    assert resumed["job_name"] == record["job_name"]
+    assert resumed["state"] == SUCCEEDED
+    assert service.uploads == 1
+    assert runner.results(resumed) == results
+    assert runner.manifest.find(record["job_name"]) is not None
+
+
+def test_wait_stops_when_prompt_is_interrupted(service, tmp_path, monkeypatch):
+    class InterruptProcessingException(Exception):
+        pass
+
+    interrupted = threading.Event()
+
+    def throw_exception_if_processing_interrupted():
+        if interrupted.is_set():
+            raise InterruptProcessingException()
+
+    comfy = types.ModuleType("comfy")
+    model_management = types.ModuleType("comfy.model_management")
+    model_management.InterruptProcessingException = InterruptProcessingException
+    model_management.throw_exception_if_processing_interrupted = throw_exception_if_processing_interrupted
+    comfy.model_management = model_management
+    monkeypatch.setitem(sys.modules, "comfy", comfy)
+    monkeypatch.setitem(sys.modules, "comfy.model_management", model_management)
+
+    sleeps = []
+
+    def sleep(seconds):
+        # The user cancels the prompt during the first pause between polls
+        sleeps.append(seconds)
+        interrupted.set()
+
+    _, requests = make_requests()
+    runner = make_runner(service, tmp_path, sleep=sleep)
+    record = runner.submit(MODEL, requests, "test")
+
+    with pytest.raises(InterruptProcessingException) as error:
+        runner.wait(record, poll_interval=30.0, timeout=3600)
+
+    assert is_interrupt(error.value)
+    assert sleeps == [1.0]
+    assert service.status_calls == 1
@@ -0,0 +1,21 @@
+import numpy as np
+
+from gemini_common.hashing import fingerprint
+
+
+def test_empty_arrays_hash_by_dtype_and_shape():
+    empty = fingerprint(np.zeros((0, 3), np.float32))
+
+    assert empty == fingerprint(np.zeros((0, 3), np.float32))
+    assert empty != fingerprint(np.zeros((3, 0), np.float32))
+    assert empty != fingerprint(np.zeros((0, 3), np.int16))
+    assert empty != fingerprint(None)
+
+
+def test_arrays_hash_by_content():
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    assert fingerprint(array) == fingerprint(array.copy())
+    assert fingerprint(array) == fingerprint(np.asfortranarray(array))
+    assert fingerprint(array) != fingerprint(array + 1)
+    assert fingerprint(np.array(1.0)) != fingerprint(np.array(2.0))
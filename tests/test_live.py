@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import json
+import threading
+
+import numpy as np
+import pytest
+
+websockets_server = pytest.importorskip("websockets.asyncio.server")
+
+from gemini_common.live import (
+    StreamResampler,
+    WaveformChunks,
+    live_config,
+    run_live_turn,
+    stream_turn,
+    torch_stream_resampler,
+    websocket_connector,
+)
+
+
+class LiveStandIn:
+    """Local websocket server speaking the Live API's JSON protocol.
+
+    mode is "reply" (answer in two text parts after the audio stream ends),
+    "reject" (answer the setup with an error) or "silent" (never answer).
+    """
+
+    def __init__(self, mode="reply"):
+        self.mode = mode
+        self.setup = None
+        self.audio = b""
+        self.stream_ended = False
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.stop = None
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self._serve(),), daemon=True)
+
+    async def _handle(self, websocket):
+        self.setup = json.loads(await websocket.recv())["setup"]
+        if self.mode == "reject":
+            await websocket.send(json.dumps({"error": {"message": "model not found"}}))
+            return
+        await websocket.send(json.dumps({"setupComplete": {}}))
+        async for raw in websocket:
+            message = json.loads(raw)["realtimeInput"]
+            if "audio" in message:
+                self.audio += base64.b64decode(message["audio"]["data"])
+            if message.get("audioStreamEnd"):
+                self.stream_ended = True
+                break
+        if self.mode == "silent":
+            await websocket.wait_closed()
+            return
+        for text in ["Hello", " there"]:
+            await websocket.send(json.dumps({"serverContent": {"modelTurn": {"parts": [{"text": text}]}}}))
+        await websocket.send(json.dumps({"serverContent": {"turnComplete": True}}))
+        await websocket.wait_closed()
+
+    async def _serve(self):
+        self.stop = asyncio.Event()
+        async with websockets_server.serve(self._handle, "127.0.0.1", 0) as server:
+            self.url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            self.ready.set()
+            await self.stop.wait()
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.stop.set)
+        self.thread.join(5)
+        self.loop.close()
+
+
+def speech(seconds=0.35):
+    return WaveformChunks(0.1 * np.sin(np.linspace(0, 440 * seconds, int(16000 * seconds))))
+
+
+def connector(server, instruction="Answer briefly"):
+    return websocket_connector(server.url, "gemini-live-2.5-flash", live_config("text", instruction))
+
+
+def test_text_reply_and_turn_complete():
+    pieces = []
+    with LiveStandIn() as server:
+        result = asyncio.run(stream_turn(connector(server), speech(), on_text=pieces.append))
+
+    assert server.setup["model"] == "models/gemini-live-2.5-flash"
+    assert server.setup["generationConfig"] == {"responseModalities": ["TEXT"]}
+    assert server.setup["systemInstruction"] == {"parts": [{"text": "Answer briefly"}]}
+    assert server.stream_ended
+    assert len(server.audio) == int(16000 * 0.35) * 2
+    assert pieces == ["Hello", " there"]
+    assert result.text == "Hello there"
+    assert result.chunks_sent == 4
+    assert result.latency is not None
+    assert result.turn_seconds >= 0
+
+
+def test_failed_setup():
+    with LiveStandIn("reject") as server:
+        with pytest.raises(RuntimeError, match="setup failed"):
+            asyncio.run(stream_turn(connector(server), speech()))
+
+
+def test_response_timeout():
+    with LiveStandIn("silent") as server:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(stream_turn(connector(server), speech(), response_timeout=0.2))
+        assert server.stream_ended
+
+
+def test_run_live_turn_inside_running_loop():
+    # ComfyUI calls nodes while its own event loop is running in the thread
+    async def node():
+        return run_live_turn(connector(server), speech())
+
+    with LiveStandIn() as server:
+        result = asyncio.run(node())
+
+    assert result.text == "Hello there"
+
+
+def smoothing_resample(orig_freq, new_freq):
+    """One-pass lowpass and linear interpolation, zero-padded like torchaudio.
+
+    Each output sample reaches at most 2 input samples to either side.
+    """
+
+    def resample(samples):
+        count = -(-len(samples) * new_freq // orig_freq)
+        positions = np.arange(count) * orig_freq / new_freq
+        smoothed = np.convolve(np.append(samples, 0.0), [0.25, 0.5, 0.25], mode="same")
+        return np.interp(positions, np.arange(len(smoothed)), smoothed).astype(np.float32)
+
+    return resample
+
+
+def tone(rate, seconds=1.0, frequency=440.0):
+    return (0.5 * np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate)).astype(np.float32)
+
+
+def resample_blocks(resampler, samples, block_size):
+    out = [resampler(samples[i:i + block_size]) for i in range(0, len(samples), block_size)]
+    return np.concatenate(out + [resampler.flush()])
+
+
+def test_block_resampling_matches_one_pass():
+    samples = tone(44100)
+    one_pass = smoothing_resample(44100, 16000)(samples)
+    resampler = StreamResampler(smoothing_resample(44100, 16000), 44100, 16000, context=2)
+
+    # 100 ms blocks, and ragged ones that split resampling periods
+    for block_size in (4410, 1000):
+        blocked = resample_blocks(resampler, samples, block_size)
+        assert blocked.shape == one_pass.shape
+        np.testing.assert_allclose(blocked, one_pass, atol=1e-6)
+
+
+def test_torchaudio_block_resampling_matches_one_pass():
+    pytest.importorskip("torchaudio")
+    import torch
+
+    from gemini_common.audio import get_resampler
+
+    samples = tone(48000)
+    with torch.no_grad():
+        one_pass = get_resampler(48000, 16000)(torch.from_numpy(samples)[None])[0].numpy()
+
+    blocked = resample_blocks(torch_stream_resampler(48000), samples, 4800)
+
+    assert blocked.shape == one_pass.shape
+    np.testing.assert_allclose(blocked, one_pass, atol=1e-5)
@@ -0,0 +1,150 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from gemini_common.media_refs import EXPIRY_MARGIN, UPLOAD_SLOT, MediaRegistry, wait_until_active
+from gemini_common.retry import RetryPolicy
+from gemini_common.scheduler import RequestScheduler
+
+
+def inline(data, mime_type="image/png"):
+    return SimpleNamespace(inline_data=SimpleNamespace(data=data, mime_type=mime_type))
+
+
+def unlimited_scheduler():
+    return RequestScheduler({"RPM_LIMIT": 0, "TPM_LIMIT": 0, "RPD_LIMIT": 0})
+
+
+class FakeUploader:
+    """Stands in for the File API and records every upload"""
+
+    def __init__(self, lifetime=48 * 3600, barrier=None):
+        self.lifetime = lifetime
+        self.barrier = barrier
+        self.uploads = []
+        self.lock = threading.Lock()
+
+    def __call__(self, data, mime_type):
+        if self.barrier is not None:
+            self.barrier.wait()
+        with self.lock:
+            self.uploads.append(data)
+            number = len(self.uploads)
+        return f"https://files.example/{number}", time.time() + self.lifetime
+
+
+def fake_file(name, state):
+    return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+
+def test_reuses_upload_across_turns():
+    uploader = FakeUploader()
+    registry = MediaRegistry(uploader, unlimited_scheduler())
+    text = {"text": "What is in this image?"}
+
+    first, first_refs = registry.reference_parts([text, inline(b"image-a")])
+    second, second_refs = registry.reference_parts([text, inline(b"image-a")])
+
+    assert uploader.uploads == [b"image-a"]
+    assert first[0] is text
+    assert first[1] == {"file_data": {"mime_type": "image/png", "file_uri": "https://files.example/1"}}
+    assert second == first
+    assert second_refs == first_refs
+
+
+def test_uploads_distinct_media_concurrently_once_each():
+    # Both uploads must be in flight at once to pass the barrier
+    uploader = FakeUploader(barrier=threading.Barrier(2, timeout=5))
+    registry = MediaRegistry(uploader, unlimited_scheduler())
+
+    parts, refs = registry.reference_parts(
+        [inline(b"image-a"), inline(b"image-b"), inline(b"image-a")], max_workers=4
+    )
+
+    assert sorted(uploader.uploads) == [b"image-a", b"image-b"]
+    assert parts[0] == parts[2]
+    assert parts[0] != parts[1]
+    assert len(refs) == 3
+
+
+def test_uploads_again_after_expiry():
+    # Uploads already inside the expiry margin are not replayed
+    uploader = FakeUploader(lifetime=EXPIRY_MARGIN - 1)
+    registry = MediaRegistry(uploader, unlimited_scheduler())
+
+    first, _ = registry.reference_parts([inline(b"image-a")])
+    second, _ = registry.reference_parts([inline(b"image-a")])
+
+    assert uploader.uploads == [b"image-a", b"image-a"]
+    assert first != second
+
+
+def test_uploads_scheduled_only_with_files_limits():
+    uploader = FakeUploader()
+    default = RequestScheduler()
+    MediaRegistry(uploader, default).reference_parts([inline(b"image-a")])
+    assert UPLOAD_SLOT not in default.stats()
+
+    limited = RequestScheduler(model_limits={UPLOAD_SLOT: {"RPM_LIMIT": 60}})
+    MediaRegistry(uploader, limited).reference_parts([inline(b"image-b")])
+    assert UPLOAD_SLOT in limited.stats()
+    assert uploader.uploads == [b"image-a", b"image-b"]
+
+
+def test_upload_follows_retry_policy():
+    calls = []
+
+    def uploader(data, mime_type):
+        calls.append(data)
+        raise TimeoutError("upload timed out")
+
+    registry = MediaRegistry(uploader, unlimited_scheduler())
+    part = inline(b"image-a")
+
+    parts, refs = registry.reference_parts(
+        [part], retry_policy=RetryPolicy(max_retries=1, base_delay=0.0, max_delay=0.0)
+    )
+
+    assert calls == [b"image-a", b"image-a"]
+    assert parts == [part]
+    assert refs == []
+
+
+def test_failed_processing_keeps_media_inline():
+    states = iter(["PROCESSING", "FAILED"])
+
+    def uploader(data, mime_type):
+        file = wait_until_active(
+            fake_file("files/a", "PROCESSING"),
+            lambda name: fake_file(name, next(states)),
+            sleep=lambda seconds: None,
+        )
+        return f"https://files.example/{file.name}", None
+
+    registry = MediaRegistry(uploader, unlimited_scheduler())
+    part = inline(b"image-a")
+
+    parts, refs = registry.reference_parts([part])
+
+    assert parts == [part]
+    assert refs == []
+
+
+def test_wait_until_active():
+    states = iter(["PROCESSING", "ACTIVE"])
+    file = wait_until_active(
+        fake_file("files/a", "PROCESSING"),
+        lambda name: fake_file(name, next(states)),
+        sleep=lambda seconds: None,
+    )
+    assert file.state.name == "ACTIVE"
+
+    with pytest.raises(ValueError, match="PROCESSING"):
+        wait_until_active(
+            fake_file("files/b", "PROCESSING"),
+            lambda name: fake_file(name, "PROCESSING"),
+            timeout=0.0,
+            sleep=lambda seconds: None,
+        )
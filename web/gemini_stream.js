@@ -0,0 +1,38 @@
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+import { ComfyWidgets } from "../../scripts/widgets.js";
+
+const PREVIEW_WIDGET = "stream_preview";
+
+function getPreviewWidget(node) {
+    let widget = node.widgets?.find(w => w.name === PREVIEW_WIDGET);
+    if (!widget) {
+        widget = ComfyWidgets["STRING"](node, PREVIEW_WIDGET, ["STRING", { multiline: true }], app).widget;
+        widget.inputEl.readOnly = true;
+        widget.inputEl.style.opacity = 0.8;
+        // Preview only; never sent with the prompt
+        widget.options.serialize = false;
+        widget.serializeValue = () => undefined;
+        node.setSize(node.computeSize());
+    }
+    return widget;
+}
+
+app.registerExtension({
+    name: "Gemini.StreamingText",
+    setup() {
+        api.addEventListener("gemini.stream", ({ detail }) => {
+            const node = app.graph.getNodeById(detail.node) ?? app.graph.getNodeById(Number(detail.node));
+            if (!node) return;
+
+            const widget = getPreviewWidget(node);
+            if (detail.event === "start") {
+                widget.value = "";
+            } else if (detail.event === "delta") {
+                widget.value += detail.text;
+                widget.inputEl.scrollTop = widget.inputEl.scrollHeight;
+            }
+            app.graph.setDirtyCanvas(true);
+        });
+    }
+});